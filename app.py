@@ -1,9 +1,24 @@
 import streamlit as st
 import pandas as pd
-import os
 import plotly.express as px
-from io import StringIO
-import json
+import plotly.graph_objects as go
+import numpy as np
+import time
+from ingestao import carregar_planilhas
+from pipeline import montar_bases
+from particoes import carregar_bases_particionadas, combinar_agregados, meses_armazenados
+from atualizacao import Atualizador, descrever_idade
+from cesta import montar_indice_cesta
+from compartilhado import obter_bases
+from figuras import CacheFiguras, enviar_spec, reduzir_serie
+import cubo
+from cobertura import JANELA_VELOCIDADE, NIVEL_SERVICO, leadtime_mediano, montar_matriz_vendas, projetar_ruptura, velocidade_atual, velocidade_movel
+from geo import carregar_geojson_simplificado
+import kpis
+import perfil
+import paginacao
+from quantis import MEDIDAS_TEMPO
+from vetorizado import estilo_linhas, truncar_texto
 
 # Infos da Página
 st.set_page_config(
@@ -12,124 +27,183 @@ st.set_page_config(
     layout="wide"
 )
 st.title("📊 Análise de Dados - Business Case Gocase")
-st.markdown("Análise dos dados de Vendas, Estoque e Logística no mês de Fevereiro de 2025.")
+
+MESES = ['Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho', 'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']
+
+def descrever_periodo(meses):
+    """Descreve uma lista de `ano_mes` (AAAA-MM) por extenso, ex.: 'no mês de Fevereiro de 2025'."""
+    nomes = [f"{MESES[int(m[5:7]) - 1]} de {m[:4]}" for m in sorted(meses)]
+    if not nomes:
+        return ""
+    if len(nomes) == 1:
+        return f"no mês de {nomes[0]}"
+    return f"de {nomes[0]} a {nomes[-1]}"
 
 # Carregamento dos Dados
 @st.cache_data
-def carregar_dados():
-    """Carrega os dados das planilhas, aplicando cache para melhorar performance."""
-    caminho_pedidos = os.path.join('data', 'Case Dados - Pedidos.xlsx')
-    caminho_itens_supply = os.path.join('data', 'Business Case Dados - Itens + Supply.xlsx')
-    try:
-        df_pedidos = pd.read_excel(caminho_pedidos)
-        df_itens = pd.read_excel(caminho_itens_supply, sheet_name='Itens')
-        df_supply = pd.read_excel(caminho_itens_supply, sheet_name='Supply')
-        return df_pedidos, df_itens, df_supply
-    except FileNotFoundError:
-        st.error("Erro: Arquivos de dados não encontrados. Verifique se eles estão na pasta 'data'.")
-        return None, None, None
+def carregar_dados(versao):
+    """Carrega os dados a partir do cache colunar (Parquet); o Excel só é relido quando a planilha de origem muda, com uma barra de progresso."""
+    perfil.marcar_miss()
+    barra = st.progress(0.0, text="Lendo as planilhas...")
+    planilhas = carregar_planilhas(progresso=lambda fracao, texto: barra.progress(fracao, text=texto))
+    barra.empty()
+    return planilhas
+
+def montar_dados(fonte, compacto=False):
+    """Pré-processa e unifica as bases da versão `fonte` (planilhas ou partições)."""
+    perfilador = perfil.atual()
+    tipo, versao = fonte
+    if tipo == 'particoes':
+        return perfilador.dados('carregar_bases_particionadas', carregar_bases_particionadas, compacto=compacto)
+    df_pedidos_raw, df_itens_raw, df_supply_raw = perfilador.cache('carregar_dados', carregar_dados, versao)
+    return perfilador.dados('pre_processamento', montar_bases, df_pedidos_raw, df_itens_raw, df_supply_raw, compacto=compacto)
+
+# Um único objeto por processo, lido por todas as sessões sem cópia (o `st.cache_data` devolveria uma cópia a cada execução);
+# cabem a versão servida e a que está sendo preparada, nos dois modos
+@st.cache_resource(max_entries=4)
+def processar_dados(fonte, compacto=False):
+    """Bases publicadas uma única vez por versão dos dados, mapeadas do disco e compartilhadas entre as sessões; as interações com os filtros só fatiam e agregam o resultado."""
+    perfil.marcar_miss()
+    return obter_bases(fonte, lambda: montar_dados(fonte, compacto), compacto)
+
+@st.cache_data
+def carregar_indice_cesta(fonte, compacto=False):
+    """Índice esparso de co-ocorrência de produtos (cesta de compras) por versão dos dados."""
+    perfil.marcar_miss()
+    df_completo = processar_dados(fonte, compacto).df_completo
+    return montar_indice_cesta(df_completo)
 
-df_pedidos_raw, df_itens_raw, df_supply_raw = carregar_dados()
+@st.cache_data
+def tendencia_desconto(fonte, compacto=False):
+    """Reta de mínimos quadrados do valor da NF em função do desconto, com o R², por versão dos dados."""
+    perfil.marcar_miss()
+    analise = kpis.analise_desconto(processar_dados(fonte, compacto).df_pedidos)
+    return kpis.ajustar_reta(analise['desconto_calculado'], analise['valor_nf'])
+
+@st.cache_data
+def carregar_matriz_vendas(fonte, compacto=False):
+    """Matriz material x dia das vendas dos produtos ativos, montada uma vez por versão dos dados."""
+    perfil.marcar_miss()
+    bases = processar_dados(fonte, compacto)
+    return montar_matriz_vendas(bases.df_completo, bases.df_supply_agg)
+
+@st.cache_data
+def calcular_velocidade(fonte, compacto, janela):
+    """Velocidade e desvio diário recentes de cada produto; só muda com a janela, não com os parâmetros de reposição."""
+    perfil.marcar_miss()
+    return velocidade_atual(carregar_matriz_vendas(fonte, compacto), janela)
+
+@st.cache_data
+def calcular_kpi(fonte, compacto, funcao, tabela, *args):
+    """Resultado de `kpis.<funcao>(bases.<tabela>, *args)` por versão dos dados e valores dos filtros."""
+    perfil.marcar_miss()
+    bases = processar_dados(fonte, compacto)
+    return getattr(kpis, funcao)(getattr(bases, tabela), *args)
+
+@st.cache_data
+def contar_linhas(fonte, compacto, funcao, tabela):
+    """Número de linhas do resultado de `kpis.<funcao>`, sem copiar a tabela para a sessão."""
+    perfil.marcar_miss()
+    return len(calcular_kpi(fonte, compacto, funcao, tabela))
+
+@st.cache_data
+def calcular_pagina(fonte, compacto, funcao, tabela, coluna, crescente, numero, tamanho):
+    """Página `numero` do resultado de `kpis.<funcao>`, ordenada no servidor: só a página vai para o navegador."""
+    perfil.marcar_miss()
+    return paginacao.pagina(calcular_kpi(fonte, compacto, funcao, tabela), coluna, crescente, numero, tamanho)
+
+# Cada arquivo fica inteiro na memória: só os pedidos mais recentes (tabela x formato) são guardados
+@st.cache_data(max_entries=4)
+def exportar_tabela(fonte, compacto, funcao, tabela, colunas, formato):
+    """Arquivo CSV ou Parquet com o resultado inteiro de `kpis.<funcao>` (só as `colunas` exibidas), gerado quando alguém pede a exportação."""
+    perfil.marcar_miss()
+    return paginacao.exportar(calcular_kpi(fonte, compacto, funcao, tabela)[list(colunas)], formato)
+
+def consultar(funcao, tabela, *args):
+    """Tabela de KPI da página atual, calculada uma vez por combinação de dados e filtros."""
+    return perfilador.cache(funcao, calcular_kpi, fonte, modo_compacto, funcao, tabela, *args)
+
+@st.cache_data
+def carregar_cubo(fonte, compacto=False):
+    """Cubo de agregados somáveis (dia, estado, transportadora, categoria, material, status), montado uma vez por versão dos dados."""
+    perfil.marcar_miss()
+    bases = processar_dados(fonte, compacto)
+    tempos = None
+    if fonte[0] == 'particoes' and meses_armazenados('agregados/tempos') == meses_armazenados():
+        # Histogramas mensais gravados na ingestão: somá-los dispensa reler os pedidos
+        tempos = combinar_agregados('tempos')
+    return cubo.montar_cubo(bases.df_pedidos, bases.df_completo, tempos)
+
+@st.cache_data
+def calcular_no_cubo(fonte, compacto, funcao, *args):
+    """Resultado de `cubo.<funcao>(cubo, *args)`: um recorte e uma soma do cubo, sem reagrupar as bases."""
+    perfil.marcar_miss()
+    return getattr(cubo, funcao)(carregar_cubo(fonte, compacto), *args)
+
+def consultar_cubo(funcao, *args):
+    """Tabela de KPI da página atual, consolidada a partir do cubo de agregados."""
+    return perfilador.cache(funcao, calcular_no_cubo, fonte, modo_compacto, funcao, *args)
+
+def aquecer_caches(fonte, compacto=False):
+    """Pré-calcula, fora das sessões, as bases e os agregados derivados de uma versão nova dos dados."""
+    processar_dados(fonte, compacto)
+    carregar_cubo(fonte, compacto)
+    carregar_matriz_vendas(fonte, compacto)
+    carregar_indice_cesta(fonte, compacto)
+    tendencia_desconto(fonte, compacto)
+
+@st.cache_resource
+def obter_atualizador():
+    """Atualizador único do processo: observa `data/` e prepara as versões novas em segundo plano."""
+    return Atualizador(aquecer_caches).iniciar()
+
+@st.cache_resource
+def obter_cache_figuras():
+    """Cache de figuras serializadas do processo, compartilhado pelas sessões e limitado em bytes."""
+    return CacheFiguras()
+
+def exibir_figura(nome, montar, *widgets):
+    """Exibe a figura `nome` da versão atual dos dados e dos valores `widgets`; `montar()` só roda se ela não estiver no cache."""
+    chave = (fonte, modo_compacto, nome, widgets)
+    perfilador.grafico_cacheado(nome, obter_cache_figuras(), chave, montar, enviar_spec)
 
 # --- Bloco Principal: Executado apenas se os dados forem carregados corretamente ---
-if df_pedidos_raw is not None:
-    # Pré-processamento: Remove Colunas Desnecessárias
-    st.success("Dados carregados! Otimizando e iniciando o pré-processamento...")
-
-    # Copia para manter os dataframes originais intactos
-    df_pedidos = df_pedidos_raw.copy()
-    df_itens = df_itens_raw.copy()
-    df_supply = df_supply_raw.copy()
-
-    # Removeção de colunas desnecessárias
-    colunas_remover_pedidos = ['Código de Rastreio', 'CEP', 'postage_list_id', 'Peso (kg)']
-    colunas_remover_itens = ['material_weight_kg', 'aasm_state', 'reprint_batch_id', 'supply_paid', 'stock_burning', 'consumable_letters']
-    colunas_remover_supply = ['factory_id', 'reposition', 'inventory_center_id', 'material_localization_id']
-    df_pedidos.drop(columns=colunas_remover_pedidos, inplace=True, errors='ignore')
-    df_itens.drop(columns=colunas_remover_itens, inplace=True, errors='ignore')
-    df_supply.drop(columns=colunas_remover_supply, inplace=True, errors='ignore')
-
-    # Renomeação de colunas para facilitar a análise
-    mapa_nomes_pedidos = {
-        'id': 'id_pedido', 'reference': 'numero_referencia', 'created_at': 'data_pedido',
-        'Valor de NF (R$)': 'valor_nf', 'order_state': 'estado_pedido_interno', 'Cidade': 'cidade', 
-        'Estado': 'estado', 'Frete Cobrado do Cliente (R$)': 'frete_cliente',
-        'Frete cobrado pela transportadora (R$)': 'frete_transportadora',
-        'Transportadora': 'transportadora', 'Número da NF': 'numero_nf', 
-        'Status do Pedido': 'status_pedido', 'Prazo para Sair do CD': 'prazo_saida_cd', 
-        'Enviado em:': 'data_envio', 'Entregue para o cliente em:': 'data_entrega',
-        'Prazo a transportadora entregar no cliente': 'prazo_entrega_transportadora',
-        'Número de Itens no Pedido': 'numero_itens'
-    }
-    df_pedidos.rename(columns=mapa_nomes_pedidos, inplace=True)
-    df_itens.rename(columns={'order_id': 'id_pedido'}, inplace=True)
-    df_supply.rename(columns={'quantity': 'estoque_disponivel'}, inplace=True)
-
-    # Normalização de colunas
-    df_pedidos['id_pedido'] = pd.to_numeric(df_pedidos['id_pedido'], errors='coerce')
-    df_pedidos.dropna(subset=['id_pedido'], inplace=True)
-    df_pedidos['id_pedido'] = df_pedidos['id_pedido'].astype(int)
-
-    #  Normalização de datas, valores numéricos e criação de novas colunas
-    data_pedido_norm = pd.to_datetime(df_pedidos['data_pedido'], errors='coerce').dt.normalize()
-    data_entrega_norm = pd.to_datetime(df_pedidos['data_entrega'], errors='coerce').dt.normalize()
-    df_pedidos['tempo_entrega_dias'] = (data_entrega_norm - data_pedido_norm).dt.days
-    df_pedidos['data_pedido'] = pd.to_datetime(df_pedidos['data_pedido'], errors='coerce')
-    df_pedidos['ano_mes'] = df_pedidos['data_pedido'].dt.to_period('M').astype(str)
-    df_itens['id_pedido'] = pd.to_numeric(df_itens['id_pedido'], errors='coerce')
-    df_itens['price'] = pd.to_numeric(df_itens['price'], errors='coerce').fillna(0)
-    df_itens['quantidade'] = 1
-
-    # Junção (Merge) das Bases
-    df_supply_agg = df_supply.groupby('material_id').agg({
-        'estoque_disponivel': 'sum', 'discontinued': 'first', 'leadtime': 'mean'
-    }).reset_index()
-    df_itens_supply = pd.merge(
-        left=df_itens, right=df_supply_agg, on='material_id', how='left'
-    )
-    df_completo = pd.merge(
-        left=df_pedidos, right=df_itens_supply, on='id_pedido', how='left'
-    )
-    df_completo['material_name'].fillna('Não informado', inplace=True)
-    st.success("Bases de dados otimizadas, tratadas e unificadas!")
-    
-    # --- INÍCIO DAS SEÇÕES DE ANÁLISE ---
+# --- Páginas: cada seção só é calculada quando está na tela ---
 
-    # 1. ANÁLISE DE VENDAS & CONVERSÃO 
+def pagina_vendas():
+    """1. Análise de Vendas & Conversão."""
     st.header("1. Análise de Vendas & Conversão")
     st.subheader("Distribuição de Pedidos ao Longo do Tempo")
     
     # Análise de pedidos por dia
-    pedidos_por_dia = df_completo.drop_duplicates(subset='id_pedido').set_index('data_pedido').resample('D').agg({'id_pedido': 'count'}).reset_index()
-    pedidos_por_dia.rename(columns={'id_pedido': 'quantidade_pedidos'}, inplace=True)
-    fig_vendas_tempo = px.line(
-        pedidos_por_dia, x='data_pedido', y='quantidade_pedidos', title='Volume de Pedidos por Dia',
-        labels={'data_pedido': 'Data', 'quantidade_pedidos': 'Número de Pedidos'}
-    )
-    fig_vendas_tempo.update_xaxes(rangeslider_visible=True)
-    st.plotly_chart(fig_vendas_tempo, use_container_width=True)
+    def montar_vendas_tempo():
+        # Com um período longo, a série vai reduzida aos mínimos e máximos de cada faixa de dias (o seletor de período desenha todos os pontos)
+        pedidos_por_dia = reduzir_serie(consultar_cubo('pedidos_por_dia'), 'data_pedido', 'quantidade_pedidos')
+        fig_vendas_tempo = perfilador.figura('fig_vendas_tempo', px.line,
+            pedidos_por_dia, x='data_pedido', y='quantidade_pedidos', title='Volume de Pedidos por Dia',
+            labels={'data_pedido': 'Data', 'quantidade_pedidos': 'Número de Pedidos'}
+        )
+        fig_vendas_tempo.update_xaxes(rangeslider_visible=True)
+        return fig_vendas_tempo
+    exibir_figura('fig_vendas_tempo', montar_vendas_tempo)
     st.markdown("---")
 
-    if 'faturamento_item' not in df_completo.columns:
-        df_completo['faturamento_item'] = df_completo['quantidade'] * df_completo['price']
-
     # Análise dos produtos/categorias com maior impacto no faturamento
     st.subheader("Produtos e Categorias de Maior Impacto no Faturamento (Top 10)")
     visao_top = st.selectbox("Visualizar por:", ("Produto", "Categoria"), key='select_top')
 
-    if visao_top == "Categoria":
-        top_data = df_completo.groupby('material_category')['faturamento_item'].sum().sort_values(ascending=False).reset_index().head(10)
-        top_data_sorted = top_data.sort_values(by='faturamento_item', ascending=False)
-        fig_top = px.bar(
-            top_data_sorted, y='faturamento_item', x='material_category', title="Top 10 Categorias por Faturamento",
-            text_auto='.2s', labels={'faturamento_item': 'Faturamento (R$)', 'material_category': 'Categoria'}
-        )
-    else: # Visão por Produto
-        top_10_produtos = df_completo.groupby('material_name')['faturamento_item'].sum().nlargest(10).reset_index()
-        top_data_sorted = top_10_produtos.sort_values(by='faturamento_item', ascending=True).copy()
-        top_data_sorted['nome_curto'] = top_data_sorted['material_name'].apply(lambda x: (x[:45] + '...') if len(x) > 45 else x)
-        
-        fig_top = px.bar(
+    def montar_top():
+        top_data = consultar_cubo('maior_faturamento', visao_top)
+        if visao_top == "Categoria":
+            top_data_sorted = top_data
+            return perfilador.figura('fig_top', px.bar,
+                top_data_sorted, y='faturamento_item', x='material_category', title="Top 10 Categorias por Faturamento",
+                text_auto='.2s', labels={'faturamento_item': 'Faturamento (R$)', 'material_category': 'Categoria'}
+            )
+        # Visão por Produto
+        top_data_sorted = top_data.sort_values(by='faturamento_item', ascending=True).copy()
+        top_data_sorted['nome_curto'] = truncar_texto(top_data_sorted['material_name'], 45)
+        return perfilador.figura('fig_top', px.bar,
             top_data_sorted,
             x='faturamento_item', 
             y='nome_curto', 
@@ -138,76 +212,68 @@ if df_pedidos_raw is not None:
             hover_name='material_name', 
             labels={'faturamento_item': 'Faturamento (R$)', 'nome_curto': 'Produto'}
         )
-
-    st.plotly_chart(fig_top, use_container_width=True)
+    exibir_figura('fig_top', montar_top, visao_top)
     st.markdown("---")
 
     # Análise dos produtos com menor impacto no faturamento
     st.subheader("Produtos e Categorias de Menor Impacto no Faturamento (Bottom 10)")
     st.markdown("Análise dos **produtos ativos** com menor performance de vendas. Itens descontinuados são desconsiderados.")
 
-    # Cria um DataFrame contendo apenas produtos ativos
-    df_ativo = df_completo[df_completo['discontinued'].fillna(False) == False]
-
     visao_bottom = st.selectbox("Visualizar por:", ("Produto", "Categoria"), key='select_bottom')
-    if visao_bottom == "Categoria":
-        bottom_data = df_ativo[df_ativo['faturamento_item'] > 0].groupby('material_category')['faturamento_item'].sum().sort_values(ascending=True).reset_index().head(10)
-        fig_bottom = px.bar(
-            bottom_data, x='material_category', y='faturamento_item', title="Top 10 Categorias Ativas com Menor Faturamento",
-            text_auto='.2s', labels={'faturamento_item': 'Faturamento (R$)', 'material_category': 'Categoria'}
-        )
-        fig_bottom.update_layout(xaxis={'categoryorder':'total ascending'})
-    else:
-        bottom_data = df_ativo[df_ativo['faturamento_item'] > 0].groupby('material_name')['faturamento_item'].sum().sort_values(ascending=True).reset_index().head(10).copy()
-        bottom_data['nome_curto'] = bottom_data['material_name'].apply(lambda x: (x[:35] + '...') if len(x) > 35 else x)
-        fig_bottom = px.bar(
-            bottom_data, x='faturamento_item', y='nome_curto', title="Top 10 Produtos Ativos com Menor Faturamento",
-            text_auto='.2s', hover_name='material_name', labels={'faturamento_item': 'Faturamento (R$)', 'nome_curto': 'Produto'}
-        )
-        fig_bottom.update_layout(yaxis={'categoryorder':'total descending'})
-    st.plotly_chart(fig_bottom, use_container_width=True)
+    def montar_bottom():
+        bottom_data = consultar_cubo('menor_faturamento', visao_bottom)
+        if visao_bottom == "Categoria":
+            fig_bottom = perfilador.figura('fig_bottom', px.bar,
+                bottom_data, x='material_category', y='faturamento_item', title="Top 10 Categorias Ativas com Menor Faturamento",
+                text_auto='.2s', labels={'faturamento_item': 'Faturamento (R$)', 'material_category': 'Categoria'}
+            )
+            fig_bottom.update_layout(xaxis={'categoryorder':'total ascending'})
+        else:
+            bottom_data['nome_curto'] = truncar_texto(bottom_data['material_name'], 35)
+            fig_bottom = perfilador.figura('fig_bottom', px.bar,
+                bottom_data, x='faturamento_item', y='nome_curto', title="Top 10 Produtos Ativos com Menor Faturamento",
+                text_auto='.2s', hover_name='material_name', labels={'faturamento_item': 'Faturamento (R$)', 'nome_curto': 'Produto'}
+            )
+            fig_bottom.update_layout(yaxis={'categoryorder':'total descending'})
+        return fig_bottom
+    exibir_figura('fig_bottom', montar_bottom, visao_bottom)
     st.markdown("---")
     
     # Análise da tendência de itens que são comprados conjuntamente
     st.subheader("Análise de Cesta de Compras (Produtos Comprados Juntos)")
     st.markdown("Selecione um produto específico para descobrir quais outros itens são mais frequentemente comprados junto com ele.")
 
-    top_produtos_lista = df_completo['material_name'].value_counts().nlargest(50).index.tolist()
+    # O índice de co-ocorrência é montado uma vez por versão dos dados; a consulta de qualquer produto é uma leitura de linha da matriz
+    indice_cesta = perfilador.cache('carregar_indice_cesta', carregar_indice_cesta, fonte, modo_compacto)
     produto_selecionado = st.selectbox(
         "Selecione um produto de referência:",
-        top_produtos_lista
+        indice_cesta.produtos_mais_frequentes()
     )
 
     if produto_selecionado:
-        # Encontra todos os pedidos que contêm o produto selecionado
-        pedidos_com_produto = df_completo[df_completo['material_name'] == produto_selecionado]['id_pedido'].unique()
-        itens_dos_pedidos_relevantes = df_completo[df_completo['id_pedido'].isin(pedidos_com_produto)]
-        
-        # Conta a frequência de todos os outros produtos comprados nesses pedidos
-        produtos_associados = itens_dos_pedidos_relevantes[
-            itens_dos_pedidos_relevantes['material_name'] != produto_selecionado
-        ]['material_name'].value_counts().head(5)
+        produtos_associados_df = indice_cesta.associados(produto_selecionado, n=5)
 
-        if not produtos_associados.empty:
-            produtos_associados_df = produtos_associados.reset_index()
-            produtos_associados_df.columns = ['produto_associado', 'contagem']
-            produtos_associados_df['nome_curto'] = produtos_associados_df['produto_associado'].apply(lambda x: (x[:45] + '...') if len(x) > 45 else x)
+        if not produtos_associados_df.empty:
+            produtos_associados_df['nome_curto'] = truncar_texto(produtos_associados_df['produto_associado'], 45)
 
             st.markdown(f"##### Top 5 produtos mais comprados junto com:")
             st.info(f"{produto_selecionado}")
             
-            fig_cesta = px.bar(
-                produtos_associados_df,
-                x='contagem',
-                y='nome_curto',
-                orientation='h',
-                title=f"Produtos Comprados com o item selecionado",
-                labels={'contagem': 'Pedidos em Comum', 'nome_curto': 'Produto Associado'},
-                text='contagem',
-                hover_name='produto_associado'
-            )
-            fig_cesta.update_layout(yaxis={'categoryorder':'total ascending'})
-            st.plotly_chart(fig_cesta, use_container_width=True)
+            def montar_cesta():
+                fig_cesta = perfilador.figura('fig_cesta', px.bar,
+                    produtos_associados_df,
+                    x='contagem',
+                    y='nome_curto',
+                    orientation='h',
+                    title=f"Produtos Comprados com o item selecionado",
+                    labels={'contagem': 'Pedidos em Comum', 'nome_curto': 'Produto Associado', 'confianca': 'Confiança', 'lift': 'Lift'},
+                    text='contagem',
+                    hover_name='produto_associado',
+                    hover_data={'confianca': ':.1%', 'lift': ':.2f', 'nome_curto': False}
+                )
+                fig_cesta.update_layout(yaxis={'categoryorder':'total ascending'})
+                return fig_cesta
+            exibir_figura('fig_cesta', montar_cesta, produto_selecionado)
 
         else:
             st.warning(f"Não foram encontrados outros produtos comprados frequentemente junto com este item.")
@@ -215,73 +281,130 @@ if df_pedidos_raw is not None:
 
     # Análise do impacto dos descontos nos valores dos pedidos
     st.subheader("Relação entre Descontos e Valor do Pedido")
-    agg_pedidos = df_completo.groupby('id_pedido').agg(
-        subtotal_calculado=('faturamento_item', 'sum'),
-        quantidade_itens=('quantidade', 'sum')
-    ).reset_index()
-    dados_nf = df_completo[['id_pedido', 'valor_nf']].drop_duplicates()
-    analise_desconto = pd.merge(agg_pedidos, dados_nf, on='id_pedido')
-    analise_desconto['desconto_calculado'] = analise_desconto['subtotal_calculado'] - analise_desconto['valor_nf']
-    analise_desconto_filtrado = analise_desconto[
-        (analise_desconto['desconto_calculado'] >= 0) &
-        (analise_desconto['desconto_calculado'] < (analise_desconto['subtotal_calculado'] * 0.95))
-    ]
-    fig_desconto = px.scatter(
-        analise_desconto_filtrado, x='desconto_calculado', y='valor_nf', title='Valor do Pedido vs. Desconto Aplicado (Dados Filtrados)',
-        labels={'desconto_calculado': 'Desconto Inferido (R$)', 'valor_nf': 'Valor da Nota Fiscal (R$)'},
-        trendline='ols', hover_data=['quantidade_itens']
-    )
-    if len(fig_desconto.data) > 1:
-        fig_desconto.data[1].line.color = 'red'
-    st.plotly_chart(fig_desconto, use_container_width=True)
+    analise_desconto = consultar('analise_desconto', 'df_pedidos')
+    titulo_desconto = 'Valor do Pedido vs. Desconto Aplicado (Dados Filtrados)'
+    labels_desconto = {'desconto_calculado': 'Desconto Inferido (R$)', 'valor_nf': 'Valor da Nota Fiscal (R$)'}
+
+    # Com muitos pedidos, enviar todos os pontos trava o navegador: usa a densidade agregada no servidor ou uma amostra em WebGL
+    modo_desconto = None
+    if len(analise_desconto) > kpis.LIMITE_PONTOS_DISPERSAO:
+        modo_desconto = st.radio(
+            f"{len(analise_desconto):,} pedidos — visualizar como:", ["Densidade", "Amostra (WebGL)"], horizontal=True
+        )
+    # Linha de tendência calculada com todos os pedidos, uma vez por versão dos dados
+    tendencia = perfilador.cache('tendencia_desconto', tendencia_desconto, fonte, modo_compacto)
+
+    def montar_desconto():
+        if modo_desconto == "Densidade":
+            contagens, centros_x, centros_y = perfilador.dados(
+                'densidade_desconto', kpis.densidade_2d, analise_desconto['desconto_calculado'], analise_desconto['valor_nf']
+            )
+            fig_desconto = perfilador.figura('fig_desconto', go.Figure, go.Heatmap(
+                x=centros_x, y=centros_y, z=contagens, colorscale='Blues', colorbar={'title': 'Pedidos'},
+                hovertemplate='Desconto: R$ %{x:.2f}<br>Valor da NF: R$ %{y:.2f}<br>Pedidos: %{z}<extra></extra>'
+            ))
+            fig_desconto.update_layout(
+                title=titulo_desconto, xaxis_title=labels_desconto['desconto_calculado'], yaxis_title=labels_desconto['valor_nf']
+            )
+        elif modo_desconto is not None:
+            amostra_desconto = kpis.amostrar(analise_desconto, kpis.LIMITE_PONTOS_DISPERSAO)
+            fig_desconto = perfilador.figura('fig_desconto', px.scatter,
+                amostra_desconto, x='desconto_calculado', y='valor_nf', title=f'{titulo_desconto} — amostra de {len(amostra_desconto):,} pedidos',
+                labels=labels_desconto, hover_data=['quantidade_itens'], render_mode='webgl'
+            )
+        else:
+            fig_desconto = perfilador.figura('fig_desconto', px.scatter,
+                analise_desconto, x='desconto_calculado', y='valor_nf', title=titulo_desconto,
+                labels=labels_desconto, hover_data=['quantidade_itens']
+            )
+
+        if not np.isnan(tendencia['inclinacao']):
+            extremos_x = np.array([analise_desconto['desconto_calculado'].min(), analise_desconto['desconto_calculado'].max()])
+            fig_desconto.add_trace(go.Scatter(
+                x=extremos_x, y=tendencia['intercepto'] + tendencia['inclinacao'] * extremos_x, mode='lines',
+                line={'color': 'red'}, name='Tendência (MQO)', showlegend=False
+            ))
+        return fig_desconto
+    exibir_figura('fig_desconto', montar_desconto, modo_desconto)
+    if not np.isnan(tendencia['inclinacao']):
+        st.caption(
+            f"Tendência: valor da NF = {tendencia['intercepto']:,.2f} + ({tendencia['inclinacao']:,.3f} × desconto) · "
+            f"R² = {tendencia['r2']:.3f} · {tendencia['n']:,} pedidos"
+        )
     st.markdown("---")
 
-    # 2. ANÁLISE DE SUPPLY CHAIN & ESTOQUE
+# Rótulos das colunas das tabelas paginadas (também usados no seletor de ordenação)
+ROTULOS_COLUNAS = {
+    'material_id': "ID do Material", 'material_name': "Produto", 'estoque_disponivel': "Estoque Disponível",
+    'media_vendas_diaria': "Média de Vendas/Dia", 'dias_cobertura': "Dias de Cobertura",
+}
+
+def exibir_tabela_paginada(funcao, colunas, nome_arquivo, destacar=None):
+    """Tabela de `kpis.<funcao>(produtos_criticos)` paginada e ordenada no servidor, com exportação da lista completa.
+
+    Só a página visível é enviada ao navegador. O destaque (`destacar`, uma
+    máscara calculada de uma vez sobre as linhas da página) é aplicado a
+    essas linhas apenas, e o arquivo exportado só é gerado quando pedido
+    (botão "Gerar arquivo"), não a cada execução.
+    """
+    col_ordem, col_sentido, col_pagina = st.columns([2, 1, 1])
+    coluna = col_ordem.selectbox(
+        "Ordenar por:", [None] + colunas, key=f'{funcao}_ordem',
+        format_func=lambda c: "Padrão (maior impacto primeiro)" if c is None else ROTULOS_COLUNAS[c],
+    )
+    crescente = col_sentido.radio("Sentido:", ["Crescente", "Decrescente"], key=f'{funcao}_sentido', horizontal=True) == "Crescente"
+    n_linhas = perfilador.cache(f'contar_{funcao}', contar_linhas, fonte, modo_compacto, funcao, 'produtos_criticos')
+    n_paginas = paginacao.numero_paginas(n_linhas)
+    # Uma versão nova dos dados pode ter menos páginas do que a escolhida antes
+    numero = min(col_pagina.number_input(f"Página (de {n_paginas:,}):", min_value=1, max_value=n_paginas, value=1, key=f'{funcao}_pagina'), n_paginas)
+    pagina = perfilador.cache(funcao, calcular_pagina, fonte, modo_compacto, funcao, 'produtos_criticos', coluna, crescente, numero, paginacao.TAMANHO_PAGINA)
+
+    tabela = pagina[colunas].style.format({c: "{:.2f}" for c in ('estoque_disponivel', 'media_vendas_diaria') if c in colunas})
+    if destacar is not None:
+        tabela = tabela.apply(estilo_linhas, axis=None, mascara=destacar(pagina), estilo='background-color: #FF7F7F')
+    st.dataframe(tabela, hide_index=True, column_config={c: ROTULOS_COLUNAS[c] for c in colunas})
+    inicio = (numero - 1) * paginacao.TAMANHO_PAGINA
+    st.caption(f"Linhas {inicio + 1:,}–{inicio + len(pagina):,} de {n_linhas:,}." if n_linhas else "Nenhum produto na lista.")
+
+    col_formato, col_baixar = st.columns([1, 3])
+    formato = col_formato.radio("Exportar a lista completa:", list(paginacao.FORMATOS_EXPORTACAO), key=f'{funcao}_formato', horizontal=True)
+    extensao, mime = paginacao.FORMATOS_EXPORTACAO[formato]
+    # O arquivo só é montado depois do clique em "Gerar arquivo", e vale para esta versão dos dados e formato
+    pedido = (fonte, modo_compacto, formato)
+    if st.session_state.get(f'{funcao}_exportacao') != pedido:
+        col_baixar.button(
+            f"Gerar arquivo com {n_linhas:,} linhas ({formato})", key=f'{funcao}_gerar',
+            on_click=st.session_state.update, args=({f'{funcao}_exportacao': pedido},),
+        )
+        return
+    col_baixar.download_button(
+        f"⬇️ Baixar {n_linhas:,} linhas ({formato})",
+        data=perfilador.cache(f'exportar_{funcao}', exportar_tabela, fonte, modo_compacto, funcao, 'produtos_criticos', tuple(colunas), formato),
+        file_name=f'{nome_arquivo}.{extensao}', mime=mime, key=f'{funcao}_baixar', on_click='ignore',
+    )
+
+def pagina_supply():
+    """2. Análise de Supply Chain & Estoque."""
     st.header("2. Análise de Supply Chain & Estoque")
     st.subheader("Análise de Estoque Crítico")
     st.markdown("Listas detalhadas de produtos que necessitam de atenção imediata da equipe de suprimentos. **Produtos descontinuados são desconsiderados.**")
     
-    # Cria um DataFrame contendo apenas produtos ativos
-    df_ativo = df_completo[df_completo['discontinued'].fillna(False) == False].copy()
-
-    # Verifica se há dados de produtos ativos para análise e realiza a análise de cobertura de estoque
-    if not df_ativo.empty:
-        dias_analise = (df_ativo['data_pedido'].max() - df_ativo['data_pedido'].min()).days
-        if dias_analise == 0: dias_analise = 1
-
-        vendas_por_id = df_ativo.groupby('material_id')['quantidade'].sum().reset_index()
-        vendas_por_id.rename(columns={'quantidade': 'vendas_totais'}, inplace=True)
-        vendas_por_id['media_vendas_diaria'] = vendas_por_id['vendas_totais'] / dias_analise
-
-        estoque_por_id = df_ativo[['material_id', 'material_name', 'estoque_disponivel']].drop_duplicates(subset='material_id')
-        analise_cobertura = pd.merge(vendas_por_id, estoque_por_id, on='material_id')
-        
-        analise_cobertura['estoque_disponivel'].fillna(0, inplace=True)
-        analise_cobertura['dias_cobertura'] = (
-            analise_cobertura['estoque_disponivel'] / (analise_cobertura['media_vendas_diaria'] + 0.0001)
-        ).round(0).astype(int)
-
-        produtos_criticos = analise_cobertura[analise_cobertura['media_vendas_diaria'] > 0].sort_values(
-            by=['dias_cobertura', 'media_vendas_diaria'], ascending=[True, False]
-        )
-
+    # A cobertura de estoque dos produtos ativos é calculada uma única vez no pipeline (pipeline.calcular_cobertura_estoque)
+    if not produtos_criticos.empty:
         tab_ruptura, tab_critico_total = st.tabs(["🚨 Produtos em Ruptura (Estoque Zerado)", "⚠️ Todos em Estado Crítico (< 7 dias)"])
 
         # Exibe os produtos em ruptura (estoque zerado)
         with tab_ruptura:
             st.markdown("Estes são os produtos com **vendas recentes** mas com **estoque zerado**. A lista está ordenada pelo produto de maior impacto (maior média de vendas).")
-            df_ruptura = produtos_criticos[produtos_criticos['dias_cobertura'] == 0]
-            styled_ruptura = df_ruptura[['material_id', 'material_name', 'media_vendas_diaria']].style.format({'media_vendas_diaria': "{:.2f}"})
-            st.dataframe(styled_ruptura)
+            exibir_tabela_paginada('produtos_em_ruptura', ['material_id', 'material_name', 'media_vendas_diaria'], 'produtos_em_ruptura')
 
         # Exibe todos os produtos críticos com menos de 7 dias de cobertura
         with tab_critico_total:
             st.markdown("Esta lista inclui **todos** os produtos com menos de 7 dias de cobertura de estoque, ordenada pelos mais críticos e de maior impacto.")
-            df_critico_completo = produtos_criticos[produtos_criticos['dias_cobertura'] < 7]
-            styled_critico_total = df_critico_completo[['material_id', 'material_name', 'estoque_disponivel', 'media_vendas_diaria', 'dias_cobertura']].style.format({
-                'estoque_disponivel': "{:.2f}", 'media_vendas_diaria': "{:.2f}"
-            }).apply(lambda x: ['background-color: #FF7F7F' if x.dias_cobertura < 7 else '' for i in x], axis=1)
-            st.dataframe(styled_critico_total)
+            exibir_tabela_paginada(
+                'produtos_em_estado_critico', ['material_id', 'material_name', 'estoque_disponivel', 'media_vendas_diaria', 'dias_cobertura'],
+                'produtos_estado_critico', destacar=lambda pagina: pagina['dias_cobertura'] < kpis.LIMITE_COBERTURA_CRITICA,
+            )
         st.markdown("---")
     else:
         st.warning("Não foram encontrados dados de produtos ativos para análise de estoque.")
@@ -289,65 +412,110 @@ if df_pedidos_raw is not None:
     # Análise de Lead Time
     st.subheader("Distribuição do Tempo de Reposição (Lead Time)")
     st.markdown("O histograma abaixo mostra a frequência dos diferentes tempos de reposição para os produtos ativos.")
-    leadtime_data = df_supply_agg[df_supply_agg['leadtime'] > 0]
+    leadtime_data = consultar('distribuicao_leadtime', 'df_supply_agg')
     
     # Verifica se há dados de leadtime disponíveis antes de plotar o histograma
     if not leadtime_data.empty:
-        fig_leadtime_hist = px.histogram(
-            leadtime_data, x="leadtime", nbins=30, title="Frequência de Produtos por Tempo de Reposição",
-            labels={"leadtime": "Lead Time (dias)"}
-        )
-        fig_leadtime_hist.update_yaxes(title_text="Frequência")
-        st.plotly_chart(fig_leadtime_hist, use_container_width=True)
+        def montar_leadtime_hist():
+            fig_leadtime_hist = perfilador.figura('fig_leadtime_hist', px.histogram,
+                leadtime_data, x="leadtime", nbins=30, title="Frequência de Produtos por Tempo de Reposição",
+                labels={"leadtime": "Lead Time (dias)"}
+            )
+            fig_leadtime_hist.update_yaxes(title_text="Frequência")
+            return fig_leadtime_hist
+        exibir_figura('fig_leadtime_hist', montar_leadtime_hist)
         st.markdown("---")
     else:
         st.warning("Não foram encontrados dados de 'leadtime' para análise.")
 
-    # Análise de Correlação entre Estoque Crítico e Cancelamentos
-    st.subheader("Correlação entre Estoque Crítico e Cancelamentos")
-    st.markdown("Análise aprimorada com **níveis de risco** para investigar se a gravidade do problema de estoque influencia a taxa de cancelamento.")
-
-    # Separa IDs de produtos em 'Ruptura' (estoque=0) e 'Alerta' (estoque baixo)
-    ids_ruptura = produtos_criticos[produtos_criticos['dias_cobertura'] == 0]['material_id'].unique()
-    ids_alerta = produtos_criticos[(produtos_criticos['dias_cobertura'] > 0) & (produtos_criticos['dias_cobertura'] < 7)]['material_id'].unique()
+    # Projeção de ruptura: velocidade recente e leadtime de cada produto, com parâmetros de reposição ajustáveis
+    st.subheader("Projeção de Ruptura e Ponto de Pedido")
+    st.markdown("A velocidade de venda de cada produto ativo é calculada sobre os dias mais recentes. Ajuste os parâmetros para simular cenários de reposição: apenas a projeção é refeita, sem reprocessar as vendas diárias.")
+    matriz_vendas = perfilador.cache('carregar_matriz_vendas', carregar_matriz_vendas, fonte, modo_compacto)
+    if len(matriz_vendas.material_id) > 0:
+        n_dias = len(matriz_vendas.dias)
+        col_janela, col_leadtime, col_acrescimo, col_servico = st.columns(4)
+        janela = col_janela.slider("Janela da velocidade (dias)", 1, max(n_dias, 2), min(JANELA_VELOCIDADE, n_dias))
+        leadtime_padrao = col_leadtime.number_input(
+            "Leadtime padrão (dias)", min_value=0.0, value=float(round(leadtime_mediano(matriz_vendas))), step=1.0,
+            help="Usado nos produtos sem leadtime informado (padrão: a mediana dos informados)."
+        )
+        acrescimo_leadtime = col_acrescimo.slider("Acréscimo no leadtime (dias)", 0, 30, 0, help="Simula um atraso dos fornecedores.")
+        nivel_servico = col_servico.slider("Nível de serviço (%)", 50.0, 99.9, NIVEL_SERVICO * 100, step=0.1,
+                                           help="Define o estoque de segurança para a variação da demanda durante o leadtime.")
 
-    # Marca cada item no DataFrame principal com seu nível de risco
-    df_completo['risco_item'] = 'Baixo'
-    df_completo.loc[df_completo['material_id'].isin(ids_alerta), 'risco_item'] = 'Médio (Alerta)'
-    df_completo.loc[df_completo['material_id'].isin(ids_ruptura), 'risco_item'] = 'Alto (Ruptura)'
+        velocidade, desvio = perfilador.cache('calcular_velocidade', calcular_velocidade, fonte, modo_compacto, janela)
+        projecao = perfilador.dados('projetar_ruptura', projetar_ruptura,
+            matriz_vendas, velocidade, desvio, leadtime_padrao, acrescimo_leadtime, nivel_servico / 100
+        )
+        a_repor = projecao[projecao['repor']]
+        ultimo_dia = matriz_vendas.dias[-1]
+        col_repor, col_antes, col_semana = st.columns(3)
+        col_repor.metric("Produtos abaixo do ponto de pedido", f"{len(a_repor):,}")
+        col_antes.metric("Ruptura antes de uma nova reposição chegar", f"{int(projecao['ruptura_antes_reposicao'].sum()):,}")
+        col_semana.metric("Rupturas nos próximos 7 dias", f"{int((projecao['data_ruptura'] <= ultimo_dia + pd.Timedelta(days=7)).sum()):,}")
+        st.caption(f"Datas projetadas a partir de {ultimo_dia:%d/%m/%Y}, o último dia com pedidos.")
+
+        st.dataframe(
+            a_repor[['material_id', 'material_name', 'estoque_disponivel', 'velocidade_diaria', 'leadtime',
+                     'estoque_seguranca', 'ponto_pedido', 'data_ruptura', 'data_limite_pedido']],
+            hide_index=True,
+            column_config={
+                'estoque_disponivel': st.column_config.NumberColumn("Estoque", format='%.0f'),
+                'velocidade_diaria': st.column_config.NumberColumn("Vendas/dia", format='%.2f'),
+                'leadtime': st.column_config.NumberColumn("Leadtime (dias)", format='%.0f'),
+                'estoque_seguranca': st.column_config.NumberColumn("Estoque de segurança", format='%.1f'),
+                'ponto_pedido': st.column_config.NumberColumn("Ponto de pedido", format='%.1f'),
+                'data_ruptura': st.column_config.DateColumn("Ruptura prevista", format='DD/MM/YYYY'),
+                'data_limite_pedido': st.column_config.DateColumn("Pedir até", format='DD/MM/YYYY'),
+            }
+        )
 
-    # Determina o nível de risco máximo para cada pedido
-    df_completo['risco_num'] = df_completo['risco_item'].map({'Baixo': 0, 'Médio (Alerta)': 1, 'Alto (Ruptura)': 2})
-    risco_por_pedido = df_completo.groupby('id_pedido')['risco_num'].max().reset_index()
-    risco_map_inverso = {0: 'Baixo', 1: 'Médio (Alerta)', 2: 'Alto (Ruptura)'}
-    risco_por_pedido['nivel_risco_pedido'] = risco_por_pedido['risco_num'].map(risco_map_inverso)
+        # Vendas diárias e velocidade móvel de um produto da lista
+        if not a_repor.empty:
+            opcoes = a_repor['material_id'].head(50).tolist()
+            nomes = dict(zip(a_repor['material_id'], a_repor['material_name']))
+            material = st.selectbox("Vendas diárias do produto:", opcoes, format_func=lambda m: f"{m} - {nomes[m]}")
+            def montar_velocidade():
+                linha = np.searchsorted(matriz_vendas.material_id, material)
+                vendas_material = matriz_vendas.vendas[[linha]]
+                media_movel, _ = velocidade_movel(vendas_material, janela)
+                fig_velocidade = go.Figure([
+                    go.Bar(x=matriz_vendas.dias, y=vendas_material[0], name='Vendas no dia', marker_color='lightgray'),
+                    go.Scatter(x=matriz_vendas.dias, y=media_movel[0], mode='lines', name=f'Média móvel ({janela} dias)', line={'color': 'red'}),
+                ])
+                fig_velocidade.update_layout(title=f"Velocidade de Venda: {nomes[material]}", xaxis_title='Data', yaxis_title='Unidades')
+                return fig_velocidade
+            exibir_figura('fig_velocidade', montar_velocidade, material, janela)
+    else:
+        st.warning("Não foram encontrados produtos ativos com vendas para projetar rupturas.")
+    st.markdown("---")
 
-    # Identifica pedidos cancelados
-    status_cancelado = 'canceled'
-    df_pedidos_status = df_completo[['id_pedido', 'status_pedido']].drop_duplicates()
-    df_pedidos_status['foi_cancelado'] = (df_pedidos_status['status_pedido'] == status_cancelado)
+    # Análise de Correlação entre Estoque Crítico e Cancelamentos
+    st.subheader("Correlação entre Estoque Crítico e Cancelamentos")
+    st.markdown("Análise aprimorada com **níveis de risco** para investigar se a gravidade do problema de estoque influencia a taxa de cancelamento.")
 
-    # Junta as informações de risco e cancelamento
-    analise_corr_refinada = pd.merge(risco_por_pedido, df_pedidos_status[['id_pedido', 'foi_cancelado']], on='id_pedido')
+    # O nível de risco de cada item e o risco máximo de cada pedido já vêm do pipeline
+    # (pipeline.classificar_risco_itens e pipeline.montar_base_pedidos)
 
     # Calcula a taxa de cancelamento por nível de risco
-    taxa_cancelamento_por_risco = analise_corr_refinada.groupby('nivel_risco_pedido')['foi_cancelado'].mean().reset_index()
-    taxa_cancelamento_por_risco['taxa_percentual'] = (taxa_cancelamento_por_risco['foi_cancelado'] * 100)
+    taxa_cancelamento_por_risco = consultar('taxa_cancelamento_por_risco', 'df_pedidos')
 
     st.markdown("##### Comparativo da Taxa de Cancelamento por Nível de Risco de Supply")
-    ordem_risco = ['Baixo', 'Médio (Alerta)', 'Alto (Ruptura)']
-    fig_corr_refinada = px.bar(
-        taxa_cancelamento_por_risco,
-        x='nivel_risco_pedido',
-        y='taxa_percentual',
-        color='nivel_risco_pedido',
-        category_orders={'nivel_risco_pedido': ordem_risco}, 
-        title='Taxa de Cancelamento por Nível de Risco do Pedido',
-        labels={'nivel_risco_pedido': 'Nível de Risco de Supply', 'taxa_percentual': 'Taxa de Cancelamento (%)'},
-        text='taxa_percentual'
-    )
-    fig_corr_refinada.update_traces(texttemplate='%{text:.2f}%', textposition='outside')
-    st.plotly_chart(fig_corr_refinada, use_container_width=True)
+    def montar_corr_refinada():
+        fig_corr_refinada = perfilador.figura('fig_corr_refinada', px.bar,
+            taxa_cancelamento_por_risco,
+            x='nivel_risco_pedido',
+            y='taxa_percentual',
+            color='nivel_risco_pedido',
+            category_orders={'nivel_risco_pedido': kpis.ORDEM_RISCO}, 
+            title='Taxa de Cancelamento por Nível de Risco do Pedido',
+            labels={'nivel_risco_pedido': 'Nível de Risco de Supply', 'taxa_percentual': 'Taxa de Cancelamento (%)'},
+            text='taxa_percentual'
+        )
+        fig_corr_refinada.update_traces(texttemplate='%{text:.2f}%', textposition='outside')
+        return fig_corr_refinada
+    exibir_figura('fig_corr_refinada', montar_corr_refinada)
 
     st.markdown("""
     **Análise Aprimorada:** Comparamos a taxa de cancelamento entre três grupos de pedidos.
@@ -356,81 +524,60 @@ if df_pedidos_raw is not None:
     - **Risco Alto:** Pedidos com itens já esgotados.
     """)
 
-    # 3. ANÁLISE DE LOGÍSTICA & ENTREGAS
+def pagina_logistica():
+    """3. Análise de Logística & Entregas."""
     st.header("3. Análise de Logística & Entregas")
 
     st.subheader("Análise Geográfica de Performance")
     st.markdown("Use o seletor para alterar a métrica exibida no mapa e comparar a performance logística e de vendas entre os estados.")
-    df_logistica = df_completo.drop_duplicates(subset='id_pedido').copy()
-    df_logistica_valid_time = df_logistica[df_logistica['tempo_entrega_dias'] >= 0]
-
     # Seleciona a métrica para visualização
     metrica_selecionada = st.selectbox(
         "Selecione a Métrica para Visualizar:",
         ["Tempo Médio de Entrega", "Faturamento Total", "Ticket Médio"]
     )
 
-    # Prepara o DataFrame de acordo com a métrica selecionada
-    if metrica_selecionada == "Tempo Médio de Entrega":
-        df_mapa = df_logistica_valid_time.groupby('estado')['tempo_entrega_dias'].mean().round(1).reset_index()
-        coluna_cor = 'tempo_entrega_dias'
-        escala_cor = 'YlOrRd' # Amarelo para Vermelho (pior)
-        label_cor = 'Entrega (dias)'
-
-    elif metrica_selecionada == "Faturamento Total":
-        df_mapa = df_logistica.groupby('estado')['valor_nf'].sum().reset_index()
-        coluna_cor = 'valor_nf'
-        escala_cor = 'Blues' # Tons de Azul (melhor)
-        label_cor = 'Faturamento (R$)'
-
-    else: # Ticket Médio
-        df_mapa = df_logistica.groupby('estado')['valor_nf'].mean().reset_index()
-        coluna_cor = 'valor_nf'
-        escala_cor = 'Greens' # Tons de Verde (melhor)
-        label_cor = 'Ticket Médio (R$)'
-
-    # Mapea os estados para suas siglas
-    mapa_estados = {
-        'Acre': 'AC', 'Alagoas': 'AL', 'Amapá': 'AP', 'Amazonas': 'AM', 'Bahia': 'BA',
-        'Ceará': 'CE', 'Distrito Federal': 'DF', 'Espírito Santo': 'ES', 'Goiás': 'GO',
-        'Maranhão': 'MA', 'Mato Grosso': 'MT', 'Mato Grosso do Sul': 'MS', 'Minas Gerais': 'MG',
-        'Pará': 'PA', 'Paraíba': 'PB', 'Paraná': 'PR', 'Pernambuco': 'PE', 'Piauí': 'PI',
-        'Rio de Janeiro': 'RJ', 'Rio Grande do Norte': 'RN', 'Rio Grande do Sul': 'RS',
-        'Rondônia': 'RO', 'Roraima': 'RR', 'Santa Catarina': 'SC', 'São Paulo': 'SP',
-        'Sergipe': 'SE', 'Tocantins': 'TO'
-    }
-    df_mapa['sigla'] = df_mapa['estado'].map(mapa_estados)
-    df_mapa.dropna(subset=['sigla'], inplace=True)
-
-    # Carrega o GeoJSON dos estados brasileiros
-    caminho_geojson = os.path.join('data', 'brazil_states.geojson')
+    # Coluna, escala (amarelo para vermelho = pior; azul/verde = melhor) e rótulo de cada métrica
+    coluna_cor, escala_cor, label_cor = {
+        "Tempo Médio de Entrega": ('tempo_medio_entrega', 'YlOrRd', 'Entrega (dias)'),
+        "Faturamento Total": ('faturamento_total', 'Blues', 'Faturamento (R$)'),
+        "Ticket Médio": ('ticket_medio', 'Greens', 'Ticket Médio (R$)'),
+    }[metrica_selecionada]
+    df_mapa = consultar_cubo('metricas_por_estado').dropna(subset=[coluna_cor])
+
+    # Carrega o GeoJSON dos estados brasileiros (simplificado e cacheado uma vez por processo)
     try:
-        with open(caminho_geojson, "r", encoding='utf-8') as f:
-            geojson_br = json.load(f)
+        geojson_br, relatorio_geojson = perfilador.dados('carregar_geojson', carregar_geojson_simplificado)
         
         # 6. Criar o mapa de calor dinâmico
         if not df_mapa.empty:
-            fig_mapa = px.choropleth(
-                df_mapa,
-                geojson=geojson_br,
-                locations='sigla',
-                featureidkey="properties.sigla",
-                color=coluna_cor,
-                color_continuous_scale=escala_cor,
-                hover_name='estado',
-                hover_data={coluna_cor: ':.2f'},
-                labels={coluna_cor: label_cor}
-            )
+            def montar_mapa():
+                fig_mapa = perfilador.figura('fig_mapa', px.choropleth,
+                    df_mapa,
+                    geojson=geojson_br,
+                    locations='sigla',
+                    featureidkey="properties.sigla",
+                    color=coluna_cor,
+                    color_continuous_scale=escala_cor,
+                    hover_name='estado',
+                    hover_data={coluna_cor: ':.2f'},
+                    labels={coluna_cor: label_cor}
+                )
             
-            fig_mapa.update_geos(
-                visible=False, center={"lat": -14, "lon": -55},
-                lataxis_range=[-34, 6], lonaxis_range=[-74, -34]
+                fig_mapa.update_geos(
+                    visible=False, center={"lat": -14, "lon": -55},
+                    lataxis_range=[-34, 6], lonaxis_range=[-74, -34]
+                )
+                fig_mapa.update_layout(
+                    title_text=f"{metrica_selecionada} por Estado",
+                    margin={"r":0,"t":40,"l":0,"b":0}
+                )
+                return fig_mapa
+            exibir_figura('fig_mapa', montar_mapa, metrica_selecionada)
+            st.caption(
+                f"Geometria simplificada: {relatorio_geojson['bytes_original'] / 1024:,.0f} KB → "
+                f"{relatorio_geojson['bytes_simplificado'] / 1024:,.0f} KB por renderização "
+                f"({relatorio_geojson['pontos_original']:,} → {relatorio_geojson['pontos_simplificado']:,} vértices)."
             )
-            fig_mapa.update_layout(
-                title_text=f"{metrica_selecionada} por Estado",
-                margin={"r":0,"t":40,"l":0,"b":0}
-            )
-            st.plotly_chart(fig_mapa, use_container_width=True)
         else:
             st.error("A tabela de dados para o mapa está vazia.")
 
@@ -445,56 +592,71 @@ if df_pedidos_raw is not None:
     st.subheader("Análise do Funil Logístico por Transportadora")
     st.markdown("Decompomos o tempo total de entrega para identificar onde estão os maiores gargalos: no preparo interno do pedido ou no transporte.")
 
-    # Normaliza todas as datas para garantir consistência
-    df_funil = df_completo.drop_duplicates(subset='id_pedido').copy()
-    df_funil['data_pedido_norm'] = pd.to_datetime(df_funil['data_pedido']).dt.normalize()
-    df_funil['data_envio_norm'] = pd.to_datetime(df_funil['data_envio']).dt.normalize()
-    df_funil['data_entrega_norm'] = pd.to_datetime(df_funil['data_entrega']).dt.normalize()
-    df_funil['tempo_preparo'] = (df_funil['data_envio_norm'] - df_funil['data_pedido_norm']).dt.days
-    df_funil['tempo_transito'] = (df_funil['data_entrega_norm'] - df_funil['data_envio_norm']).dt.days
-
-    # Evita valores negativos que podem ocorrer devido a erros de data
-    df_funil = df_funil[(df_funil['tempo_preparo'] >= 0) & (df_funil['tempo_transito'] >= 0)]
-
-    # Calcula a média de cada etapa por transportadora
-    funil_por_transportadora = df_funil.groupby('transportadora').agg({
-        'tempo_preparo': 'mean',
-        'tempo_transito': 'mean'
-    }).reset_index()
-
-    # Prepara os dados para o gráfico de barras empilhadas, renomeia as colunas e cria o gráfico
-    df_melted = pd.melt(
-        funil_por_transportadora, 
-        id_vars='transportadora', 
-        value_vars=['tempo_preparo', 'tempo_transito'],
-        var_name='etapa',
-        value_name='dias'
-    )
+    def montar_funil():
+        # Média de cada etapa por transportadora (tempos já calculados das datas normalizadas no pipeline)
+        funil_por_transportadora = consultar_cubo('funil_por_transportadora')
+
+        # Prepara os dados para o gráfico de barras empilhadas, renomeia as colunas e cria o gráfico
+        df_melted = pd.melt(
+            funil_por_transportadora, 
+            id_vars='transportadora', 
+            value_vars=['tempo_preparo', 'tempo_transito'],
+            var_name='etapa',
+            value_name='dias'
+        )
 
-    mapa_legenda = {
-        'tempo_preparo': 'Tempo de Preparo',
-        'tempo_transito': 'Tempo de Trânsito'
-    }
-    df_melted['etapa'] = df_melted['etapa'].map(mapa_legenda)
-
-    fig_funil = px.bar(
-        df_melted,
-        x='transportadora',
-        y='dias',
-        color='etapa',
-        title='Tempo Médio de Preparo vs. Trânsito por Transportadora',
-        labels={'transportadora': 'Transportadora', 'dias': 'Tempo Médio (dias)', 'etapa': 'Etapa do Pedido'},
-        text='dias'
-    )
+        mapa_legenda = {
+            'tempo_preparo': 'Tempo de Preparo',
+            'tempo_transito': 'Tempo de Trânsito'
+        }
+        df_melted['etapa'] = df_melted['etapa'].map(mapa_legenda)
+
+        fig_funil = perfilador.figura('fig_funil', px.bar,
+            df_melted,
+            x='transportadora',
+            y='dias',
+            color='etapa',
+            title='Tempo Médio de Preparo vs. Trânsito por Transportadora',
+            labels={'transportadora': 'Transportadora', 'dias': 'Tempo Médio (dias)', 'etapa': 'Etapa do Pedido'},
+            text='dias'
+        )
     
-    fig_funil.update_traces(texttemplate='%{text:.1f}', textposition='inside')
-    st.plotly_chart(fig_funil, use_container_width=True)
+        fig_funil.update_traces(texttemplate='%{text:.1f}', textposition='inside')
+        return fig_funil
+    exibir_figura('fig_funil', montar_funil)
 
     st.markdown("""
     **Análise Inicial:** O gráfico de barras empilhadas mostra o tempo total de entrega dividido entre as duas principais etapas.
     - **Tempo de Preparo:** Reflete a eficiência operacional interna da Gocase.
     - **Tempo de Trânsito:** Reflete a performance da transportadora.
     """)
+
+    # Percentis dos tempos: a média esconde a cauda de pedidos lentos, que é o que pesa na negociação com as transportadoras
+    st.markdown("##### Distribuição dos Tempos: p50, p90 e p99")
+    st.markdown("Metade dos pedidos fica abaixo do p50; só 10% passam do p90 e 1% do p99.")
+    agrupamento_percentis = st.selectbox("Agrupar por:", ["Transportadora", "Estado", "Dia do Pedido"])
+    por = {"Transportadora": 'transportadora', "Estado": 'estado', "Dia do Pedido": 'dia'}[agrupamento_percentis]
+    def montar_percentis():
+        df_percentis = consultar_cubo('percentis_tempo', por)
+        df_percentis = df_percentis.melt(id_vars=[por, 'medida', 'pedidos'], var_name='percentil', value_name='dias')
+        df_percentis['medida'] = df_percentis['medida'].map(MEDIDAS_TEMPO)
+        if por == 'dia':
+            fig_percentis = perfilador.figura('fig_percentis', px.line,
+                df_percentis, x='dia', y='dias', color='percentil', facet_row='medida',
+                title='Percentis dos Tempos por Dia do Pedido',
+                labels={'dia': 'Dia do Pedido', 'dias': 'Dias', 'percentil': 'Percentil', 'medida': 'Tempo'},
+                hover_data=['pedidos']
+            )
+            fig_percentis.update_layout(height=650)
+        else:
+            fig_percentis = perfilador.figura('fig_percentis', px.bar,
+                df_percentis, x=por, y='dias', color='percentil', facet_col='medida', barmode='group',
+                title=f'Percentis dos Tempos por {agrupamento_percentis}',
+                labels={por: agrupamento_percentis, 'dias': 'Dias', 'percentil': 'Percentil', 'medida': 'Tempo'},
+                hover_data=['pedidos']
+            )
+        return fig_percentis
+    exibir_figura('fig_percentis', montar_percentis, por)
     st.markdown("---")
     
     # Análise de Cancelamentos e Atrasos na Entrega
@@ -502,10 +664,7 @@ if df_pedidos_raw is not None:
     st.markdown("##### Taxa Geral de Cancelamento")
 
     # Calcula a taxa de cancelamento geral
-    pedidos_unicos = df_completo.drop_duplicates(subset='id_pedido')
-    total_pedidos = len(pedidos_unicos)
-    pedidos_cancelados = len(pedidos_unicos[pedidos_unicos['status_pedido'] == 'canceled'])
-    taxa_cancelamento_geral = (pedidos_cancelados / total_pedidos) * 100
+    taxa_cancelamento_geral = consultar_cubo('taxa_cancelamento_geral')
 
     st.metric(label="Taxa de Cancelamento Geral", value=f"{taxa_cancelamento_geral:.2f}%")
 
@@ -513,26 +672,20 @@ if df_pedidos_raw is not None:
     st.markdown("Analisamos a taxa de cancelamento para cada transportadora para identificar se alguma apresenta uma performance inferior.")
 
     # Calcula a taxa de cancelamento por transportadora
-    cancel_por_transportadora = df_completo.groupby('transportadora')['status_pedido'].apply(
-        lambda x: (x == 'canceled').sum() / len(x) * 100
-    ).sort_values(ascending=False).reset_index(name='taxa_cancelamento')
-
-    # Filtra as transportadoras com volume relevante de pedidos para uma análise mais justa
-    transportadoras_relevantes = df_completo['transportadora'].value_counts()
-    cancel_por_transportadora = cancel_por_transportadora[
-        cancel_por_transportadora['transportadora'].isin(transportadoras_relevantes[transportadoras_relevantes > 50].index)
-    ]
-
-    fig_cancel_transportadora = px.bar(
-        cancel_por_transportadora,
-        x='transportadora',
-        y='taxa_cancelamento',
-        title='Taxa de Cancelamento (%) por Transportadora',
-        labels={'transportadora': 'Transportadora', 'taxa_cancelamento': 'Taxa de Cancelamento (%)'},
-        text='taxa_cancelamento'
-    )
-    fig_cancel_transportadora.update_traces(texttemplate='%{text:.2f}%', textposition='outside')
-    st.plotly_chart(fig_cancel_transportadora, use_container_width=True)
+    cancel_por_transportadora = consultar_cubo('cancelamento_por_transportadora')
+
+    def montar_cancel_transportadora():
+        fig_cancel_transportadora = perfilador.figura('fig_cancel_transportadora', px.bar,
+            cancel_por_transportadora,
+            x='transportadora',
+            y='taxa_cancelamento',
+            title='Taxa de Cancelamento (%) por Transportadora',
+            labels={'transportadora': 'Transportadora', 'taxa_cancelamento': 'Taxa de Cancelamento (%)'},
+            text='taxa_cancelamento'
+        )
+        fig_cancel_transportadora.update_traces(texttemplate='%{text:.2f}%', textposition='outside')
+        return fig_cancel_transportadora
+    exibir_figura('fig_cancel_transportadora', montar_cancel_transportadora)
     st.markdown("---")
 
     # Análise de Atrasos na Entrega
@@ -540,88 +693,142 @@ if df_pedidos_raw is not None:
     st.markdown("Analisamos o tempo médio de entrega por dia da semana e por categoria de produto. **Use o filtro abaixo para analisar uma transportadora específica.**")
 
     # Caixade seleção para filtrar por transportadora
-    lista_transportadoras = ['Todas'] + sorted(df_logistica['transportadora'].dropna().unique().tolist())
+    lista_transportadoras = ['Todas'] + sorted(df_pedidos['transportadora'].dropna().unique().tolist())
     transportadora_selecionada = st.selectbox(
         "Filtrar por Transportadora:",
         lista_transportadoras
     )
 
     # Filtra os DataFrames com base na seleção
-    if transportadora_selecionada == 'Todas':
-        df_logistica_filtrado = df_logistica
-        df_completo_filtrado = df_completo
-    else:
-        df_logistica_filtrado = df_logistica[df_logistica['transportadora'] == transportadora_selecionada]
-        df_completo_filtrado = df_completo[df_completo['transportadora'] == transportadora_selecionada]
+    atraso_por_dia_semana = consultar_cubo('atraso_por_dia_semana', transportadora_selecionada)
+    atraso_por_categoria = consultar_cubo('atraso_por_categoria', transportadora_selecionada)
 
     # Análise por Dia da Semana
-    if not df_logistica_filtrado.empty:
-        df_logistica_filtrado = df_logistica_filtrado.copy()
-        df_logistica_filtrado['dia_semana_num'] = df_logistica_filtrado['data_pedido'].dt.dayofweek
-        dias_semana_map = {
-            0: 'Segunda-feira', 1: 'Terça-feira', 2: 'Quarta-feira', 
-            3: 'Quinta-feira', 4: 'Sexta-feira', 5: 'Sábado', 6: 'Domingo'
-        }
-        df_logistica_filtrado['dia_semana_nome'] = df_logistica_filtrado['dia_semana_num'].map(dias_semana_map)
-
-        atraso_por_dia_semana = df_logistica_filtrado.groupby(['dia_semana_num', 'dia_semana_nome'])['tempo_entrega_dias'].mean().reset_index()
-
-        fig_atraso_dia_semana = px.bar(
-            atraso_por_dia_semana.sort_values('dia_semana_num'),
-            x='dia_semana_nome', y='tempo_entrega_dias',
-            title=f'Tempo Médio de Entrega por Dia da Semana ({transportadora_selecionada})',
-            labels={'dia_semana_nome': 'Dia da Semana', 'tempo_entrega_dias': 'Tempo Médio de Entrega (dias)'},
-            text='tempo_entrega_dias'
-        )
-        fig_atraso_dia_semana.update_traces(texttemplate='%{text:.1f}', textposition='outside')
-        st.plotly_chart(fig_atraso_dia_semana, use_container_width=True)
+    if not atraso_por_dia_semana.empty:
+        def montar_atraso_dia_semana():
+            fig_atraso_dia_semana = perfilador.figura('fig_atraso_dia_semana', px.bar,
+                atraso_por_dia_semana,
+                x='dia_semana_nome', y='tempo_entrega_dias',
+                title=f'Tempo Médio de Entrega por Dia da Semana ({transportadora_selecionada})',
+                labels={'dia_semana_nome': 'Dia da Semana', 'tempo_entrega_dias': 'Tempo Médio de Entrega (dias)'},
+                text='tempo_entrega_dias'
+            )
+            fig_atraso_dia_semana.update_traces(texttemplate='%{text:.1f}', textposition='outside')
+            return fig_atraso_dia_semana
+        exibir_figura('fig_atraso_dia_semana', montar_atraso_dia_semana, transportadora_selecionada)
     else:
         st.warning(f"Não há dados de entrega para a transportadora '{transportadora_selecionada}'.")
 
     # Análise por Categoria de Produto
-    if not df_completo_filtrado.empty:
-        atraso_por_categoria = df_completo_filtrado[df_completo_filtrado['tempo_entrega_dias'] >= 0].groupby('material_category')['tempo_entrega_dias'].mean().sort_values(ascending=False).reset_index()
-
-        fig_atraso_categoria = px.bar(
-            atraso_por_categoria.head(10), x='tempo_entrega_dias', y='material_category',
-            title=f'Top 10 Categorias com Maior Tempo de Entrega ({transportadora_selecionada})',
-            labels={'material_category': 'Categoria do Produto', 'tempo_entrega_dias': 'Tempo Médio de Entrega (dias)'},
-            text='tempo_entrega_dias'
-        )
-        fig_atraso_categoria.update_traces(texttemplate='%{text:.1f}', textposition='inside')
-        fig_atraso_categoria.update_layout(yaxis={'categoryorder':'total ascending'})
-        st.plotly_chart(fig_atraso_categoria, use_container_width=True)
+    if not atraso_por_categoria.empty:
+
+        def montar_atraso_categoria():
+            fig_atraso_categoria = perfilador.figura('fig_atraso_categoria', px.bar,
+                atraso_por_categoria.head(10), x='tempo_entrega_dias', y='material_category',
+                title=f'Top 10 Categorias com Maior Tempo de Entrega ({transportadora_selecionada})',
+                labels={'material_category': 'Categoria do Produto', 'tempo_entrega_dias': 'Tempo Médio de Entrega (dias)'},
+                text='tempo_entrega_dias'
+            )
+            fig_atraso_categoria.update_traces(texttemplate='%{text:.1f}', textposition='inside')
+            fig_atraso_categoria.update_layout(yaxis={'categoryorder':'total ascending'})
+            return fig_atraso_categoria
+        exibir_figura('fig_atraso_categoria', montar_atraso_categoria, transportadora_selecionada)
     
     # Análise de SLA (Service Level Agreement) das Transportadoras
     st.subheader("Performance de Entrega das Transportadoras (SLA)")
     st.markdown("Analisamos a porcentagem de entregas realizadas fora do prazo prometido por cada transportadora.")
 
-    # Dados necessários para análise de SLA
-    df_prazos = df_completo[['id_pedido', 'transportadora', 'data_entrega', 'prazo_entrega_transportadora']].drop_duplicates(subset='id_pedido').copy()
-    df_prazos.dropna(subset=['data_entrega', 'prazo_entrega_transportadora'], inplace=True)
-
-    # Normaliza as datas para comparação justa
-    df_prazos['data_entrega_norm'] = pd.to_datetime(df_prazos['data_entrega']).dt.normalize()
-    df_prazos['prazo_entrega_norm'] = pd.to_datetime(df_prazos['prazo_entrega_transportadora']).dt.normalize()
-
-    # Identifica entregas atrasadas
-    df_prazos['atrasado'] = df_prazos['data_entrega_norm'] > df_prazos['prazo_entrega_norm']
-
-    # Calcula a taxa de atraso por transportadora
-    sla_transportadora = df_prazos.groupby('transportadora').agg(
-        total_entregas=('id_pedido', 'count'),
-        entregas_atrasadas=('atrasado', 'sum')
-    ).reset_index()
-    sla_transportadora['taxa_atraso_%'] = (sla_transportadora['entregas_atrasadas'] / sla_transportadora['total_entregas'] * 100)
-
-    fig_sla = px.bar(
-        sla_transportadora.sort_values('taxa_atraso_%', ascending=False),
-        x='transportadora',
-        y='taxa_atraso_%',
-        title='Taxa de Atraso na Entrega (%) por Transportadora',
-        labels={'transportadora': 'Transportadora', 'taxa_atraso_%': 'Taxa de Atraso (%)'},
-        text='taxa_atraso_%',
-        hover_data=['entregas_atrasadas', 'total_entregas']
-    )
-    fig_sla.update_traces(texttemplate='%{text:.2f}%', textposition='outside')
-    st.plotly_chart(fig_sla, use_container_width=True)
\ No newline at end of file
+    def montar_sla():
+        # Taxa de atraso por transportadora (datas já normalizadas para o dia no pipeline)
+        sla_transportadora = consultar_cubo('sla_por_transportadora')
+
+        fig_sla = perfilador.figura('fig_sla', px.bar,
+            sla_transportadora.sort_values('taxa_atraso_%', ascending=False),
+            x='transportadora',
+            y='taxa_atraso_%',
+            title='Taxa de Atraso na Entrega (%) por Transportadora',
+            labels={'transportadora': 'Transportadora', 'taxa_atraso_%': 'Taxa de Atraso (%)'},
+            text='taxa_atraso_%',
+            hover_data=['entregas_atrasadas', 'total_entregas']
+        )
+        fig_sla.update_traces(texttemplate='%{text:.2f}%', textposition='outside')
+        return fig_sla
+    exibir_figura('fig_sla', montar_sla)
+
+# Modo compacto: tipos categóricos/inteiros reduzidos para diminuir a memória por sessão
+modo_compacto = st.sidebar.toggle("Modo compacto (menos memória)", value=False)
+
+# Perfil de desempenho: tempo, memória, linhas e cache de cada seção desta execução
+perfilador = perfil.Perfilador(st.sidebar.toggle("Perfil de desempenho", value=False))
+
+# O tracemalloc do perfil é desligado mesmo se a execução for interrompida (ex.: um widget alterado pede uma nova execução)
+try:
+    try:
+        atualizador = obter_atualizador()
+        versao_dados = perfilador.dados('versao_atual', atualizador.versao_atual, modo_compacto)
+        if versao_dados is None:
+            # Primeira versão do processo: preparada pela thread do atualizador; as demais sessões não ficam travadas
+            with st.spinner("🔄 Processando os dados pela primeira vez..."):
+                versao_dados = perfilador.dados('aguardar_versao', atualizador.aguardar_versao)
+        if versao_dados is None:
+            raise atualizador.erro
+        fonte = versao_dados.fonte
+        bases = perfilador.cache('processar_dados', processar_dados, fonte, modo_compacto)
+    except FileNotFoundError:
+        st.error("Erro: Arquivos de dados não encontrados. Verifique se eles estão na pasta 'data'.")
+        bases = None
+    except Exception as e:
+        # O atualizador já agendou uma nova tentativa: recarregar a página espera por ela
+        st.error(f"Ocorreu um erro ao processar os dados: {e}. Recarregue a página para tentar novamente.")
+        bases = None
+
+    if bases is not None:
+        df_completo, df_pedidos, df_supply_agg = bases.df_completo, bases.df_pedidos, bases.df_supply_agg
+        produtos_criticos, relatorio_esquema = bases.produtos_criticos, bases.relatorio_esquema
+        meses_analisados = [m for m in df_pedidos['ano_mes'].unique() if m != 'NaT']
+        st.markdown(f"Análise dos dados de Vendas, Estoque e Logística {descrever_periodo(meses_analisados)}.")
+
+        # Versão servida: as planilhas novas são processadas em segundo plano e só então substituem esta
+        st.sidebar.caption(
+            f"Dados: versão `{fonte[1]}` ({'partições' if fonte[0] == 'particoes' else 'planilhas'}), "
+            f"publicada {descrever_idade(time.time() - versao_dados.publicada_em)}"
+        )
+        if atualizador.atualizando:
+            st.sidebar.caption("🔄 Processando uma versão nova dos dados...")
+        if atualizador.erro is not None:
+            st.sidebar.warning(f"A última atualização falhou; a versão anterior continua em uso. ({atualizador.erro})")
+
+        # Relatório de memória das bases compactadas
+        if bases.relatorio_memoria is not None:
+            totais = bases.relatorio_memoria[['bytes_antes', 'bytes_depois']].sum() / 1024 ** 2
+            st.sidebar.metric(
+                "Memória das bases", f"{totais['bytes_depois']:,.1f} MB",
+                delta=f"{totais['bytes_depois'] - totais['bytes_antes']:,.1f} MB", delta_color='inverse'
+            )
+            with st.sidebar.expander("Memória por coluna"):
+                st.dataframe(bases.relatorio_memoria, hide_index=True)
+
+        st.success("Bases de dados otimizadas, tratadas e unificadas!")
+        coagidas = relatorio_esquema[(relatorio_esquema['linhas_coagidas'] > 0) | (relatorio_esquema['linhas_descartadas'] > 0)]
+        if not coagidas.empty:
+            with st.expander(f"⚠️ {len(coagidas)} coluna(s) com valores inválidos na conversão de tipos"):
+                st.dataframe(coagidas, hide_index=True)
+
+        # Apenas a página selecionada é executada a cada interação
+        pagina = st.navigation([
+            st.Page(pagina_vendas, title="Vendas & Conversão", icon="🛒", url_path='vendas', default=True),
+            st.Page(pagina_supply, title="Supply Chain & Estoque", icon="📦", url_path='supply'),
+            st.Page(pagina_logistica, title="Logística & Entregas", icon="🚚", url_path='logistica'),
+        ])
+        pagina.run()
+
+        # Cache de figuras: contadores do processo (todas as sessões), já incluindo esta execução
+        figuras = obter_cache_figuras().estatisticas()
+        st.sidebar.caption(
+            f"Figuras em cache: {figuras['figuras']} ({figuras['mb']:,.1f} MB) · "
+            f"{figuras['acertos']} acertos, {figuras['faltas']} faltas, {figuras['descartes']} descartes"
+        )
+
+    perfilador.exibir_painel()
+finally:
+    perfilador.encerrar()
@@ -0,0 +1,172 @@
+import os
+import threading
+import time
+from typing import NamedTuple
+
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+from compartilhado import obter_bases
+from ingestao import PASTA_DADOS, PLANILHAS, carregar_planilhas
+from particoes import PASTA_EXPORTACOES, carregar_bases_particionadas, identificar_fonte
+from pipeline import montar_bases
+
+# Espera após o último evento antes de reprocessar: uma planilha sendo copiada gera vários eventos seguidos
+ESPERA_SEGUNDOS = 5
+
+
+class VersaoDados(NamedTuple):
+    fonte: tuple          # (tipo, versao), a chave dos caches do dashboard
+    publicada_em: float   # instante (time.time()) em que a versão passou a ser servida
+
+
+def montar_versao(fonte, compacto=False):
+    """Bases da versão `fonte` montadas fora de uma sessão do Streamlit (sem barra de progresso)."""
+    tipo, _ = fonte
+    if tipo == 'particoes':
+        return carregar_bases_particionadas(compacto=compacto)
+    return montar_bases(*carregar_planilhas(), compacto=compacto)
+
+
+def descrever_idade(segundos):
+    """Idade por extenso, ex.: 'há 5 min'."""
+    if segundos < 60:
+        return "há menos de 1 min"
+    if segundos < 3600:
+        return f"há {int(segundos // 60)} min"
+    if segundos < 86400:
+        return f"há {int(segundos // 3600)} h"
+    return f"há {int(segundos // 86400)} dia(s)"
+
+
+def _relevante(caminho, pasta_dados=PASTA_DADOS):
+    """Se o evento em `caminho` pode mudar os dados: as planilhas de `pasta_dados` ou qualquer arquivo das exportações.
+
+    O cache, as partições e as bases publicadas são gravados pelo próprio
+    processamento e não disparam uma nova atualização.
+    """
+    caminho = os.path.abspath(caminho)
+    if caminho.startswith(os.path.abspath(PASTA_EXPORTACOES) + os.sep):
+        return True
+    arquivos = {arquivo for arquivo, _ in PLANILHAS.values()}
+    return os.path.dirname(caminho) == os.path.abspath(pasta_dados) and os.path.basename(caminho) in arquivos
+
+
+class _Observador(FileSystemEventHandler):
+    def __init__(self, atualizador):
+        self.atualizador = atualizador
+
+    def on_any_event(self, event):
+        caminhos = [event.src_path, getattr(event, 'dest_path', '')]
+        if not event.is_directory and any(caminho and _relevante(caminho, self.atualizador.pasta_dados) for caminho in caminhos):
+            self.atualizador.agendar()
+
+
+class Atualizador:
+    """Observa a pasta de dados e prepara as versões novas em segundo plano (stale-while-revalidate).
+
+    As sessões leem `versao_atual()` no início de cada execução e continuam
+    recebendo a versão anterior enquanto a nova é processada; a primeira
+    versão do processo também é preparada na thread, e as sessões que chegam
+    antes dela esperam com `aguardar_versao()`, sem travar umas às outras (se
+    ela falhar, uma nova tentativa é agendada para a sessão seguinte). Numa thread
+    própria, o atualizador identifica a versão (ingerindo as exportações
+    novas), monta e publica as bases (`compartilhado.obter_bases`) e executa
+    `aquecer(fonte, compacto)`, que pré-calcula os agregados derivados. Só
+    então a versão servida é trocada, numa única atribuição: a sessão que
+    rodar em seguida já encontra tudo pronto.
+    """
+
+    def __init__(self, aquecer=None, pasta_dados=PASTA_DADOS, espera=ESPERA_SEGUNDOS):
+        self.aquecer = aquecer
+        self.pasta_dados = pasta_dados
+        self.espera = espera
+        self.atualizando = False
+        self.erro = None
+        self._versao = None
+        self._modos = {False}
+        self._trava = threading.Lock()
+        self._pendente = threading.Event()
+        self._tentativa_concluida = threading.Event()
+        self._temporizador = None
+        self._observador = None
+
+    def iniciar(self):
+        """Começa a observar a pasta de dados (recursivamente, incluindo as exportações) e inicia a thread de atualização."""
+        self._observador = Observer()
+        self._observador.schedule(_Observador(self), self.pasta_dados, recursive=True)
+        self._observador.daemon = True
+        self._observador.start()
+        self._pendente.set()  # prepara a primeira versão já na thread, fora das sessões
+        threading.Thread(target=self._executar, name='atualizador-dados', daemon=True).start()
+        return self
+
+    def parar(self):
+        if self._observador is not None:
+            self._observador.stop()
+        if self._temporizador is not None:
+            self._temporizador.cancel()
+
+    def versao_atual(self, compacto=False):
+        """Versão servida às sessões, ou `None` enquanto a primeira ainda está sendo preparada.
+
+        Registra o modo (`compacto`) pedido, para que as próximas versões
+        também sejam preparadas nele.
+        """
+        with self._trava:
+            self._modos.add(compacto)
+        return self._versao
+
+    def aguardar_versao(self, timeout=None):
+        """Espera a tentativa de atualização em andamento terminar e retorna a versão servida.
+
+        Se ainda não há versão porque a tentativa falhou (ver `erro`), retorna
+        `None` e agenda uma nova tentativa: a próxima sessão espera por ela em
+        vez de receber o mesmo erro até a pasta de dados mudar.
+        """
+        self._tentativa_concluida.wait(timeout)
+        with self._trava:
+            if self._versao is None and self._tentativa_concluida.is_set():
+                self._tentativa_concluida.clear()
+                self._pendente.set()
+        return self._versao
+
+    def agendar(self):
+        """Agenda uma atualização para `espera` segundos após o último evento."""
+        with self._trava:
+            if self._temporizador is not None:
+                self._temporizador.cancel()
+            self._temporizador = threading.Timer(self.espera, self._pendente.set)
+            self._temporizador.daemon = True
+            self._temporizador.start()
+
+    def _executar(self):
+        while True:
+            self._pendente.wait()
+            self._pendente.clear()
+            self.atualizar()
+
+    def atualizar(self):
+        """Prepara a versão atual dos dados, se for nova, e passa a servi-la; retorna a versão servida.
+
+        Em caso de erro (ex.: planilha ainda incompleta), a versão anterior
+        continua sendo servida e o erro fica em `erro` até a próxima tentativa.
+        """
+        self.atualizando = True
+        try:
+            fonte = identificar_fonte()
+            if self._versao is None or fonte != self._versao.fonte:
+                with self._trava:
+                    modos = sorted(self._modos)
+                for compacto in modos:
+                    obter_bases(fonte, lambda: montar_versao(fonte, compacto), compacto)
+                    if self.aquecer is not None:
+                        self.aquecer(fonte, compacto)
+                self._versao = VersaoDados(fonte, time.time())
+            self.erro = None
+        except Exception as erro:
+            self.erro = erro
+        finally:
+            self.atualizando = False
+            self._tentativa_concluida.set()
+        return self._versao
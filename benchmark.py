@@ -0,0 +1,206 @@
+import argparse
+import gc
+import os
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import kpis
+from cesta import montar_indice_cesta
+from pipeline import RISCO_MAP, calcular_cobertura_estoque, classificar_risco_itens, montar_base_completa, montar_base_pedidos
+from segmentos import algum, indexar, somar
+from sintetico import CATEGORIAS, STATUS_PEDIDO, TRANSPORTADORAS, gerar_dados
+from vetorizado import classificar_niveis, estilo_linhas, rotular_niveis, taxa_por_grupo, truncar_texto
+
+PASTA_BENCHMARKS = 'benchmarks'
+TAMANHOS_PADRAO = [10_000, 100_000, 1_000_000]
+# Acima deste tamanho a versão de referência do destaque por linha (lambda por linha) levaria minutos
+LIMITE_REFERENCIA_ESTILO = 1_000_000
+
+
+def medir(funcao, *args, memoria=True):
+    """Executa `funcao(*args)` e retorna `(resultado, segundos, pico_mb)`.
+
+    O tempo é medido sem o tracemalloc, que deixa as alocações mais lentas; com
+    `memoria=True` a função é executada uma segunda vez apenas para medir o pico
+    de memória alocada.
+    """
+    gc.collect()
+    inicio = time.perf_counter()
+    resultado = funcao(*args)
+    segundos = time.perf_counter() - inicio
+    pico_mb = np.nan
+    if memoria:
+        gc.collect()
+        tracemalloc.start()
+        funcao(*args)
+        pico_mb = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+        tracemalloc.stop()
+    return resultado, segundos, pico_mb
+
+
+def _linhas(tabela):
+    return len(tabela[0]) if isinstance(tabela, tuple) else len(tabela)
+
+
+def executar_secoes(df_pedidos_raw, df_itens_raw, df_supply_raw, memoria=True):
+    """Mede cada seção do dashboard em sequência, na ordem do pipeline.
+
+    Retorna uma linha por seção com tempo, pico de memória e linhas de
+    entrada/saída.
+    """
+    resultados = []
+
+    def registrar(secao, funcao, *args):
+        resultado, segundos, pico_mb = medir(funcao, *args, memoria=memoria)
+        resultados.append({
+            'secao': secao, 'segundos': segundos, 'pico_mb': pico_mb,
+            'linhas_entrada': _linhas(args[0]), 'linhas_saida': _linhas(resultado),
+        })
+        return resultado
+
+    df_completo, df_pedidos, df_supply_agg, _ = registrar('merge', montar_base_completa, df_pedidos_raw, df_itens_raw, df_supply_raw)
+    produtos_criticos = registrar('cobertura', calcular_cobertura_estoque, df_completo)
+    df_completo = registrar('risco', lambda df, criticos: classificar_risco_itens(df.copy(), criticos), df_completo, produtos_criticos)
+    df_pedidos = registrar('base_pedidos', montar_base_pedidos, df_pedidos, df_completo)
+    registrar('cesta', lambda df: montar_indice_cesta(df).regras(), df_completo)
+    registrar('rankings', lambda df: (kpis.maior_faturamento(df), kpis.menor_faturamento(df)), df_completo)
+    registrar('desconto', kpis.analise_desconto, df_pedidos)
+    registrar('geo', kpis.metricas_por_estado, df_pedidos)
+    registrar('funil', kpis.funil_por_transportadora, df_pedidos)
+    registrar('cancelamento', kpis.cancelamento_por_transportadora, df_pedidos)
+    registrar('atraso_categoria', kpis.atraso_por_categoria, df_completo)
+    registrar('sla', kpis.sla_por_transportadora, df_pedidos)
+    return resultados
+
+
+def _entradas_kernels(n, semente=0):
+    """Colunas sintéticas no formato das bases, sem passar pelo pipeline (viável com 10M de linhas)."""
+    rng = np.random.default_rng(semente)
+    n_materiais = 20_000
+    nomes = np.array([f'{CATEGORIAS[i % len(CATEGORIAS)]} Estampa {i}' + ' Edição Especial Coleção Verão' * (i % 3 == 0)
+                      for i in range(n_materiais)], dtype=object)
+    material = rng.integers(0, n_materiais, n)
+    # Em média 1,6 item por pedido, com os ids de pedido embaralhados como na exportação
+    id_pedido = rng.integers(0, max(n * 5 // 8, 1), n) + 1
+    return {
+        'transportadora': pd.Series(np.asarray(list(TRANSPORTADORAS), dtype=object)[rng.integers(0, len(TRANSPORTADORAS), n)]),
+        'status': pd.Series(np.asarray(list(STATUS_PEDIDO), dtype=object)[rng.integers(0, len(STATUS_PEDIDO), n)]),
+        'material_id': pd.Series(material + 1),
+        'material_name': pd.Series(nomes[material]),
+        'ids_alerta': np.arange(1, n_materiais // 10),
+        'ids_ruptura': np.arange(n_materiais // 10, n_materiais // 5),
+        'tabela': pd.DataFrame({'material_id': material + 1, 'dias_cobertura': rng.integers(0, 14, n)}),
+        'id_pedido': pd.Series(id_pedido),
+        'valor': pd.Series(rng.gamma(2.0, 60.0, n)),
+        # Montado uma vez e reaproveitado por todas as agregações por pedido, como em `montar_base_pedidos`
+        'indice_pedidos': indexar(id_pedido),
+    }
+
+
+def _taxa_referencia(e):
+    return e['status'].groupby(e['transportadora']).apply(lambda x: (x == 'canceled').sum() / len(x) * 100)
+
+
+def _truncar_referencia(e):
+    return e['material_name'].apply(lambda x: (x[:45] + '...') if len(x) > 45 else x)
+
+
+def _risco_referencia(e):
+    risco = pd.Series('Baixo', index=e['material_id'].index)
+    risco.loc[e['material_id'].isin(e['ids_alerta'])] = 'Médio (Alerta)'
+    risco.loc[e['material_id'].isin(e['ids_ruptura'])] = 'Alto (Ruptura)'
+    return risco.map(RISCO_MAP)
+
+
+def _estilo_referencia(e):
+    # O que o `Styler.apply(..., axis=1)` executa: uma chamada Python por linha
+    tabela = e['tabela']
+    return tabela.apply(lambda x: ['background-color: #FF7F7F' if x.dias_cobertura < 7 else '' for i in x], axis=1, result_type='expand')
+
+
+def _estilo_vetorizado(e):
+    tabela = e['tabela']
+    return estilo_linhas(tabela, tabela['dias_cobertura'] < 7, 'background-color: #FF7F7F')
+
+
+KERNELS = {
+    'taxa_por_grupo': (_taxa_referencia, lambda e: taxa_por_grupo(e['transportadora'], e['status'] == 'canceled')['taxa']),
+    'truncar_texto': (_truncar_referencia, lambda e: truncar_texto(e['material_name'], 45)),
+    'classificar_risco': (_risco_referencia, lambda e: rotular_niveis(classificar_niveis(e['material_id'], [e['ids_alerta'], e['ids_ruptura']]), list(RISCO_MAP))),
+    'estilo_linhas': (_estilo_referencia, _estilo_vetorizado),
+    'somar_por_pedido': (lambda e: e['valor'].groupby(e['id_pedido']).sum(), lambda e: somar(e['indice_pedidos'], e['valor'])),
+    'contem_material': (lambda e: (e['material_id'] == 1).groupby(e['id_pedido']).any(),
+                        lambda e: algum(e['indice_pedidos'], e['material_id'] == 1)),
+}
+
+
+def executar_kernels(tamanhos=(1_000_000, 10_000_000), semente=0):
+    """Compara o tempo de cada kernel de `vetorizado` com a implementação por linha/grupo que ele substituiu."""
+    linhas = []
+    for n in tamanhos:
+        entradas = _entradas_kernels(n, semente)
+        for nome, (referencia, vetorizado) in KERNELS.items():
+            _, segundos, _ = medir(vetorizado, entradas, memoria=False)
+            segundos_referencia = np.nan
+            if nome != 'estilo_linhas' or n <= LIMITE_REFERENCIA_ESTILO:
+                _, segundos_referencia, _ = medir(referencia, entradas, memoria=False)
+            linhas.append({'n_linhas': n, 'kernel': nome, 'segundos': segundos,
+                           'segundos_referencia': segundos_referencia, 'aceleracao': segundos_referencia / segundos})
+        del entradas
+    return pd.DataFrame(linhas)
+
+
+def executar_benchmark(tamanhos=TAMANHOS_PADRAO, semente=0, memoria=True):
+    """Gera dados sintéticos em cada tamanho (linhas de itens) e mede todas as seções.
+
+    A coluna `expoente` estima como o tempo cresce com os dados entre um tamanho
+    e o anterior (1 = linear; valores bem acima de 1 indicam um passo
+    superlinear).
+    """
+    linhas = []
+    for n_itens in tamanhos:
+        bases_raw = gerar_dados(n_itens, semente=semente)
+        for linha in executar_secoes(*bases_raw, memoria=memoria):
+            linhas.append({'n_itens': n_itens, **linha})
+        del bases_raw
+
+    resultado = pd.DataFrame(linhas)
+    resultado = resultado.sort_values(['secao', 'n_itens'])
+    anterior = resultado.groupby('secao')[['n_itens', 'segundos']].shift()
+    resultado['expoente'] = (
+        np.log(resultado['segundos'] / anterior['segundos']) / np.log(resultado['n_itens'] / anterior['n_itens'])
+    ).round(2)
+    return resultado.sort_values(['n_itens', 'secao']).reset_index(drop=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mede tempo e memória de cada seção do dashboard em dados sintéticos.")
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=TAMANHOS_PADRAO, help="Linhas de itens (ex.: 10000 100000 1000000 10000000)")
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--sem-memoria', action='store_true', help="Mede apenas o tempo (metade das execuções)")
+    parser.add_argument('--saida', default=PASTA_BENCHMARKS, help=f"Pasta dos resultados (padrão: {PASTA_BENCHMARKS})")
+    parser.add_argument('--kernels', action='store_true', help="Compara os kernels vetorizados com as versões por linha/grupo")
+    args = parser.parse_args(argv)
+
+    if args.kernels:
+        resultado = executar_kernels(args.tamanhos, args.semente)
+        tabela = resultado.pivot(index='kernel', columns='n_linhas', values=['segundos', 'segundos_referencia'])
+        prefixo = 'kernels'
+    else:
+        resultado = executar_benchmark(args.tamanhos, args.semente, memoria=not args.sem_memoria)
+        tabela = resultado.pivot(index='secao', columns='n_itens', values='segundos')
+        prefixo = 'benchmark'
+    os.makedirs(args.saida, exist_ok=True)
+    destino = os.path.join(args.saida, f"{prefixo}_{time.strftime('%Y%m%d-%H%M%S')}")
+    resultado.to_csv(f'{destino}.csv', index=False)
+    resultado.to_json(f'{destino}.json', orient='records', force_ascii=False, indent=2)
+
+    print(tabela.round(3).to_string())
+    print(f"\nResultados gravados em '{destino}.csv' e '{destino}.json'")
+
+
+if __name__ == '__main__':
+    main()
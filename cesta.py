@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+class IndiceCesta:
+    """Índice de co-ocorrência de produtos para a análise de cesta de compras.
+
+    Guarda a matriz de incidência pedido x produto (binária, esparsa) e a matriz
+    de co-ocorrência produto x produto derivada dela. A diagonal da
+    co-ocorrência é o número de pedidos que contêm cada produto; fora da
+    diagonal, o número de pedidos em que os dois produtos aparecem juntos.
+    """
+
+    def __init__(self, incidencia, produtos):
+        self.incidencia = incidencia
+        self.produtos = produtos
+        self.posicao = pd.Series(np.arange(len(produtos)), index=produtos)
+        self.coocorrencia = (incidencia.T @ incidencia).tocsr()
+        self.total_pedidos = incidencia.shape[0]
+        self.pedidos_por_produto = self.coocorrencia.diagonal()
+
+    def produtos_mais_frequentes(self):
+        """Lista de produtos ordenada pelo número de pedidos em que aparecem."""
+        ordem = np.argsort(-self.pedidos_por_produto, kind='stable')
+        return self.produtos[ordem].tolist()
+
+    def associados(self, produto, n=5):
+        """Os `n` produtos mais comprados junto com `produto`, com suporte, confiança e lift."""
+        if produto not in self.posicao.index:
+            return self._tabela_regras(np.array([], dtype=int), np.array([], dtype=int), np.array([]))
+        i = self.posicao[produto]
+        linha = self.coocorrencia.getrow(i)
+        fora_diagonal = linha.indices != i
+        colunas, contagens = linha.indices[fora_diagonal], linha.data[fora_diagonal]
+        ordem = np.lexsort((colunas, -contagens))[:n]
+        return self._tabela_regras(np.full(len(ordem), i), colunas[ordem], contagens[ordem])
+
+    def regras(self, min_pedidos=1):
+        """Suporte, confiança e lift de todos os pares de produtos comprados juntos em pelo menos `min_pedidos` pedidos."""
+        pares = self.coocorrencia.tocoo()
+        mascara = (pares.row != pares.col) & (pares.data >= min_pedidos)
+        return self._tabela_regras(pares.row[mascara], pares.col[mascara], pares.data[mascara])
+
+    def _tabela_regras(self, origem, destino, contagem):
+        total = max(self.total_pedidos, 1)
+        pedidos_origem = self.pedidos_por_produto[origem]
+        pedidos_destino = self.pedidos_por_produto[destino]
+        confianca = contagem / np.maximum(pedidos_origem, 1)
+        return pd.DataFrame({
+            'produto': self.produtos[origem],
+            'produto_associado': self.produtos[destino],
+            'contagem': contagem.astype(int),
+            'suporte': contagem / total,
+            'confianca': confianca,
+            'lift': confianca / np.maximum(pedidos_destino / total, 1e-12),
+        })
+
+
+def montar_indice_cesta(df_completo):
+    """Monta o índice de cesta a partir da base no grão de item.
+
+    Linhas de pedidos sem itens (sem `material_id`) não entram no índice. Um
+    produto repetido no mesmo pedido conta uma única vez.
+    """
+    itens = df_completo.loc[df_completo['material_id'].notna(), ['id_pedido', 'material_name']]
+    codigos_pedido, _ = pd.factorize(itens['id_pedido'])
+    codigos_produto, produtos = pd.factorize(itens['material_name'])
+
+    incidencia = sparse.csr_matrix(
+        (np.ones(len(itens), dtype=np.int32), (codigos_pedido, codigos_produto)),
+        shape=(codigos_pedido.max() + 1 if len(itens) else 0, len(produtos))
+    )
+    incidencia.data[:] = 1
+    return IndiceCesta(incidencia, np.asarray(produtos, dtype=object))
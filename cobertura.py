@@ -0,0 +1,150 @@
+from statistics import NormalDist
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+# Parâmetros padrão da projeção (ajustáveis no dashboard)
+JANELA_VELOCIDADE = 14   # dias usados na velocidade de venda recente
+NIVEL_SERVICO = 0.95   # probabilidade de não faltar estoque durante o leadtime
+
+COLUNAS_PROJECAO = [
+    'material_id', 'material_name', 'estoque_disponivel', 'velocidade_diaria', 'desvio_diario', 'leadtime',
+    'estoque_seguranca', 'ponto_pedido', 'dias_ate_ruptura', 'data_ruptura', 'data_limite_pedido',
+    'repor', 'ruptura_antes_reposicao',
+]
+
+
+class MatrizVendas(NamedTuple):
+    """Vendas diárias dos materiais ativos (material x dia) e os atributos de estoque de cada linha."""
+    vendas: np.ndarray          # unidades vendidas, uma linha por material e uma coluna por dia
+    material_id: np.ndarray
+    material_name: np.ndarray
+    dias: pd.DatetimeIndex      # um dia por coluna, contínuo do primeiro ao último pedido
+    estoque: np.ndarray         # estoque disponível atual (0 quando não informado)
+    leadtime: np.ndarray        # leadtime informado em dias (NaN quando ausente ou zero)
+
+
+def montar_matriz_vendas(df_completo, df_supply_agg):
+    """Monta a matriz material x dia com as unidades vendidas de cada material ativo.
+
+    Uma única passada de `np.bincount` sobre os itens: cada linha da base
+    vira um índice `material * n_dias + dia`. Dias sem venda ficam com 0,
+    de modo que médias móveis refletem a velocidade real no calendário. O
+    nome do material é o do primeiro item na ordem da base, como em
+    `pipeline.calcular_cobertura_estoque`.
+    """
+    ativos = df_completo[
+        (df_completo['discontinued'].fillna(False) == False)
+        & df_completo['material_id'].notna() & df_completo['data_pedido_norm'].notna()
+    ]
+    if ativos.empty:
+        vazio = np.array([])
+        return MatrizVendas(np.zeros((0, 0), dtype=np.float32), vazio, vazio, pd.DatetimeIndex([]), vazio, vazio)
+
+    codigos, ids = pd.factorize(ativos['material_id'], sort=True)
+    inicio = ativos['data_pedido_norm'].min()
+    dia = (ativos['data_pedido_norm'] - inicio).dt.days.to_numpy()
+    n_materiais, n_dias = len(ids), int(dia.max()) + 1
+    vendas = np.bincount(
+        codigos * n_dias + dia, weights=ativos['quantidade'].to_numpy(dtype=float), minlength=n_materiais * n_dias
+    ).astype(np.float32).reshape(n_materiais, n_dias)
+
+    # Primeira ocorrência de cada código (os códigos vão de 0 a n_materiais - 1)
+    _, primeira_linha = np.unique(codigos, return_index=True)
+    supply = df_supply_agg.set_index('material_id').reindex(ids)
+    leadtime = supply['leadtime'].to_numpy(dtype=float)
+    return MatrizVendas(
+        vendas=vendas,
+        material_id=np.asarray(ids),
+        material_name=ativos['material_name'].to_numpy(dtype=object)[primeira_linha],
+        dias=pd.date_range(inicio, periods=n_dias, freq='D'),
+        estoque=supply['estoque_disponivel'].fillna(0).to_numpy(dtype=float),
+        leadtime=np.where(leadtime > 0, leadtime, np.nan),
+    )
+
+
+def velocidade_movel(vendas, janela=JANELA_VELOCIDADE):
+    """Média e desvio-padrão móveis das vendas diárias em `janela` dias, para todos os materiais de uma vez.
+
+    Usa somas acumuladas (das vendas e dos quadrados) em vez de uma janela por
+    material. Retorna `(media, desvio)` no mesmo formato de `vendas`; nos
+    primeiros dias, a janela é o período disponível até ali.
+    """
+    vendas = np.asarray(vendas, dtype=np.float64)
+    n_dias = vendas.shape[1]
+    janela = max(1, min(janela, n_dias))
+    zeros = np.zeros((vendas.shape[0], 1))
+    soma = np.concatenate([zeros, np.cumsum(vendas, axis=1)], axis=1)
+    soma_quadrados = np.concatenate([zeros, np.cumsum(vendas ** 2, axis=1)], axis=1)
+    fim = np.arange(1, n_dias + 1)
+    comeco = np.maximum(fim - janela, 0)
+    tamanho = fim - comeco
+    media = (soma[:, fim] - soma[:, comeco]) / tamanho
+    variancia = (soma_quadrados[:, fim] - soma_quadrados[:, comeco]) / tamanho - media ** 2
+    return media, np.sqrt(np.clip(variancia, 0, None))
+
+
+def velocidade_atual(matriz, janela=JANELA_VELOCIDADE):
+    """Velocidade (média) e desvio diário de cada material nos últimos `janela` dias do período."""
+    if matriz.vendas.shape[1] == 0:
+        return np.zeros(len(matriz.material_id)), np.zeros(len(matriz.material_id))
+    janela = max(1, min(janela, matriz.vendas.shape[1]))
+    recentes = matriz.vendas[:, -janela:].astype(np.float64)
+    return recentes.mean(axis=1), recentes.std(axis=1)
+
+
+def leadtime_mediano(matriz):
+    """Mediana dos leadtimes informados: valor padrão para materiais sem leadtime."""
+    informados = matriz.leadtime[~np.isnan(matriz.leadtime)]
+    return float(np.median(informados)) if len(informados) else 0.0
+
+
+def projetar_ruptura(matriz, velocidade, desvio, leadtime_padrao=None, acrescimo_leadtime=0, nivel_servico=NIVEL_SERVICO):
+    """Data de ruptura, estoque de segurança e ponto de pedido de todos os materiais, vetorizados.
+
+    Recebe a velocidade e o desvio já calculados (ver `velocidade_atual`),
+    de modo que mudar os parâmetros de reposição não reprocessa a matriz:
+
+    - `leadtime_padrao` substitui os leadtimes não informados (padrão: a mediana dos informados);
+    - `acrescimo_leadtime` soma dias a todos os leadtimes (ex.: atraso do fornecedor);
+    - `nivel_servico` define o estoque de segurança `z * desvio * sqrt(leadtime)`.
+
+    O ponto de pedido é `velocidade * leadtime + estoque_seguranca`. As datas
+    são projetadas a partir do último dia da matriz; materiais sem venda na
+    janela não têm data de ruptura. Retorna uma linha por material, da
+    ruptura mais próxima para a mais distante.
+    """
+    if len(matriz.material_id) == 0:
+        return pd.DataFrame(columns=COLUNAS_PROJECAO)
+    if leadtime_padrao is None:
+        leadtime_padrao = leadtime_mediano(matriz)
+    leadtime = np.where(np.isnan(matriz.leadtime), leadtime_padrao, matriz.leadtime) + acrescimo_leadtime
+    leadtime = np.clip(leadtime, 0, None)
+    z = NormalDist().inv_cdf(nivel_servico)
+    estoque_seguranca = z * desvio * np.sqrt(leadtime)
+    ponto_pedido = velocidade * leadtime + estoque_seguranca
+
+    vende = velocidade > 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dias_ate_ruptura = np.where(vende, matriz.estoque / velocidade, np.inf)
+        dias_ate_pedido = np.where(vende, (matriz.estoque - ponto_pedido) / velocidade, np.nan)
+    ultimo_dia = matriz.dias[-1]
+    dias_ruptura_finitos = np.where(np.isfinite(dias_ate_ruptura), np.floor(dias_ate_ruptura), np.nan)
+
+    projecao = pd.DataFrame({
+        'material_id': matriz.material_id,
+        'material_name': matriz.material_name,
+        'estoque_disponivel': matriz.estoque,
+        'velocidade_diaria': velocidade,
+        'desvio_diario': desvio,
+        'leadtime': leadtime,
+        'estoque_seguranca': estoque_seguranca,
+        'ponto_pedido': ponto_pedido,
+        'dias_ate_ruptura': dias_ate_ruptura,
+        'data_ruptura': ultimo_dia + pd.to_timedelta(dias_ruptura_finitos, unit='D'),
+        'data_limite_pedido': ultimo_dia + pd.to_timedelta(np.floor(dias_ate_pedido), unit='D'),
+        'repor': vende & (matriz.estoque <= ponto_pedido),
+        'ruptura_antes_reposicao': dias_ate_ruptura < leadtime,
+    })
+    return projecao.sort_values(['dias_ate_ruptura', 'velocidade_diaria'], ascending=[True, False], kind='stable').reset_index(drop=True)
@@ -0,0 +1,170 @@
+import argparse
+import json
+import os
+import shutil
+import tracemalloc
+
+import pandas as pd
+import pyarrow as pa
+
+from ingestao import PASTA_CACHE, escrever_atomico, salvar_json
+from particoes import identificar_fonte
+from pipeline import VERSAO_PIPELINE, BasesProcessadas
+
+# Bases processadas publicadas em Arrow IPC, uma subpasta por versão dos dados, versão do pipeline e modo
+PASTA_COMPARTILHADA = os.path.join(PASTA_CACHE, 'compartilhado')
+# Acima desta fração do tamanho das bases (mais o custo fixo da interface), uma sessão nova está copiando os dados
+FRACAO_MAXIMA_SESSAO = 0.25
+CUSTO_FIXO_SESSAO_MB = 8
+
+
+def _pasta_versao(fonte, compacto, pasta=PASTA_COMPARTILHADA):
+    # A versão do pipeline entra na chave: um deploy que muda as bases não reaproveita as publicadas pelo código anterior
+    tipo, versao = fonte
+    return os.path.join(pasta, f"{tipo}-{versao}-p{VERSAO_PIPELINE}-{'compacto' if compacto else 'completo'}")
+
+
+def _escrever_arrow(df, destino):
+    tabela = pa.Table.from_pandas(df)
+    with pa.OSFile(destino, 'wb') as arquivo, pa.ipc.new_file(arquivo, tabela.schema) as gravador:
+        gravador.write_table(tabela)
+
+
+def _ler_arrow(caminho):
+    """DataFrame sobre o arquivo mapeado em memória.
+
+    Colunas numéricas e de datas sem nulos são visões somente leitura das
+    páginas do arquivo (sem cópia, e compartilhadas pelo sistema operacional
+    entre processos); textos e colunas com nulos são convertidos uma vez.
+    """
+    with pa.memory_map(caminho, 'r') as mapa:
+        tabela = pa.ipc.open_file(mapa).read_all()
+    return tabela.to_pandas(split_blocks=True)
+
+
+def publicar_bases(bases, fonte, compacto=False, pasta=PASTA_COMPARTILHADA):
+    """Grava cada tabela de `bases` como Arrow IPC (sem compressão) na pasta da versão `fonte`.
+
+    O `tabelas.json` é gravado por último e marca a publicação como completa;
+    as publicações de outras versões (dos dados ou do pipeline) são removidas.
+    Retorna a pasta publicada.
+    """
+    destino = _pasta_versao(fonte, compacto, pasta)
+    os.makedirs(destino, exist_ok=True)
+    tabelas = []
+    for nome, df in bases._asdict().items():
+        if df is None:
+            continue
+        escrever_atomico(os.path.join(destino, f'{nome}.arrow'), lambda temporario, df=df: _escrever_arrow(df, temporario))
+        tabelas.append(nome)
+    escrever_atomico(os.path.join(destino, 'tabelas.json'), lambda temporario: salvar_json(tabelas, temporario))
+
+    # Processos que ainda mapeiam uma versão antiga continuam lendo o arquivo já removido
+    modo = os.path.basename(destino).rsplit('-', 1)[1]
+    for antiga in os.listdir(pasta):
+        if antiga != os.path.basename(destino) and antiga.endswith(f'-{modo}'):
+            shutil.rmtree(os.path.join(pasta, antiga), ignore_errors=True)
+    return destino
+
+
+def abrir_bases(fonte, compacto=False, pasta=PASTA_COMPARTILHADA):
+    """Bases publicadas da versão `fonte`, mapeadas em memória; `None` se ainda não foram publicadas."""
+    destino = _pasta_versao(fonte, compacto, pasta)
+    try:
+        with open(os.path.join(destino, 'tabelas.json'), encoding='utf-8') as f:
+            tabelas = json.load(f)
+    except FileNotFoundError:
+        return None
+    return BasesProcessadas(**{nome: _ler_arrow(os.path.join(destino, f'{nome}.arrow')) for nome in tabelas})
+
+
+def obter_bases(fonte, montar, compacto=False, pasta=PASTA_COMPARTILHADA):
+    """Bases da versão `fonte` prontas para serem compartilhadas por todas as sessões do processo.
+
+    Se a versão ainda não foi publicada, executa `montar()`, publica o
+    resultado e descarta a cópia em memória. Assim, todo processo (inclusive
+    após um reinício) lê as mesmas bases mapeadas do disco. Os DataFrames
+    retornados são compartilhados: devem ser só lidos, nunca alterados no
+    lugar.
+    """
+    bases = abrir_bases(fonte, compacto, pasta)
+    if bases is None:
+        publicar_bases(montar(), fonte, compacto, pasta)
+        bases = abrir_bases(fonte, compacto, pasta)
+    return bases
+
+
+def tamanho_bases(bases):
+    """Bytes ocupados pelas tabelas das bases no pandas (inclui o conteúdo dos textos)."""
+    return int(sum(df.memory_usage(deep=True).sum() for df in bases if isinstance(df, pd.DataFrame)))
+
+
+# --- Verificação: memória por sessão ---
+
+def medir_sessoes(n_sessoes=4, script='app.py', timeout=300):
+    """Abre `n_sessoes` sessões do dashboard no mesmo processo e mede a memória de cada uma com o tracemalloc.
+
+    As sessões ficam abertas até o fim, como usuários conectados ao mesmo
+    tempo. Retorna uma linha por sessão com a memória retida (`retido_mb`)
+    e o pico durante a execução (`pico_mb`), ambos relativos ao início dela.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    tracemalloc.start()
+    sessoes, linhas = [], []
+    try:
+        for numero in range(1, n_sessoes + 1):
+            inicio = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            sessao = AppTest.from_file(script, default_timeout=timeout).run()
+            atual, pico = tracemalloc.get_traced_memory()
+            sessoes.append(sessao)
+            linhas.append({
+                'sessao': numero, 'retido_mb': (atual - inicio) / 1024 ** 2, 'pico_mb': (pico - inicio) / 1024 ** 2,
+                'erros': len(sessao.exception) + len(sessao.error),
+            })
+    finally:
+        tracemalloc.stop()
+    return pd.DataFrame(linhas)
+
+
+def verificar_sessoes(medicoes, bytes_bases, fracao_maxima=FRACAO_MAXIMA_SESSAO, custo_fixo_mb=CUSTO_FIXO_SESSAO_MB):
+    """Confere que, da segunda sessão em diante, nenhuma retém ou aloca uma fração relevante das bases.
+
+    A primeira sessão monta (ou mapeia) as bases; as seguintes devem custar
+    aproximadamente o mesmo, bem abaixo do tamanho dos dados: o limite é
+    `fracao_maxima` das bases mais `custo_fixo_mb` (widgets e figuras).
+    Retorna a lista de problemas encontrados (vazia se a verificação passou).
+    """
+    limite_mb = fracao_maxima * bytes_bases / 1024 ** 2 + custo_fixo_mb
+    problemas = [f"sessão {linha.sessao}: {linha.erros} erro(s) na execução" for linha in medicoes.itertuples() if linha.erros]
+    for linha in medicoes.iloc[1:].itertuples():
+        if max(linha.retido_mb, linha.pico_mb) > limite_mb:
+            problemas.append(
+                f"sessão {linha.sessao}: retido {linha.retido_mb:,.1f} MB, pico {linha.pico_mb:,.1f} MB (limite {limite_mb:,.1f} MB)"
+            )
+    return problemas
+
+
+def main(argv=None):
+    # Sem suíte de testes no projeto, a verificação da memória por sessão é este comando: termina com erro se ela falhar
+    parser = argparse.ArgumentParser(description="Mede a memória de sessões simultâneas do dashboard sobre as bases compartilhadas.")
+    parser.add_argument('--sessoes', type=int, default=4, help="Número de sessões abertas (padrão: 4)")
+    parser.add_argument('--script', default='app.py')
+    args = parser.parse_args(argv)
+
+    medicoes = medir_sessoes(args.sessoes, args.script)
+    bases = abrir_bases(identificar_fonte())
+    if bases is None:
+        raise SystemExit("As bases não foram publicadas pelo dashboard.")
+    bytes_bases = tamanho_bases(bases)
+    print(medicoes.round(2).to_string(index=False))
+    print(f"\nBases compartilhadas: {bytes_bases / 1024 ** 2:,.1f} MB")
+    problemas = verificar_sessoes(medicoes, bytes_bases)
+    for problema in problemas:
+        print(problema)
+    raise SystemExit(1 if problemas else 0)
+
+
+if __name__ == '__main__':
+    main()
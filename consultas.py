@@ -0,0 +1,313 @@
+import argparse
+import os
+import time
+
+import pandas as pd
+
+import kpis
+from ingestao import PASTA_CACHE
+from particoes import PASTA_PARTICOES, carregar_bases_particionadas, ingerir_novas_exportacoes, meses_para_leitura, versao_particoes
+from pipeline import COLUNAS_COBERTURA, finalizar_cobertura
+
+try:
+    import duckdb
+except ImportError:  # dependência opcional: sem ela, só o backend pandas fica disponível
+    duckdb = None
+
+# Onde o DuckDB despeja dados intermediários quando uma consulta excede o limite de memória
+PASTA_TEMPORARIA = os.path.join(PASTA_CACHE, 'consultas')
+
+# KPIs que todo backend implementa: 8 das tabelas de `kpis.calcular_todos` (mesmos nomes), as que mais pesam nas
+# partições. As demais, o dashboard e o `kpis.py` continuam calculando só no pandas, sobre as bases em memória
+KPIS = [
+    'metricas_por_estado', 'funil_por_transportadora', 'cancelamento_por_transportadora', 'sla_por_transportadora',
+    'maior_faturamento_produto', 'maior_faturamento_categoria', 'atraso_por_categoria', 'cobertura_estoque',
+]
+
+
+class BackendPandas:
+    """Referência: monta as bases do dashboard em memória e usa as funções de `kpis`."""
+
+    nome = 'pandas'
+
+    def __init__(self, pasta_particoes=PASTA_PARTICOES, meses=None):
+        if meses is None and pasta_particoes == PASTA_PARTICOES:
+            # Todos os meses do armazenamento padrão: as mesmas bases publicadas que o dashboard usa
+            meses_para_leitura(pasta_particoes=pasta_particoes)
+            self.bases = kpis.carregar_bases(('particoes', versao_particoes()))
+        else:
+            self.bases = carregar_bases_particionadas(meses, pasta_particoes)
+
+    def metricas_por_estado(self):
+        return kpis.metricas_por_estado(self.bases.df_pedidos)
+
+    def funil_por_transportadora(self):
+        return kpis.funil_por_transportadora(self.bases.df_pedidos)
+
+    def cancelamento_por_transportadora(self, min_pedidos=kpis.MIN_PEDIDOS_TRANSPORTADORA):
+        return kpis.cancelamento_por_transportadora(self.bases.df_pedidos, min_pedidos)
+
+    def sla_por_transportadora(self):
+        return kpis.sla_por_transportadora(self.bases.df_pedidos)
+
+    def maior_faturamento(self, visao='Produto', n=10):
+        return kpis.maior_faturamento(self.bases.df_completo, visao, n)
+
+    def atraso_por_categoria(self, transportadora=None):
+        return kpis.atraso_por_categoria(self.bases.df_completo, transportadora)
+
+    def cobertura_estoque(self):
+        return self.bases.produtos_criticos
+
+
+class BackendDuckDB:
+    """Executa as junções e agregações no DuckDB, direto sobre as partições Parquet.
+
+    Nada é carregado no pandas além do resultado de cada consulta: o DuckDB
+    lê só as colunas usadas, paraleliza em todos os núcleos e, acima de
+    `limite_memoria`, despeja em disco (`data/.cache/consultas`). As regras
+    finais (arredondamentos, filtros de volume, siglas e ordenação) são as
+    mesmas do pandas, aplicadas aos resultados já agregados. As junções e
+    agregações, porém, são uma segunda escrita dos KPIs de `kpis.py` em SQL:
+    `verificar_equivalencia` é o que garante que as duas continuam iguais.
+    """
+
+    nome = 'duckdb'
+
+    def __init__(self, pasta_particoes=PASTA_PARTICOES, meses=None, limite_memoria=None):
+        if duckdb is None:
+            raise ImportError("O backend 'duckdb' requer o pacote duckdb (pip install duckdb).")
+        self.conexao = duckdb.connect()
+        os.makedirs(PASTA_TEMPORARIA, exist_ok=True)
+        self.conexao.execute(f"SET temp_directory = '{PASTA_TEMPORARIA}'")
+        if limite_memoria:
+            self.conexao.execute(f"SET memory_limit = '{limite_memoria}'")
+        self._criar_visoes(pasta_particoes, meses_para_leitura(meses, pasta_particoes))
+
+    def _criar_visoes(self, pasta_particoes, meses):
+        def ler(tabela):
+            arquivos = [os.path.join(pasta_particoes, tabela, f'ano_mes={m}', 'dados.parquet') for m in meses]
+            lista = ', '.join(f"'{a}'" for a in arquivos)
+            return (f"read_parquet([{lista}], hive_partitioning = true, hive_types = {{'ano_mes': VARCHAR}}, "
+                    "filename = true, file_row_number = true)")
+
+        # `filename` + `file_row_number` reproduzem a ordem do `pd.concat` dos meses (desempates e "primeiro" valor)
+        self.conexao.execute(f"CREATE VIEW pedidos AS SELECT * FROM {ler('pedidos')}")
+        self.conexao.execute(f"CREATE VIEW itens AS SELECT * FROM {ler('itens')}")
+        caminho_supply = os.path.join(pasta_particoes, 'supply.parquet')
+        self.conexao.execute(f"CREATE VIEW supply AS SELECT * FROM read_parquet('{caminho_supply}')")
+        # Grão de pedido: uma linha por id_pedido (a primeira), como o `drop_duplicates` de `montar_base_pedidos`
+        self.conexao.execute("""
+            CREATE VIEW pedidos_unicos AS
+            SELECT *, coalesce(status_pedido = 'canceled', false) AS foi_cancelado FROM pedidos
+            QUALIFY row_number() OVER (PARTITION BY id_pedido ORDER BY filename, file_row_number) = 1
+        """)
+        # Grão de item: Pedidos -> Itens -> Supply, como `pipeline.unir_bases`
+        self.conexao.execute("""
+            CREATE VIEW completo AS
+            SELECT p.id_pedido, p.data_pedido, p.transportadora, p.tempo_entrega_dias,
+                   i.material_id, coalesce(i.material_name, 'Não informado') AS material_name, i.material_category,
+                   i.quantidade, i.quantidade * i.price AS faturamento_item,
+                   s.estoque_disponivel, s.discontinued,
+                   p.filename AS arquivo_pedido, p.file_row_number AS linha_pedido,
+                   i.filename AS arquivo_item, i.file_row_number AS linha_item
+            FROM pedidos p
+            LEFT JOIN itens i ON p.id_pedido = i.id_pedido
+            LEFT JOIN supply s ON i.material_id = s.material_id
+        """)
+
+    def _consultar(self, sql, parametros=None):
+        return self.conexao.execute(sql, parametros or []).df()
+
+    def metricas_por_estado(self):
+        metricas = self._consultar("""
+            SELECT estado, coalesce(sum(valor_nf), 0) AS faturamento_total, avg(valor_nf) AS ticket_medio,
+                   avg(tempo_entrega_dias) FILTER (WHERE tempo_entrega_dias >= 0) AS tempo_medio_entrega
+            FROM pedidos_unicos WHERE estado IS NOT NULL GROUP BY estado ORDER BY estado
+        """)
+        metricas['tempo_medio_entrega'] = metricas['tempo_medio_entrega'].round(1)
+        metricas['sigla'] = metricas['estado'].map(kpis.MAPA_ESTADOS)
+        return metricas.dropna(subset=['sigla'])
+
+    def funil_por_transportadora(self):
+        return self._consultar("""
+            SELECT transportadora, avg(tempo_preparo) AS tempo_preparo, avg(tempo_transito) AS tempo_transito
+            FROM pedidos_unicos
+            WHERE tempo_preparo >= 0 AND tempo_transito >= 0 AND transportadora IS NOT NULL
+            GROUP BY transportadora ORDER BY transportadora
+        """)
+
+    def cancelamento_por_transportadora(self, min_pedidos=kpis.MIN_PEDIDOS_TRANSPORTADORA):
+        cancel = self._consultar("""
+            SELECT transportadora, count(*) AS total, count(*) FILTER (WHERE status_pedido = 'canceled') AS ocorrencias
+            FROM pedidos_unicos WHERE transportadora IS NOT NULL GROUP BY transportadora ORDER BY transportadora
+        """).set_index('transportadora')
+        cancel = cancel[cancel['total'] > min_pedidos]
+        taxa = cancel['ocorrencias'] / cancel['total'] * 100
+        return taxa.sort_values(ascending=False).reset_index(name='taxa_cancelamento')
+
+    def sla_por_transportadora(self):
+        sla = self._consultar("""
+            SELECT transportadora, count(id_pedido) AS total_entregas,
+                   count(*) FILTER (WHERE data_entrega_norm > prazo_entrega_norm) AS entregas_atrasadas
+            FROM pedidos_unicos
+            WHERE data_entrega_norm IS NOT NULL AND prazo_entrega_norm IS NOT NULL AND transportadora IS NOT NULL
+            GROUP BY transportadora ORDER BY transportadora
+        """)
+        sla['taxa_atraso_%'] = sla['entregas_atrasadas'] / sla['total_entregas'] * 100
+        return sla
+
+    def maior_faturamento(self, visao='Produto', n=10):
+        coluna = kpis.COLUNA_VISAO[visao]
+        # O `nlargest` é feito no pandas para desempatar exatamente como a referência
+        totais = self._consultar(f"""
+            SELECT {coluna}, coalesce(sum(faturamento_item), 0) AS faturamento_item
+            FROM completo WHERE {coluna} IS NOT NULL GROUP BY {coluna} ORDER BY {coluna}
+        """).set_index(coluna)['faturamento_item']
+        return totais.nlargest(n).reset_index()
+
+    def atraso_por_categoria(self, transportadora=None):
+        filtro, parametros = '', []
+        if transportadora not in (None, 'Todas'):
+            filtro, parametros = 'AND transportadora = ?', [transportadora]
+        atraso = self._consultar(f"""
+            SELECT material_category, avg(tempo_entrega_dias) AS tempo_entrega_dias
+            FROM completo WHERE tempo_entrega_dias >= 0 AND material_category IS NOT NULL {filtro}
+            GROUP BY material_category ORDER BY material_category
+        """, parametros).set_index('material_category')['tempo_entrega_dias']
+        return atraso.sort_values(ascending=False).reset_index()
+
+    def cobertura_estoque(self):
+        self.conexao.execute("""
+            CREATE OR REPLACE TEMP VIEW ativos AS
+            SELECT * FROM completo WHERE coalesce(discontinued, false) = false
+        """)
+        minimo, maximo = self.conexao.execute("SELECT min(data_pedido), max(data_pedido) FROM ativos").fetchone()
+        if minimo is None:
+            return pd.DataFrame(columns=COLUNAS_COBERTURA)
+        vendas_estoque = self._consultar("""
+            SELECT material_id, sum(quantidade)::BIGINT AS vendas_totais,
+                   first(material_name ORDER BY arquivo_pedido, linha_pedido, arquivo_item, linha_item) AS material_name,
+                   first(estoque_disponivel ORDER BY arquivo_pedido, linha_pedido, arquivo_item, linha_item) AS estoque_disponivel
+            FROM ativos WHERE material_id IS NOT NULL GROUP BY material_id ORDER BY material_id
+        """)
+        return finalizar_cobertura(
+            vendas_estoque[['material_id', 'vendas_totais']],
+            vendas_estoque[['material_id', 'material_name', 'estoque_disponivel']],
+            (pd.Timestamp(maximo) - pd.Timestamp(minimo)).days,
+        )
+
+
+BACKENDS = {'pandas': BackendPandas, 'duckdb': BackendDuckDB}
+
+
+def abrir_backend(nome='pandas', pasta_particoes=PASTA_PARTICOES, meses=None, **opcoes):
+    """Instancia o backend `nome` ('pandas' ou 'duckdb') sobre as partições de `pasta_particoes`."""
+    if nome not in BACKENDS:
+        raise ValueError(f"Backend desconhecido: '{nome}'. Opções: {', '.join(BACKENDS)}.")
+    return BACKENDS[nome](pasta_particoes, meses, **opcoes)
+
+
+def calcular_kpis(backend):
+    """Calcula todas as tabelas de `KPIS` com o backend. Retorna `(tabelas, tempos)`, como `kpis.calcular_todos`."""
+    calculos = {
+        'metricas_por_estado': backend.metricas_por_estado,
+        'funil_por_transportadora': backend.funil_por_transportadora,
+        'cancelamento_por_transportadora': backend.cancelamento_por_transportadora,
+        'sla_por_transportadora': backend.sla_por_transportadora,
+        'maior_faturamento_produto': lambda: backend.maior_faturamento('Produto'),
+        'maior_faturamento_categoria': lambda: backend.maior_faturamento('Categoria'),
+        'atraso_por_categoria': backend.atraso_por_categoria,
+        'cobertura_estoque': backend.cobertura_estoque,
+    }
+    tabelas, tempos = {}, {}
+    for nome, calcular in calculos.items():
+        inicio = time.perf_counter()
+        tabelas[nome] = calcular()
+        tempos[nome] = time.perf_counter() - inicio
+    return tabelas, tempos
+
+
+def _normalizar(df):
+    """Tabela comparável entre backends: índice limpo e tipos nullable/categóricos convertidos para os básicos."""
+    df = df.reset_index(drop=True).copy()
+    for coluna in df.columns:
+        if isinstance(df[coluna].dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(df[coluna]):
+            df[coluna] = df[coluna].astype(object)
+        elif pd.api.types.is_numeric_dtype(df[coluna]):
+            df[coluna] = df[coluna].astype(float)
+    return df
+
+
+def comparar_tabelas(referencia, candidata, tolerancia=1e-9):
+    """`None` se as tabelas têm as mesmas linhas, na mesma ordem, e os mesmos valores (números com tolerância relativa); senão, a diferença encontrada."""
+    referencia, candidata = _normalizar(referencia), _normalizar(candidata)
+    if list(referencia.columns) != list(candidata.columns):
+        return f"colunas diferentes: {list(referencia.columns)} x {list(candidata.columns)}"
+    try:
+        pd.testing.assert_frame_equal(referencia, candidata, check_exact=False, rtol=tolerancia, atol=tolerancia)
+    except AssertionError as erro:
+        return ' '.join(str(erro).split())
+    return None
+
+
+def verificar_equivalencia(pasta_particoes=PASTA_PARTICOES, meses=None, backend='duckdb'):
+    """Calcula os KPIs com o pandas (referência) e com `backend` e compara tabela a tabela.
+
+    Retorna um DataFrame com uma linha por KPI: `kpi`, `linhas`, `iguais`,
+    `detalhe` (a primeira diferença) e o tempo de cada backend; o tempo de
+    abertura de cada um (no pandas, a montagem das bases) fica em
+    `relatorio.attrs['segundos_carga']`.
+    """
+    instancias, cargas = {}, {}
+    for nome in ('pandas', backend):
+        inicio = time.perf_counter()
+        instancias[nome] = abrir_backend(nome, pasta_particoes, meses)
+        cargas[nome] = time.perf_counter() - inicio
+    referencia, tempos_referencia = calcular_kpis(instancias['pandas'])
+    candidato, tempos_candidato = calcular_kpis(instancias[backend])
+    linhas = []
+    for nome in KPIS:
+        detalhe = comparar_tabelas(referencia[nome], candidato[nome])
+        linhas.append({
+            'kpi': nome, 'linhas': len(referencia[nome]), 'iguais': detalhe is None, 'detalhe': detalhe or '',
+            'segundos_pandas': tempos_referencia[nome], f'segundos_{backend}': tempos_candidato[nome],
+        })
+    relatorio = pd.DataFrame(linhas)
+    relatorio.attrs['segundos_carga'] = cargas
+    return relatorio
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="KPIs calculados direto das partições Parquet, com backend plugável.")
+    parser.add_argument('--backend', choices=list(BACKENDS), default='duckdb')
+    parser.add_argument('--particoes', default=PASTA_PARTICOES, help=f"Pasta das partições (padrão: {PASTA_PARTICOES})")
+    parser.add_argument('--meses', nargs='+', default=None, help="Meses (AAAA-MM); padrão: todos os armazenados")
+    parser.add_argument('--verificar', action='store_true', help="Compara o backend escolhido com o pandas, KPI a KPI")
+    parser.add_argument('--saida', default=None, help="Grava as tabelas calculadas nesta pasta (Parquet)")
+    args = parser.parse_args(argv)
+
+    # Num checkout novo as partições ainda não existem: ingere as exportações pendentes antes de consultar
+    ingerir_novas_exportacoes(pasta_particoes=args.particoes)
+    try:
+        if args.verificar:
+            relatorio = verificar_equivalencia(args.particoes, args.meses, args.backend)
+        else:
+            tabelas, tempos = calcular_kpis(abrir_backend(args.backend, args.particoes, args.meses))
+    except FileNotFoundError as erro:
+        raise SystemExit(str(erro))
+
+    if args.verificar:
+        with pd.option_context('display.max_colwidth', 120, 'display.width', 200):
+            print(relatorio.round(3).to_string(index=False))
+        print('Abertura: ' + ', '.join(f"{nome} {segundos:.2f}s" for nome, segundos in relatorio.attrs['segundos_carga'].items()))
+        raise SystemExit(0 if relatorio['iguais'].all() else 1)
+
+    if args.saida:
+        kpis.salvar_tabelas(tabelas, args.saida)
+    for nome, df in tabelas.items():
+        print(f"{nome}: {len(df):,} linhas em {tempos[nome]:.3f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,276 @@
+import argparse
+import time
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+import kpis
+import quantis
+from consultas import comparar_tabelas
+
+# Grão do cubo: dia do pedido, estado, transportadora, categoria, material e status do pedido
+DIMENSOES_PEDIDOS = ['dia', 'estado', 'transportadora', 'status_pedido']
+DIMENSOES_ITENS = ['dia', 'estado', 'transportadora', 'material_category', 'material_id', 'status_pedido']
+# Atributos que dependem só do material: entram no agrupamento sem aumentar o número de células
+ATRIBUTOS_MATERIAL = ['material_name', 'discontinued']
+
+
+class Cubo(NamedTuple):
+    """Agregados somáveis das bases, montados uma vez por versão dos dados.
+
+    Contagens de pedidos distintos não se somam entre produtos (um pedido
+    tem vários itens), por isso as medidas de pedido ficam em um cuboide sem
+    as dimensões de produto, e as de item no grão completo. Percentis não
+    se somam: os tempos ficam como histogramas, que se somam.
+    """
+    pedidos: pd.DataFrame   # DIMENSOES_PEDIDOS + pedidos, cancelados, valor da NF, somas de dias e atrasos
+    itens: pd.DataFrame     # DIMENSOES_ITENS + ATRIBUTOS_MATERIAL + itens, faturamento e somas de dias de entrega
+    tempos: pd.DataFrame    # quantis.DIMENSOES_HISTOGRAMA + pedidos: histogramas dos tempos de preparo, trânsito e entrega
+
+
+def _agregar(medidas, dimensoes):
+    """Soma das colunas de medida por combinação de dimensões, mantendo as células com dimensões nulas.
+
+    As dimensões de texto viram categorias: os recortes e consolidações
+    comparam códigos inteiros, e o cubo ocupa uma fração da memória.
+    """
+    cubo = medidas.groupby(dimensoes, observed=True, dropna=False, sort=False).sum().reset_index()
+    textos = [coluna for coluna in dimensoes if cubo[coluna].dtype == object]
+    return cubo.astype({coluna: 'category' for coluna in textos})
+
+
+def montar_cubo(df_pedidos, df_completo, tempos=None):
+    """Monta o cubo a partir das bases no grão de pedido e de item.
+
+    Cada medida é uma soma ou contagem, de modo que qualquer recorte do
+    dashboard é um filtro nas dimensões seguido de uma soma. As médias
+    guardam numerador e denominador separados, com os mesmos filtros de
+    validade das funções de `kpis.py` (ex.: só tempos de entrega >= 0).
+    `tempos` aceita histogramas já prontos (ex.: a soma dos mensais das
+    partições); sem ele, são montados a partir de `df_pedidos`.
+    """
+    tempo = df_pedidos['tempo_entrega_dias']
+    entrega_valida = tempo >= 0
+    funil_valido = (df_pedidos['tempo_preparo'] >= 0) & (df_pedidos['tempo_transito'] >= 0)
+    avaliada = df_pedidos['data_entrega_norm'].notna() & df_pedidos['prazo_entrega_norm'].notna()
+    medidas_pedidos = pd.DataFrame({
+        'dia': df_pedidos['data_pedido_norm'],
+        'estado': df_pedidos['estado'],
+        'transportadora': df_pedidos['transportadora'],
+        'status_pedido': df_pedidos['status_pedido'],
+        'pedidos': 1,
+        'cancelados': df_pedidos['foi_cancelado'].astype(np.int64),
+        'pedidos_com_nf': df_pedidos['valor_nf'].notna().astype(np.int64),
+        'valor_nf': df_pedidos['valor_nf'].astype(float).fillna(0),
+        'pedidos_com_tempo': tempo.notna().astype(np.int64),
+        'soma_tempo_entrega': tempo.astype(float).fillna(0),
+        'entregas_validas': entrega_valida.astype(np.int64),
+        'soma_tempo_entrega_valida': tempo.astype(float).where(entrega_valida, 0),
+        'pedidos_funil': funil_valido.astype(np.int64),
+        'soma_tempo_preparo': df_pedidos['tempo_preparo'].astype(float).where(funil_valido, 0),
+        'soma_tempo_transito': df_pedidos['tempo_transito'].astype(float).where(funil_valido, 0),
+        'entregas_avaliadas': avaliada.astype(np.int64),
+        'entregas_atrasadas': (avaliada & (df_pedidos['data_entrega_norm'] > df_pedidos['prazo_entrega_norm'])).astype(np.int64),
+    })
+
+    faturamento = df_completo['faturamento_item'].astype(float)
+    faturado = faturamento > 0
+    tempo_item = df_completo['tempo_entrega_dias'].astype(float)
+    entregue = tempo_item >= 0
+    medidas_itens = pd.DataFrame({
+        'dia': df_completo['data_pedido_norm'],
+        **{coluna: df_completo[coluna] for coluna in DIMENSOES_ITENS[1:] + ATRIBUTOS_MATERIAL},
+        'itens': df_completo['quantidade'].astype(float).fillna(0),
+        'faturamento': faturamento.fillna(0),
+        'itens_faturados': faturado.astype(np.int64),
+        'faturamento_positivo': faturamento.where(faturado, 0),
+        'itens_entregues': entregue.astype(np.int64),
+        'soma_tempo_entrega_itens': tempo_item.where(entregue, 0),
+    })
+    if tempos is None:
+        tempos = quantis.montar_histogramas(df_pedidos)
+    return Cubo(
+        _agregar(medidas_pedidos, DIMENSOES_PEDIDOS), _agregar(medidas_itens, DIMENSOES_ITENS + ATRIBUTOS_MATERIAL),
+        _agregar(tempos, quantis.DIMENSOES_HISTOGRAMA),
+    )
+
+
+def fatiar(tabela, transportadora=None):
+    """Células de uma transportadora; 'Todas' (ou None) retorna a tabela inteira (ver `kpis.filtrar_transportadora`)."""
+    return kpis.filtrar_transportadora(tabela, transportadora)
+
+
+def consolidar(tabela, dimensoes, medidas):
+    """Soma das `medidas` por `dimensoes` (células com dimensão nula são ignoradas, como no `groupby`).
+
+    Uma dimensão categórica do cubo volta a ser texto no resultado, como nas
+    tabelas calculadas direto das bases.
+    """
+    somas = tabela.groupby(dimensoes, observed=True)[medidas].sum()
+    if isinstance(somas.index, pd.CategoricalIndex):
+        somas.index = somas.index.astype(object)
+    return somas
+
+
+def _media(soma, contagem):
+    return soma / contagem.where(contagem > 0)
+
+
+# --- KPIs a partir do cubo (mesmo resultado das funções de mesmo nome em `kpis.py`) ---
+
+def pedidos_por_dia(cubo):
+    """Quantidade de pedidos por dia, com os dias sem pedidos zerados."""
+    por_dia = consolidar(cubo.pedidos, 'dia', 'pedidos')
+    if por_dia.empty:
+        return pd.DataFrame({'data_pedido': pd.Series(dtype='datetime64[ns]'), 'quantidade_pedidos': pd.Series(dtype=np.int64)})
+    dias = pd.date_range(por_dia.index.min(), por_dia.index.max(), freq='D', name='data_pedido')
+    return por_dia.reindex(dias, fill_value=0).astype(np.int64).reset_index(name='quantidade_pedidos')
+
+
+def maior_faturamento(cubo, visao='Produto', n=10):
+    """Os `n` produtos ou categorias de maior faturamento, do maior para o menor."""
+    coluna = kpis.COLUNA_VISAO[visao]
+    return consolidar(cubo.itens, coluna, 'faturamento').rename('faturamento_item').nlargest(n).reset_index()
+
+
+def menor_faturamento(cubo, visao='Produto', n=10):
+    """Os `n` produtos ou categorias ativos com menor faturamento (positivo), do menor para o maior."""
+    coluna = kpis.COLUNA_VISAO[visao]
+    ativos = kpis.produtos_ativos(cubo.itens)
+    por_grupo = consolidar(ativos[ativos['itens_faturados'] > 0], coluna, 'faturamento_positivo')
+    return por_grupo.rename('faturamento_item').nsmallest(n).reset_index()
+
+
+def metricas_por_estado(cubo):
+    """Tempo médio de entrega, faturamento total e ticket médio por estado, com a sigla da UF."""
+    por_estado = consolidar(cubo.pedidos, 'estado', ['valor_nf', 'pedidos_com_nf', 'soma_tempo_entrega_valida', 'entregas_validas'])
+    metricas = pd.DataFrame({
+        'faturamento_total': por_estado['valor_nf'],
+        'ticket_medio': _media(por_estado['valor_nf'], por_estado['pedidos_com_nf']),
+        'tempo_medio_entrega': _media(por_estado['soma_tempo_entrega_valida'], por_estado['entregas_validas']).round(1),
+    }).reset_index()
+    metricas['sigla'] = metricas['estado'].map(kpis.MAPA_ESTADOS)
+    return metricas.dropna(subset=['sigla'])
+
+
+def funil_por_transportadora(cubo):
+    """Tempo médio de preparo e de trânsito por transportadora (ignora tempos negativos por erros de data)."""
+    validos = cubo.pedidos[cubo.pedidos['pedidos_funil'] > 0]
+    por_transportadora = consolidar(validos, 'transportadora', ['soma_tempo_preparo', 'soma_tempo_transito', 'pedidos_funil'])
+    return pd.DataFrame({
+        'tempo_preparo': por_transportadora['soma_tempo_preparo'] / por_transportadora['pedidos_funil'],
+        'tempo_transito': por_transportadora['soma_tempo_transito'] / por_transportadora['pedidos_funil'],
+    }).reset_index()
+
+
+def taxa_cancelamento_geral(cubo):
+    """Percentual de pedidos cancelados."""
+    return cubo.pedidos['cancelados'].sum() / cubo.pedidos['pedidos'].sum() * 100
+
+
+def cancelamento_por_transportadora(cubo, min_pedidos=kpis.MIN_PEDIDOS_TRANSPORTADORA):
+    """Taxa de cancelamento (%) das transportadoras com mais de `min_pedidos` pedidos."""
+    por_transportadora = consolidar(cubo.pedidos, 'transportadora', ['pedidos', 'cancelados'])
+    por_transportadora = por_transportadora[por_transportadora['pedidos'] > min_pedidos]
+    taxa = por_transportadora['cancelados'] / por_transportadora['pedidos'] * 100
+    return taxa.sort_values(ascending=False).reset_index(name='taxa_cancelamento')
+
+
+def atraso_por_dia_semana(cubo, transportadora=None):
+    """Tempo médio de entrega por dia da semana do pedido (de uma transportadora ou de todas)."""
+    pedidos = fatiar(cubo.pedidos, transportadora)
+    dia_semana_num = pedidos['dia'].dt.dayofweek.rename('dia_semana_num')
+    por_dia = pedidos.groupby(dia_semana_num)[['soma_tempo_entrega', 'pedidos_com_tempo']].sum()
+    atraso = _media(por_dia['soma_tempo_entrega'], por_dia['pedidos_com_tempo']).reset_index(name='tempo_entrega_dias')
+    atraso['dia_semana_nome'] = atraso['dia_semana_num'].map(kpis.DIAS_SEMANA)
+    return atraso[['dia_semana_num', 'dia_semana_nome', 'tempo_entrega_dias']].sort_values('dia_semana_num')
+
+
+def atraso_por_categoria(cubo, transportadora=None):
+    """Tempo médio de entrega por categoria de produto, da maior para a menor (de uma transportadora ou de todas)."""
+    itens = fatiar(cubo.itens, transportadora)
+    por_categoria = consolidar(itens[itens['itens_entregues'] > 0], 'material_category', ['soma_tempo_entrega_itens', 'itens_entregues'])
+    media = (por_categoria['soma_tempo_entrega_itens'] / por_categoria['itens_entregues']).rename('tempo_entrega_dias')
+    return media.sort_values(ascending=False).reset_index()
+
+
+def sla_por_transportadora(cubo):
+    """Entregas avaliadas, entregas fora do prazo e taxa de atraso (%) por transportadora."""
+    avaliadas = cubo.pedidos[cubo.pedidos['entregas_avaliadas'] > 0]
+    sla = consolidar(avaliadas, 'transportadora', ['entregas_avaliadas', 'entregas_atrasadas']).reset_index()
+    sla = sla.rename(columns={'entregas_avaliadas': 'total_entregas'})
+    sla['taxa_atraso_%'] = sla['entregas_atrasadas'] / sla['total_entregas'] * 100
+    return sla
+
+
+def percentis_tempo(cubo, por='transportadora', transportadora=None):
+    """p50, p90 e p99 dos tempos de preparo, trânsito e entrega por transportadora, estado ou dia (ver `quantis.percentis`)."""
+    return quantis.percentis(fatiar(cubo.tempos, transportadora), por)
+
+
+# --- Verificação contra as funções de `kpis.py` ---
+
+def consultas_verificadas(df_pedidos):
+    """Pares `(funcao, tabela, argumentos)` cobrindo todos os valores dos filtros do dashboard."""
+    transportadoras = ['Todas'] + sorted(df_pedidos['transportadora'].dropna().unique().tolist())
+    consultas = [
+        ('pedidos_por_dia', 'df_pedidos', ()), ('metricas_por_estado', 'df_pedidos', ()),
+        ('funil_por_transportadora', 'df_pedidos', ()), ('taxa_cancelamento_geral', 'df_pedidos', ()),
+        ('cancelamento_por_transportadora', 'df_pedidos', ()), ('sla_por_transportadora', 'df_pedidos', ()),
+    ]
+    consultas += [(funcao, 'df_completo', (visao,)) for funcao in ('maior_faturamento', 'menor_faturamento') for visao in kpis.COLUNA_VISAO]
+    consultas += [('atraso_por_dia_semana', 'df_pedidos', (t,)) for t in transportadoras]
+    consultas += [('atraso_por_categoria', 'df_completo', (t,)) for t in transportadoras]
+    return consultas
+
+
+def verificar_cubo(bases, tolerancia=1e-9):
+    """Compara cada KPI calculado pelo cubo com o calculado nas bases; retorna um relatório por consulta.
+
+    O relatório traz `attrs['segundos_montagem']` e `attrs['linhas']` (linhas
+    das bases e dos cuboides).
+    """
+    inicio = time.perf_counter()
+    cubo = montar_cubo(bases.df_pedidos, bases.df_completo)
+    segundos_montagem = time.perf_counter() - inicio
+
+    linhas = []
+    for funcao, tabela, argumentos in consultas_verificadas(bases.df_pedidos):
+        inicio = time.perf_counter()
+        referencia = getattr(kpis, funcao)(getattr(bases, tabela), *argumentos)
+        segundos_bases = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        candidata = globals()[funcao](cubo, *argumentos)
+        segundos_cubo = time.perf_counter() - inicio
+        if not isinstance(referencia, pd.DataFrame):
+            referencia, candidata = pd.DataFrame({'valor': [referencia]}), pd.DataFrame({'valor': [candidata]})
+        diferenca = comparar_tabelas(referencia, candidata, tolerancia)
+        linhas.append({
+            'kpi': funcao, 'argumentos': ', '.join(map(str, argumentos)), 'linhas': len(referencia),
+            'segundos_bases': segundos_bases, 'segundos_cubo': segundos_cubo,
+            'iguais': diferenca is None, 'diferenca': diferenca or '',
+        })
+    relatorio = pd.DataFrame(linhas)
+    relatorio.attrs['segundos_montagem'] = segundos_montagem
+    relatorio.attrs['linhas'] = {
+        'df_pedidos': len(bases.df_pedidos), 'df_completo': len(bases.df_completo),
+        'cubo.pedidos': len(cubo.pedidos), 'cubo.itens': len(cubo.itens),
+    }
+    return relatorio
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monta o cubo de agregados e confere cada KPI com o cálculo nas bases.")
+    parser.add_argument('--compacto', action='store_true', help="Usa tipos compactos nas bases")
+    args = parser.parse_args(argv)
+
+    relatorio = verificar_cubo(kpis.carregar_bases(compacto=args.compacto))
+    with pd.option_context('display.max_colwidth', 120, 'display.width', 200):
+        print(relatorio.round(4).to_string(index=False))
+    print(f"Montagem do cubo: {relatorio.attrs['segundos_montagem']:.2f}s · " + ', '.join(f"{nome} {n:,} linhas" for nome, n in relatorio.attrs['linhas'].items()))
+    raise SystemExit(0 if relatorio['iguais'].all() else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+from dataclasses import dataclass
+
+import pandas as pd
+
+# Formato das datas exportadas pelo sistema de pedidos (ex.: 2025-02-01 13:45:00)
+FORMATO_DATA = 'ISO8601'
+
+VALORES_VERDADEIROS = {'true', 't', '1', 'sim', 's', 'yes', 'y', 'verdadeiro'}
+VALORES_FALSOS = {'false', 'f', '0', 'nao', 'não', 'n', 'no', 'falso'}
+
+
+@dataclass(frozen=True)
+class Regra:
+    """Tipo final de uma coluna.
+
+    `tipo` é um de 'inteiro', 'decimal', 'texto', 'booleano' ou 'data'. Para
+    datas, `formato` é o formato explícito de leitura e `coluna_dia` o nome da
+    coluna derivada com a data normalizada para o dia. Colunas `obrigatoria`
+    descartam as linhas sem valor válido.
+    """
+    tipo: str
+    formato: str = None
+    coluna_dia: str = None
+    obrigatoria: bool = False
+
+
+# Esquemas por planilha, já com os nomes de colunas usados na análise
+ESQUEMA_PEDIDOS = {
+    'id_pedido': Regra('inteiro', obrigatoria=True),
+    'numero_referencia': Regra('texto'),
+    'data_pedido': Regra('data', FORMATO_DATA, coluna_dia='data_pedido_norm'),
+    'valor_nf': Regra('decimal'),
+    'estado_pedido_interno': Regra('texto'),
+    'cidade': Regra('texto'),
+    'estado': Regra('texto'),
+    'frete_cliente': Regra('decimal'),
+    'frete_transportadora': Regra('decimal'),
+    'transportadora': Regra('texto'),
+    'numero_nf': Regra('texto'),
+    'status_pedido': Regra('texto'),
+    'prazo_saida_cd': Regra('data', FORMATO_DATA),
+    'data_envio': Regra('data', FORMATO_DATA, coluna_dia='data_envio_norm'),
+    'data_entrega': Regra('data', FORMATO_DATA, coluna_dia='data_entrega_norm'),
+    'prazo_entrega_transportadora': Regra('data', FORMATO_DATA, coluna_dia='prazo_entrega_norm'),
+    'numero_itens': Regra('inteiro'),
+}
+ESQUEMA_ITENS = {
+    'id_pedido': Regra('inteiro'),
+    'material_id': Regra('inteiro'),
+    'material_name': Regra('texto'),
+    'material_category': Regra('texto'),
+    'price': Regra('decimal'),
+}
+ESQUEMA_SUPPLY = {
+    'material_id': Regra('inteiro'),
+    'estoque_disponivel': Regra('decimal'),
+    'discontinued': Regra('booleano'),
+    'leadtime': Regra('decimal'),
+}
+
+
+def _converter_booleano(serie):
+    if pd.api.types.is_bool_dtype(serie):
+        return serie.astype('boolean')
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie.map({1: True, 0: False}).astype('boolean')
+    texto = serie.astype('string').str.strip().str.lower()
+    convertido = pd.Series(pd.NA, index=serie.index, dtype='boolean')
+    convertido[texto.isin(VALORES_VERDADEIROS)] = True
+    convertido[texto.isin(VALORES_FALSOS)] = False
+    return convertido
+
+
+def converter_coluna(serie, regra):
+    """Converte uma coluna para o tipo final da regra; valores inválidos viram nulos."""
+    if regra.tipo == 'data':
+        if pd.api.types.is_datetime64_any_dtype(serie):
+            return serie
+        return pd.to_datetime(serie, format=regra.formato, errors='coerce')
+    if regra.tipo == 'inteiro':
+        numeros = pd.to_numeric(serie, errors='coerce')
+        inteiros = numeros.where(numeros == numeros.round())
+        return inteiros.astype('Int64')
+    if regra.tipo == 'decimal':
+        return pd.to_numeric(serie, errors='coerce').astype('float64')
+    if regra.tipo == 'booleano':
+        return _converter_booleano(serie)
+    if regra.tipo == 'texto':
+        return serie.where(serie.isna(), serie.astype(str))
+    raise ValueError(f"Tipo de coluna desconhecido: {regra.tipo}")
+
+
+def normalizar(df, esquema, planilha):
+    """Aplica o esquema a um DataFrame, convertendo cada coluna uma única vez.
+
+    Retorna `(df_normalizado, relatorio)`; o relatório tem uma linha por regra
+    aplicada, com o número de linhas cujo valor não pôde ser convertido e foi
+    anulado (`linhas_coagidas`) e o número de linhas descartadas por falta de
+    um valor obrigatório (`linhas_descartadas`).
+    """
+    df = df.copy()
+    linhas = []
+    obrigatorias = []
+    for coluna, regra in esquema.items():
+        if coluna not in df.columns:
+            continue
+        original = df[coluna]
+        convertido = converter_coluna(original, regra)
+        coagidas = int((original.notna() & convertido.isna()).sum())
+        df[coluna] = convertido
+        if regra.coluna_dia:
+            df[regra.coluna_dia] = convertido.dt.normalize()
+        if regra.obrigatoria:
+            obrigatorias.append(coluna)
+        linhas.append({'planilha': planilha, 'coluna': coluna, 'tipo': regra.tipo,
+                       'linhas_coagidas': coagidas, 'linhas_descartadas': 0})
+
+    relatorio = pd.DataFrame(linhas, columns=['planilha', 'coluna', 'tipo', 'linhas_coagidas', 'linhas_descartadas'])
+    for coluna in obrigatorias:
+        invalidas = df[coluna].isna()
+        relatorio.loc[relatorio['coluna'] == coluna, 'linhas_descartadas'] = int(invalidas.sum())
+        df = df[~invalidas]
+        if esquema[coluna].tipo == 'inteiro':
+            # Sem nulos, a coluna obrigatória pode usar o inteiro nativo
+            df = df.astype({coluna: 'int64'})
+    return df, relatorio
@@ -0,0 +1,110 @@
+import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import plotly.io
+import streamlit as st
+
+try:  # internos do Streamlit, usados só pelo envio direto (ver `enviar_spec`)
+    from streamlit.elements.lib.form_utils import current_form_id
+    from streamlit.elements.lib.utils import compute_and_register_element_id
+    from streamlit.proto.PlotlyChart_pb2 import PlotlyChart as PlotlyChartProto
+except ImportError:
+    PlotlyChartProto = None
+
+# Total de JSON guardado pelo cache de figuras do processo; acima disso, as menos usadas recentemente saem
+LIMITE_BYTES_FIGURAS = 64 * 1024 ** 2
+# Acima deste número de dias, a série diária com seletor de período é reduzida
+LIMITE_PONTOS_SERIE = 500
+# Versões do Streamlit em que o envio direto foi conferido contra o `st.plotly_chart`; nas demais, usa-se a API pública
+VERSOES_ENVIO_DIRETO = ('1.47.',)
+ENVIO_DIRETO = PlotlyChartProto is not None and st.__version__.startswith(VERSOES_ENVIO_DIRETO)
+
+
+class CacheFiguras:
+    """Figuras já serializadas (o JSON que o `st.plotly_chart` envia ao navegador), com descarte LRU por tamanho.
+
+    A chave identifica tudo o que determina a figura: versão dos dados,
+    seção e valores dos widgets. Compartilhado pelas sessões do processo
+    (as execuções rodam em threads), com contadores de acertos, faltas e
+    descartes.
+    """
+
+    def __init__(self, limite_bytes=LIMITE_BYTES_FIGURAS):
+        self.limite_bytes = limite_bytes
+        self.bytes = 0
+        self.acertos = 0
+        self.faltas = 0
+        self.descartes = 0
+        self._specs = OrderedDict()
+        self._trava = threading.Lock()
+
+    def obter(self, chave, montar):
+        """`(spec, acerto)`: o JSON da figura de `chave`, montando-a com `montar()` só se ela não estiver no cache."""
+        with self._trava:
+            spec = self._specs.get(chave)
+            if spec is not None:
+                self._specs.move_to_end(chave)
+                self.acertos += 1
+                return spec, True
+            self.faltas += 1
+        # Montada fora da trava: outras sessões continuam lendo o cache enquanto isso
+        spec = plotly.io.to_json(montar(), validate=False)
+        with self._trava:
+            if chave not in self._specs and len(spec) <= self.limite_bytes:
+                self._specs[chave] = spec
+                self.bytes += len(spec)
+                while self.bytes > self.limite_bytes:
+                    _, antiga = self._specs.popitem(last=False)
+                    self.bytes -= len(antiga)
+                    self.descartes += 1
+        return spec, False
+
+    def estatisticas(self):
+        with self._trava:
+            consultas = self.acertos + self.faltas
+            return {
+                'figuras': len(self._specs), 'mb': self.bytes / 1024 ** 2, 'acertos': self.acertos, 'faltas': self.faltas,
+                'descartes': self.descartes, 'taxa_acerto': self.acertos / consultas if consultas else np.nan,
+            }
+
+
+def enviar_spec(spec, use_container_width=True, theme='streamlit'):
+    """Exibe uma figura já serializada, como o `st.plotly_chart`.
+
+    O `st.plotly_chart` sempre converte a figura de volta em objeto, valida
+    e serializa outra vez. Nas versões de `VERSOES_ENVIO_DIRETO`, a mesma
+    mensagem é montada direto a partir do JSON guardado, com internos do
+    Streamlit; em qualquer outra versão (ou se os internos mudarem de lugar),
+    o JSON vai para o `st.plotly_chart` público, mais lento, mas estável.
+    """
+    if not ENVIO_DIRETO:
+        return st.plotly_chart(json.loads(spec), use_container_width=use_container_width, theme=theme)
+    proto = PlotlyChartProto()
+    proto.use_container_width = use_container_width
+    proto.theme = theme or ''
+    proto.form_id = current_form_id(st._main)
+    proto.spec = spec
+    proto.config = json.dumps({'showLink': False, 'linkText': False})
+    proto.id = compute_and_register_element_id(
+        'plotly_chart', user_key=None, form_id=proto.form_id, dg=st._main, plotly_spec=proto.spec, plotly_config=proto.config,
+        selection_mode=[], is_selection_activated=False, theme=theme, use_container_width=use_container_width,
+    )
+    return st._main._enqueue('plotly_chart', proto)
+
+
+def reduzir_serie(df, coluna_x, coluna_y, max_pontos=LIMITE_PONTOS_SERIE):
+    """Série com no máximo ~`max_pontos` pontos: em cada faixa de dias consecutivos, mantém o menor e o maior valor.
+
+    Os picos e vales continuam visíveis no gráfico (ao contrário de uma
+    média por semana) e os valores exibidos são os valores diários reais.
+    Séries curtas são retornadas sem alteração.
+    """
+    if len(df) <= max_pontos:
+        return df
+    faixa = pd.Series(np.arange(len(df)) // -(-len(df) // (max_pontos // 2)), index=df.index)
+    valores = df[coluna_y]
+    manter = pd.concat([valores.groupby(faixa).idxmin(), valores.groupby(faixa).idxmax()]).unique()
+    return df.loc[df.index.isin(manter)].sort_values(coluna_x)
@@ -0,0 +1,125 @@
+import json
+import os
+from functools import lru_cache
+
+import numpy as np
+
+CAMINHO_GEOJSON = os.path.join('data', 'brazil_states.geojson')
+
+# Tolerância em graus (~2 km): imperceptível em um mapa do país inteiro
+TOLERANCIA_PADRAO = 0.02
+CASAS_DECIMAIS_PADRAO = 3
+# Propriedades mantidas em cada estado; as demais não são usadas pelo mapa
+PROPRIEDADES_MANTIDAS = ('sigla', 'name')
+
+
+def _distancias_ao_segmento(pontos, inicio, fim):
+    """Distância de cada ponto ao segmento `inicio`-`fim` (ou ao ponto `inicio`, se o segmento for degenerado)."""
+    segmento = fim - inicio
+    comprimento2 = segmento @ segmento
+    if comprimento2 == 0:
+        return np.hypot(*(pontos - inicio).T)
+    t = np.clip((pontos - inicio) @ segmento / comprimento2, 0, 1)
+    projecao = inicio + t[:, None] * segmento
+    return np.hypot(*(pontos - projecao).T)
+
+
+def _simplificar_linha(pontos, tolerancia):
+    """Douglas-Peucker iterativo: retorna a máscara dos pontos mantidos."""
+    manter = np.zeros(len(pontos), dtype=bool)
+    manter[[0, -1]] = True
+    pilha = [(0, len(pontos) - 1)]
+    while pilha:
+        i, j = pilha.pop()
+        if j - i < 2:
+            continue
+        distancias = _distancias_ao_segmento(pontos[i + 1:j], pontos[i], pontos[j])
+        k = int(np.argmax(distancias))
+        if distancias[k] > tolerancia:
+            k += i + 1
+            manter[k] = True
+            pilha.extend([(i, k), (k, j)])
+    return manter
+
+
+def _simplificar_anel(anel, tolerancia, casas_decimais):
+    """Simplifica um anel fechado; retorna None se ele colapsar para menos de 4 pontos."""
+    pontos = np.asarray(anel, dtype=float)
+    if len(pontos) < 4:
+        return None
+    # Anel fechado: divide no ponto mais distante do início para que os dois trechos tenham extremos distintos
+    corte = int(np.argmax(np.hypot(*(pontos - pontos[0]).T)))
+    manter = np.concatenate([
+        _simplificar_linha(pontos[:corte + 1], tolerancia)[:-1],
+        _simplificar_linha(pontos[corte:], tolerancia)
+    ])
+    simplificado = np.round(pontos[manter], casas_decimais)
+    # Remove pontos consecutivos que ficaram iguais após o arredondamento
+    repetido = np.r_[False, (np.diff(simplificado, axis=0) == 0).all(axis=1)]
+    simplificado = simplificado[~repetido]
+    if len(simplificado) < 4:
+        return None
+    return simplificado.tolist()
+
+
+def _simplificar_poligono(poligono, tolerancia, casas_decimais):
+    exterior = _simplificar_anel(poligono[0], tolerancia, casas_decimais)
+    if exterior is None:
+        return None
+    furos = [_simplificar_anel(anel, tolerancia, casas_decimais) for anel in poligono[1:]]
+    return [exterior] + [furo for furo in furos if furo is not None]
+
+
+def _contar_pontos(coordenadas):
+    if isinstance(coordenadas[0], (int, float)):
+        return 1
+    return sum(_contar_pontos(c) for c in coordenadas)
+
+
+def simplificar_geojson(geojson, tolerancia=TOLERANCIA_PADRAO, casas_decimais=CASAS_DECIMAIS_PADRAO):
+    """Simplifica os polígonos (Douglas-Peucker), arredonda as coordenadas e descarta propriedades não usadas.
+
+    Ilhas que colapsam com a tolerância escolhida são removidas, mas cada
+    estado mantém ao menos o seu maior polígono.
+    """
+    features = []
+    for feature in geojson['features']:
+        geometria = feature['geometry']
+        poligonos = geometria['coordinates'] if geometria['type'] == 'MultiPolygon' else [geometria['coordinates']]
+        simplificados = [_simplificar_poligono(p, tolerancia, casas_decimais) for p in poligonos]
+        simplificados = [p for p in simplificados if p is not None]
+        if not simplificados:
+            maior = max(poligonos, key=lambda p: len(p[0]))
+            simplificados = [[np.round(np.asarray(maior[0], dtype=float), casas_decimais).tolist()]]
+        features.append({
+            'type': 'Feature',
+            'properties': {chave: feature['properties'].get(chave) for chave in PROPRIEDADES_MANTIDAS},
+            'geometry': {'type': 'MultiPolygon', 'coordinates': simplificados},
+        })
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def _tamanho_json(conteudo):
+    return len(json.dumps(conteudo, separators=(',', ':')).encode('utf-8'))
+
+
+@lru_cache(maxsize=None)
+def carregar_geojson_simplificado(caminho=CAMINHO_GEOJSON, tolerancia=TOLERANCIA_PADRAO, casas_decimais=CASAS_DECIMAIS_PADRAO):
+    """Lê e simplifica o GeoJSON uma única vez por processo.
+
+    Retorna `(geojson, relatorio)`, em que o relatório traz o tamanho do arquivo,
+    o tamanho do payload (bytes) e o número de vértices antes e depois da
+    simplificação. O GeoJSON retornado é compartilhado entre as sessões e não
+    deve ser alterado.
+    """
+    with open(caminho, 'r', encoding='utf-8') as f:
+        geojson = json.load(f)
+    simplificado = simplificar_geojson(geojson, tolerancia, casas_decimais)
+    relatorio = {
+        'bytes_arquivo': os.path.getsize(caminho),
+        'bytes_original': _tamanho_json(geojson),
+        'bytes_simplificado': _tamanho_json(simplificado),
+        'pontos_original': sum(_contar_pontos(f['geometry']['coordinates']) for f in geojson['features']),
+        'pontos_simplificado': sum(_contar_pontos(f['geometry']['coordinates']) for f in simplificado['features']),
+    }
+    return simplificado, relatorio
@@ -0,0 +1,253 @@
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+# Caminhos das planilhas de origem e da pasta de cache colunar
+PASTA_DADOS = 'data'
+PASTA_CACHE = os.path.join(PASTA_DADOS, '.cache')
+ARQUIVO_PEDIDOS = 'Case Dados - Pedidos.xlsx'
+ARQUIVO_ITENS_SUPPLY = 'Business Case Dados - Itens + Supply.xlsx'
+CAMINHO_PEDIDOS = os.path.join(PASTA_DADOS, ARQUIVO_PEDIDOS)
+CAMINHO_ITENS_SUPPLY = os.path.join(PASTA_DADOS, ARQUIVO_ITENS_SUPPLY)
+
+# Colunas que o dashboard não utiliza e que nunca são materializadas
+COLUNAS_REMOVER = {
+    'Pedidos': ['Código de Rastreio', 'CEP', 'postage_list_id', 'Peso (kg)'],
+    'Itens': ['material_weight_kg', 'aasm_state', 'reprint_batch_id', 'supply_paid', 'stock_burning', 'consumable_letters'],
+    'Supply': ['factory_id', 'reposition', 'inventory_center_id', 'material_localization_id'],
+}
+
+# Planilha -> (arquivo de origem, aba)
+PLANILHAS = {
+    'Pedidos': (ARQUIVO_PEDIDOS, 0),
+    'Itens': (ARQUIVO_ITENS_SUPPLY, 'Itens'),
+    'Supply': (ARQUIVO_ITENS_SUPPLY, 'Supply'),
+}
+
+
+def _hash_arquivo(caminho, tamanho_bloco=1 << 20):
+    """Calcula o SHA-256 do arquivo lendo em blocos."""
+    h = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(tamanho_bloco), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def _ler_manifesto(caminho_manifesto):
+    try:
+        with open(caminho_manifesto, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def escrever_atomico(caminho, escrever):
+    """Escreve em um arquivo temporário e substitui o destino de uma só vez.
+
+    O temporário tem nome único na pasta do destino, então escritas
+    simultâneas do mesmo arquivo (sessões, atualizador em segundo plano) não
+    se misturam; se `escrever` falhar, ele é removido.
+    """
+    descritor, temporario = tempfile.mkstemp(dir=os.path.dirname(caminho) or '.', prefix=os.path.basename(caminho) + '.', suffix='.tmp')
+    os.close(descritor)
+    try:
+        escrever(temporario)
+        os.replace(temporario, caminho)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+
+
+def salvar_json(conteudo, destino):
+    with open(destino, 'w', encoding='utf-8') as f:
+        json.dump(conteudo, f, ensure_ascii=False, indent=2)
+
+
+def _origem_inalterada(caminho_origem, manifesto):
+    """Verifica se a planilha de origem ainda corresponde à versão convertida.
+
+    A comparação rápida usa mtime e tamanho; se o mtime mudou mas o conteúdo
+    é o mesmo (cópia ou `touch`), o hash evita uma reconversão desnecessária.
+    """
+    if manifesto is None:
+        return False
+    info = os.stat(caminho_origem)
+    if info.st_mtime_ns == manifesto['mtime_ns'] and info.st_size == manifesto['tamanho']:
+        return True
+    return info.st_size == manifesto['tamanho'] and _hash_arquivo(caminho_origem) == manifesto['sha256']
+
+
+def preparar_para_parquet(df):
+    """Converte colunas de texto com tipos mistos (ex.: números e textos na mesma coluna do Excel) para string."""
+    for coluna in df.columns[df.dtypes == object]:
+        if pd.api.types.infer_dtype(df[coluna], skipna=True) not in ('string', 'empty'):
+            df[coluna] = df[coluna].where(df[coluna].isna(), df[coluna].astype(str))
+    return df
+
+
+def ler_excel(nome, pasta_dados=PASTA_DADOS):
+    """Lê uma planilha diretamente do Excel, sem as colunas de `COLUNAS_REMOVER`."""
+    return ler_abas(PLANILHAS[nome][0], [nome], pasta_dados)[nome]
+
+
+def ler_abas(arquivo, nomes, pasta_dados=PASTA_DADOS):
+    """Lê as planilhas `nomes` de um mesmo arquivo Excel abrindo-o uma única vez.
+
+    O arquivo (e a sua tabela de textos compartilhados, a parte mais cara da
+    abertura) é carregado uma vez para todas as abas. Retorna `{nome: DataFrame}`,
+    sem as colunas de `COLUNAS_REMOVER` e com os tipos prontos para o Parquet.
+    """
+    abas = {}
+    with pd.ExcelFile(os.path.join(pasta_dados, arquivo)) as livro:
+        for nome in nomes:
+            remover = set(COLUNAS_REMOVER[nome])
+            df = livro.parse(PLANILHAS[nome][1], usecols=lambda coluna: coluna not in remover)
+            abas[nome] = preparar_para_parquet(df)
+    return abas
+
+
+def _agrupar_por_arquivo(nomes):
+    por_arquivo = {}
+    for nome in nomes:
+        por_arquivo.setdefault(PLANILHAS[nome][0], []).append(nome)
+    return por_arquivo
+
+
+def _converter_em_processo(arquivo, nomes, pasta_dados, pasta_cache):
+    """Executa `_converter_arquivo` em um novo interpretador Python (ver `main`) e retorna `{nome: linhas}`.
+
+    Um subprocesso independente, e não `multiprocessing`: tanto o fork de um
+    processo com as threads do Streamlit quanto o spawn (que reimportaria o
+    `app.py` como módulo principal) são inseguros aqui.
+    """
+    comando = [sys.executable, os.path.abspath(__file__), '--arquivo', arquivo, '--planilhas', *nomes,
+               '--dados', pasta_dados, '--cache', pasta_cache]
+    processo = subprocess.run(comando, capture_output=True, text=True, encoding='utf-8')
+    if processo.returncode != 0:
+        raise RuntimeError(f"Falha ao converter '{arquivo}':\n{processo.stderr.strip()[-2000:]}")
+    return json.loads(processo.stdout.strip().splitlines()[-1])
+
+
+def _converter_planilhas(nomes, pasta_dados, pasta_cache, progresso=None):
+    """Converte as planilhas `nomes` para Parquet, abrindo cada arquivo Excel uma vez e os arquivos em paralelo.
+
+    Cada arquivo é lido em um processo próprio (a leitura do Excel não
+    libera o GIL); com um único arquivo, no próprio processo.
+    `progresso(fracao, texto)`, se informado, é chamado a cada arquivo concluído.
+    """
+    for nome in nomes:  # falha cedo, no processo principal, se alguma planilha não existir
+        os.stat(os.path.join(pasta_dados, PLANILHAS[nome][0]))
+    por_arquivo = _agrupar_por_arquivo(nomes)
+    converter = _converter_arquivo if len(por_arquivo) == 1 else _converter_em_processo
+    concluidas = 0
+    with ThreadPoolExecutor(max_workers=len(por_arquivo)) as executor:
+        tarefas = {executor.submit(converter, arquivo, nomes_arquivo, pasta_dados, pasta_cache): arquivo
+                   for arquivo, nomes_arquivo in por_arquivo.items()}
+        for tarefa in as_completed(tarefas):
+            concluidas += len(tarefa.result())
+            if progresso:
+                progresso(concluidas / len(nomes), f"{', '.join(por_arquivo[tarefas[tarefa]])}: {concluidas}/{len(nomes)} planilhas lidas")
+
+
+def ler_planilhas_excel(nomes=tuple(PLANILHAS), pasta_dados=PASTA_DADOS, progresso=None):
+    """Lê várias planilhas do Excel sem usar o cache, como `_converter_planilhas`. Retorna `{nome: DataFrame}`."""
+    with tempfile.TemporaryDirectory() as pasta_temporaria:
+        _converter_planilhas(list(nomes), pasta_dados, pasta_temporaria, progresso)
+        return {nome: pd.read_parquet(_caminhos_cache(nome, pasta_temporaria)[0]) for nome in nomes}
+
+
+def _caminhos_cache(nome, pasta_cache):
+    return os.path.join(pasta_cache, f'{nome}.parquet'), os.path.join(pasta_cache, f'{nome}.json')
+
+
+def _cache_valido(nome, pasta_dados, pasta_cache):
+    """Verifica se o Parquet de `nome` corresponde à planilha de origem atual."""
+    arquivo, _ = PLANILHAS[nome]
+    caminho_origem = os.path.join(pasta_dados, arquivo)
+    caminho_parquet, caminho_manifesto = _caminhos_cache(nome, pasta_cache)
+
+    manifesto = _ler_manifesto(caminho_manifesto)
+    if not (os.path.exists(caminho_parquet) and _origem_inalterada(caminho_origem, manifesto)):
+        return False
+    mtime_atual = os.stat(caminho_origem).st_mtime_ns
+    if mtime_atual != manifesto['mtime_ns']:
+        # Conteúdo idêntico com novo mtime: registra para não recalcular o hash a cada leitura
+        manifesto['mtime_ns'] = mtime_atual
+        escrever_atomico(caminho_manifesto, lambda destino: salvar_json(manifesto, destino))
+    return True
+
+
+def _converter_arquivo(arquivo, nomes, pasta_dados, pasta_cache):
+    """Converte para Parquet as planilhas `nomes` de um arquivo Excel.
+
+    Em um processo de leitura, os DataFrames são gravados pelo próprio
+    processo e não precisam ser serializados de volta. Retorna `{nome: linhas}`.
+    """
+    caminho_origem = os.path.join(pasta_dados, arquivo)
+    info = os.stat(caminho_origem)
+    sha256 = _hash_arquivo(caminho_origem)
+    os.makedirs(pasta_cache, exist_ok=True)
+    linhas = {}
+    for nome, df in ler_abas(arquivo, nomes, pasta_dados).items():
+        caminho_parquet, caminho_manifesto = _caminhos_cache(nome, pasta_cache)
+        escrever_atomico(caminho_parquet, lambda destino: df.to_parquet(destino, index=False))
+        novo_manifesto = {
+            'origem': caminho_origem, 'aba': PLANILHAS[nome][1], 'mtime_ns': info.st_mtime_ns,
+            'tamanho': info.st_size, 'sha256': sha256, 'colunas': df.columns.tolist(),
+        }
+        escrever_atomico(caminho_manifesto, lambda destino: salvar_json(novo_manifesto, destino))
+        linhas[nome] = len(df)
+    return linhas
+
+
+def ler_planilha(nome, pasta_dados=PASTA_DADOS, pasta_cache=PASTA_CACHE):
+    """Lê uma planilha a partir do cache Parquet, convertendo o Excel apenas quando a origem mudou."""
+    if not _cache_valido(nome, pasta_dados, pasta_cache):
+        _converter_arquivo(PLANILHAS[nome][0], [nome], pasta_dados, pasta_cache)
+    return pd.read_parquet(_caminhos_cache(nome, pasta_cache)[0])
+
+
+def versao_dados(pasta_dados=PASTA_DADOS):
+    """Identificador da versão dos dados de origem (mtime e tamanho de cada planilha)."""
+    partes = []
+    for arquivo in sorted({arquivo for arquivo, _ in PLANILHAS.values()}):
+        info = os.stat(os.path.join(pasta_dados, arquivo))
+        partes.append(f'{arquivo}:{info.st_mtime_ns}:{info.st_size}')
+    return hashlib.sha1('|'.join(partes).encode('utf-8')).hexdigest()[:12]
+
+
+def carregar_planilhas(pasta_dados=PASTA_DADOS, pasta_cache=PASTA_CACHE, progresso=None):
+    """Retorna os DataFrames de Pedidos, Itens e Supply a partir do cache colunar.
+
+    As planilhas desatualizadas são convertidas antes, cada arquivo Excel
+    aberto uma única vez e os dois arquivos em paralelo, de modo que a
+    primeira carga leva aproximadamente o tempo do maior arquivo.
+    `progresso(fracao, texto)` acompanha a conversão.
+    """
+    nomes = ('Pedidos', 'Itens', 'Supply')
+    pendentes = [nome for nome in nomes if not _cache_valido(nome, pasta_dados, pasta_cache)]
+    if pendentes:
+        _converter_planilhas(pendentes, pasta_dados, pasta_cache, progresso)
+    return tuple(pd.read_parquet(_caminhos_cache(nome, pasta_cache)[0]) for nome in nomes)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Converte planilhas de um arquivo Excel para o cache Parquet (usado pelos processos de leitura).")
+    parser.add_argument('--arquivo', required=True)
+    parser.add_argument('--planilhas', nargs='+', required=True, choices=list(PLANILHAS))
+    parser.add_argument('--dados', default=PASTA_DADOS)
+    parser.add_argument('--cache', default=PASTA_CACHE)
+    args = parser.parse_args(argv)
+    print(json.dumps(_converter_arquivo(args.arquivo, args.planilhas, args.dados, args.cache)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,309 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from cesta import montar_indice_cesta
+from cobertura import montar_matriz_vendas, projetar_ruptura, velocidade_atual
+from compartilhado import obter_bases
+from ingestao import carregar_planilhas, salvar_json
+from particoes import carregar_bases_particionadas, identificar_fonte
+from pipeline import RISCO_MAP, montar_bases
+from vetorizado import taxa_por_grupo
+
+# Parâmetros das análises
+LIMITE_COBERTURA_CRITICA = 7   # dias de cobertura abaixo dos quais um produto está em estado crítico
+MIN_PEDIDOS_TRANSPORTADORA = 50   # volume mínimo para comparar a taxa de cancelamento entre transportadoras
+ORDEM_RISCO = list(RISCO_MAP)
+LIMITE_PONTOS_DISPERSAO = 20_000   # acima disso, a dispersão de descontos usa densidade ou uma amostra
+
+DIAS_SEMANA = {
+    0: 'Segunda-feira', 1: 'Terça-feira', 2: 'Quarta-feira',
+    3: 'Quinta-feira', 4: 'Sexta-feira', 5: 'Sábado', 6: 'Domingo'
+}
+
+# Mapea os estados para suas siglas
+MAPA_ESTADOS = {
+    'Acre': 'AC', 'Alagoas': 'AL', 'Amapá': 'AP', 'Amazonas': 'AM', 'Bahia': 'BA',
+    'Ceará': 'CE', 'Distrito Federal': 'DF', 'Espírito Santo': 'ES', 'Goiás': 'GO',
+    'Maranhão': 'MA', 'Mato Grosso': 'MT', 'Mato Grosso do Sul': 'MS', 'Minas Gerais': 'MG',
+    'Pará': 'PA', 'Paraíba': 'PB', 'Paraná': 'PR', 'Pernambuco': 'PE', 'Piauí': 'PI',
+    'Rio de Janeiro': 'RJ', 'Rio Grande do Norte': 'RN', 'Rio Grande do Sul': 'RS',
+    'Rondônia': 'RO', 'Roraima': 'RR', 'Santa Catarina': 'SC', 'São Paulo': 'SP',
+    'Sergipe': 'SE', 'Tocantins': 'TO'
+}
+
+COLUNA_VISAO = {'Produto': 'material_name', 'Categoria': 'material_category'}
+
+
+def carregar_bases(fonte=None, compacto=False):
+    """Carrega as bases processadas da fonte `(tipo, versao)` (ver `particoes.identificar_fonte`).
+
+    Usa as bases publicadas pelo dashboard para essa versão (`compartilhado.obter_bases`):
+    as partições só são concatenadas e processadas quando a versão muda.
+    """
+    fonte = fonte or identificar_fonte()
+
+    def montar():
+        if fonte[0] == 'particoes':
+            return carregar_bases_particionadas(compacto=compacto)
+        return montar_bases(*carregar_planilhas(), compacto=compacto)
+
+    return obter_bases(fonte, montar, compacto)
+
+
+# --- 1. Vendas & Conversão ---
+
+def pedidos_por_dia(df_pedidos):
+    """Quantidade de pedidos por dia."""
+    por_dia = df_pedidos.set_index('data_pedido').resample('D').agg({'id_pedido': 'count'}).reset_index()
+    return por_dia.rename(columns={'id_pedido': 'quantidade_pedidos'})
+
+
+def produtos_ativos(df_completo):
+    """Itens de produtos não descontinuados."""
+    return df_completo[df_completo['discontinued'].fillna(False) == False]
+
+
+def maior_faturamento(df_completo, visao='Produto', n=10):
+    """Os `n` produtos ou categorias de maior faturamento, do maior para o menor."""
+    coluna = COLUNA_VISAO[visao]
+    return df_completo.groupby(coluna, observed=True)['faturamento_item'].sum().nlargest(n).reset_index()
+
+
+def menor_faturamento(df_completo, visao='Produto', n=10):
+    """Os `n` produtos ou categorias ativos com menor faturamento (positivo), do menor para o maior."""
+    coluna = COLUNA_VISAO[visao]
+    df_ativo = produtos_ativos(df_completo)
+    return df_ativo[df_ativo['faturamento_item'] > 0].groupby(coluna, observed=True)['faturamento_item'].sum().nsmallest(n).reset_index()
+
+
+def analise_desconto(df_pedidos):
+    """Desconto inferido por pedido (subtotal dos itens - valor da NF), sem descontos negativos ou acima de 95%."""
+    analise = df_pedidos[['id_pedido', 'subtotal_calculado', 'quantidade_itens', 'valor_nf']].copy()
+    analise['desconto_calculado'] = analise['subtotal_calculado'] - analise['valor_nf']
+    return analise[
+        (analise['desconto_calculado'] >= 0) &
+        (analise['desconto_calculado'] < (analise['subtotal_calculado'] * 0.95))
+    ]
+
+
+def ajustar_reta(x, y):
+    """Reta de mínimos quadrados `y = intercepto + inclinacao * x` em forma fechada, com o R².
+
+    Retorna um dicionário com `inclinacao`, `intercepto`, `r2` e `n` (valores
+    nulos são ignorados; com menos de 2 pontos ou `x` constante, os
+    coeficientes são NaN).
+    """
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    validos = ~(np.isnan(x) | np.isnan(y))
+    x, y = x[validos], y[validos]
+    ajuste = {'inclinacao': np.nan, 'intercepto': np.nan, 'r2': np.nan, 'n': int(len(x))}
+    if len(x) < 2:
+        return ajuste
+    dx, dy = x - x.mean(), y - y.mean()
+    sxx, syy, sxy = dx @ dx, dy @ dy, dx @ dy
+    if sxx == 0:
+        return ajuste
+    ajuste['inclinacao'] = float(sxy / sxx)
+    ajuste['intercepto'] = float(y.mean() - ajuste['inclinacao'] * x.mean())
+    ajuste['r2'] = float(sxy ** 2 / (sxx * syy)) if syy > 0 else 1.0
+    return ajuste
+
+
+def densidade_2d(x, y, bins=60):
+    """Contagem de pontos em uma grade `bins` x `bins`: retorna `(contagens, centros_x, centros_y)`.
+
+    `contagens` vem no formato de `go.Heatmap` (linhas = y, colunas = x), com
+    as células vazias como NaN para ficarem transparentes.
+    """
+    contagens, bordas_x, bordas_y = np.histogram2d(np.asarray(x, dtype=float), np.asarray(y, dtype=float), bins=bins)
+    contagens = np.where(contagens > 0, contagens, np.nan).T
+    return contagens, (bordas_x[:-1] + bordas_x[1:]) / 2, (bordas_y[:-1] + bordas_y[1:]) / 2
+
+
+def amostrar(df, n, semente=0):
+    """Amostra aleatória reprodutível de até `n` linhas."""
+    return df if len(df) <= n else df.sample(n, random_state=semente)
+
+
+# --- 2. Supply Chain & Estoque ---
+
+def produtos_em_ruptura(produtos_criticos):
+    """Produtos com vendas no período e estoque zerado, do maior para o menor impacto."""
+    return produtos_criticos[produtos_criticos['dias_cobertura'] == 0]
+
+
+def produtos_em_estado_critico(produtos_criticos, limite=LIMITE_COBERTURA_CRITICA):
+    """Produtos com menos de `limite` dias de cobertura, dos mais críticos para os menos críticos."""
+    return produtos_criticos[produtos_criticos['dias_cobertura'] < limite]
+
+
+def distribuicao_leadtime(df_supply_agg):
+    """Leadtime dos materiais com tempo de reposição informado."""
+    return df_supply_agg[df_supply_agg['leadtime'] > 0]
+
+
+def projecao_ruptura(df_completo, df_supply_agg, **parametros):
+    """Data de ruptura e ponto de pedido de cada produto ativo (ver `cobertura.projetar_ruptura`), com os parâmetros padrão."""
+    matriz = montar_matriz_vendas(df_completo, df_supply_agg)
+    return projetar_ruptura(matriz, *velocidade_atual(matriz), **parametros)
+
+
+def taxa_cancelamento_por_risco(df_pedidos):
+    """Taxa de cancelamento (%) por nível de risco de supply do pedido."""
+    taxa = df_pedidos.groupby('nivel_risco_pedido', observed=True)['foi_cancelado'].mean().reset_index()
+    taxa['taxa_percentual'] = taxa['foi_cancelado'] * 100
+    return taxa
+
+
+# --- 3. Logística & Entregas ---
+
+def metricas_por_estado(df_pedidos):
+    """Tempo médio de entrega, faturamento total e ticket médio por estado, com a sigla da UF."""
+    entregas_validas = df_pedidos[df_pedidos['tempo_entrega_dias'] >= 0]
+    metricas = df_pedidos.groupby('estado', observed=True)['valor_nf'].agg(faturamento_total='sum', ticket_medio='mean')
+    metricas['tempo_medio_entrega'] = entregas_validas.groupby('estado', observed=True)['tempo_entrega_dias'].mean().round(1)
+    metricas = metricas.reset_index()
+    metricas['sigla'] = metricas['estado'].map(MAPA_ESTADOS)
+    return metricas.dropna(subset=['sigla'])
+
+
+def funil_por_transportadora(df_pedidos):
+    """Tempo médio de preparo e de trânsito por transportadora (ignora tempos negativos por erros de data)."""
+    df_funil = df_pedidos[(df_pedidos['tempo_preparo'] >= 0) & (df_pedidos['tempo_transito'] >= 0)]
+    return df_funil.groupby('transportadora', observed=True).agg({
+        'tempo_preparo': 'mean',
+        'tempo_transito': 'mean'
+    }).reset_index()
+
+
+def taxa_cancelamento_geral(df_pedidos):
+    """Percentual de pedidos cancelados."""
+    return df_pedidos['foi_cancelado'].sum() / len(df_pedidos) * 100
+
+
+def cancelamento_por_transportadora(df_pedidos, min_pedidos=MIN_PEDIDOS_TRANSPORTADORA):
+    """Taxa de cancelamento (%) das transportadoras com mais de `min_pedidos` pedidos."""
+    cancel = taxa_por_grupo(df_pedidos['transportadora'], df_pedidos['status_pedido'] == 'canceled')
+
+    # Filtra as transportadoras com volume relevante de pedidos para uma análise mais justa
+    cancel = cancel[cancel['total'] > min_pedidos]
+    return cancel['taxa'].sort_values(ascending=False).reset_index(name='taxa_cancelamento')
+
+
+def filtrar_transportadora(df, transportadora):
+    """Linhas de uma transportadora; 'Todas' (ou None) retorna o DataFrame inteiro."""
+    if transportadora in (None, 'Todas'):
+        return df
+    return df[df['transportadora'] == transportadora]
+
+
+def atraso_por_dia_semana(df_pedidos, transportadora=None):
+    """Tempo médio de entrega por dia da semana do pedido (de uma transportadora ou de todas)."""
+    df_pedidos = filtrar_transportadora(df_pedidos, transportadora)
+    dia_semana_num = df_pedidos['data_pedido'].dt.dayofweek
+    atraso = df_pedidos.groupby(dia_semana_num.rename('dia_semana_num'))['tempo_entrega_dias'].mean().reset_index()
+    atraso['dia_semana_nome'] = atraso['dia_semana_num'].map(DIAS_SEMANA)
+    return atraso[['dia_semana_num', 'dia_semana_nome', 'tempo_entrega_dias']].sort_values('dia_semana_num')
+
+
+def atraso_por_categoria(df_completo, transportadora=None):
+    """Tempo médio de entrega por categoria de produto, da maior para a menor (de uma transportadora ou de todas)."""
+    df_completo = filtrar_transportadora(df_completo, transportadora)
+    validos = df_completo[df_completo['tempo_entrega_dias'] >= 0]
+    return validos.groupby('material_category', observed=True)['tempo_entrega_dias'].mean().sort_values(ascending=False).reset_index()
+
+
+def sla_por_transportadora(df_pedidos):
+    """Entregas avaliadas, entregas fora do prazo e taxa de atraso (%) por transportadora."""
+    df_prazos = df_pedidos[['id_pedido', 'transportadora', 'data_entrega_norm', 'prazo_entrega_norm']].dropna(
+        subset=['data_entrega_norm', 'prazo_entrega_norm']
+    )
+    df_prazos = df_prazos.assign(atrasado=df_prazos['data_entrega_norm'] > df_prazos['prazo_entrega_norm'])
+    sla = df_prazos.groupby('transportadora', observed=True).agg(
+        total_entregas=('id_pedido', 'count'),
+        entregas_atrasadas=('atrasado', 'sum')
+    ).reset_index()
+    sla['taxa_atraso_%'] = sla['entregas_atrasadas'] / sla['total_entregas'] * 100
+    return sla
+
+
+# --- Execução em lote ---
+
+def calcular_todos(bases, indice_cesta=None):
+    """Calcula todas as tabelas de KPI em uma passada.
+
+    Retorna `(tabelas, tempos)`: o dicionário nome -> DataFrame e o tempo de
+    cálculo (segundos) de cada tabela.
+    """
+    df_completo, df_pedidos = bases.df_completo, bases.df_pedidos
+    calculos = {
+        'pedidos_por_dia': lambda: pedidos_por_dia(df_pedidos),
+        'maior_faturamento_produto': lambda: maior_faturamento(df_completo, 'Produto'),
+        'maior_faturamento_categoria': lambda: maior_faturamento(df_completo, 'Categoria'),
+        'menor_faturamento_produto': lambda: menor_faturamento(df_completo, 'Produto'),
+        'menor_faturamento_categoria': lambda: menor_faturamento(df_completo, 'Categoria'),
+        'cesta_regras': lambda: (indice_cesta or montar_indice_cesta(df_completo)).regras(),
+        'analise_desconto': lambda: analise_desconto(df_pedidos),
+        'tendencia_desconto': lambda: pd.DataFrame([ajustar_reta(*analise_desconto(df_pedidos)[['desconto_calculado', 'valor_nf']].T.values)]),
+        'produtos_em_ruptura': lambda: produtos_em_ruptura(bases.produtos_criticos),
+        'produtos_em_estado_critico': lambda: produtos_em_estado_critico(bases.produtos_criticos),
+        'distribuicao_leadtime': lambda: distribuicao_leadtime(bases.df_supply_agg),
+        'projecao_ruptura': lambda: projecao_ruptura(df_completo, bases.df_supply_agg),
+        'taxa_cancelamento_por_risco': lambda: taxa_cancelamento_por_risco(df_pedidos),
+        'metricas_por_estado': lambda: metricas_por_estado(df_pedidos),
+        'funil_por_transportadora': lambda: funil_por_transportadora(df_pedidos),
+        'taxa_cancelamento_geral': lambda: pd.DataFrame({'taxa_cancelamento': [taxa_cancelamento_geral(df_pedidos)]}),
+        'cancelamento_por_transportadora': lambda: cancelamento_por_transportadora(df_pedidos),
+        'atraso_por_dia_semana': lambda: atraso_por_dia_semana(df_pedidos),
+        'atraso_por_categoria': lambda: atraso_por_categoria(df_completo),
+        'sla_por_transportadora': lambda: sla_por_transportadora(df_pedidos),
+    }
+    tabelas, tempos = {}, {}
+    for nome, calcular in calculos.items():
+        inicio = time.perf_counter()
+        tabelas[nome] = calcular()
+        tempos[nome] = time.perf_counter() - inicio
+    return tabelas, tempos
+
+
+def salvar_tabelas(tabelas, pasta_saida, formatos=('parquet',)):
+    """Grava cada tabela como `<nome>.parquet` e/ou `<nome>.json` em `pasta_saida`."""
+    os.makedirs(pasta_saida, exist_ok=True)
+    for nome, df in tabelas.items():
+        df = df.reset_index(drop=True)
+        if 'parquet' in formatos:
+            df.to_parquet(os.path.join(pasta_saida, f'{nome}.parquet'), index=False)
+        if 'json' in formatos:
+            df.to_json(os.path.join(pasta_saida, f'{nome}.json'), orient='records', date_format='iso', force_ascii=False, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calcula todas as tabelas de KPI do dashboard e grava em Parquet/JSON.")
+    parser.add_argument('--saida', default='kpis_saida', help="Pasta de saída (padrão: kpis_saida)")
+    parser.add_argument('--formato', choices=['parquet', 'json', 'ambos'], default='parquet')
+    parser.add_argument('--compacto', action='store_true', help="Usa tipos compactos nas bases")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    fonte = identificar_fonte()
+    bases = carregar_bases(fonte, compacto=args.compacto)
+    tempo_carga = time.perf_counter() - inicio
+
+    tabelas, tempos = calcular_todos(bases)
+    formatos = ('parquet', 'json') if args.formato == 'ambos' else (args.formato,)
+    salvar_tabelas(tabelas, args.saida, formatos)
+
+    resumo = {
+        'fonte': fonte[0], 'versao': fonte[1], 'tempo_carga_s': round(tempo_carga, 4),
+        'tabelas': {nome: {'linhas': len(df), 'tempo_s': round(tempos[nome], 4)} for nome, df in tabelas.items()},
+    }
+    salvar_json(resumo, os.path.join(args.saida, 'manifesto.json'))
+    print(f"{len(tabelas)} tabelas gravadas em '{args.saida}' (carga: {tempo_carga:.2f}s, cálculo: {sum(tempos.values()):.2f}s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+import argparse
+import os
+import time
+import tracemalloc
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import load_workbook
+from pandas.io.parsers import TextParser
+
+from esquema import ESQUEMA_ITENS, ESQUEMA_PEDIDOS, ESQUEMA_SUPPLY, normalizar
+from ingestao import COLUNAS_REMOVER, PASTA_DADOS, PLANILHAS, preparar_para_parquet, escrever_atomico
+from pipeline import MAPA_NOMES_ITENS, MAPA_NOMES_PEDIDOS, MAPA_NOMES_SUPPLY, derivar_itens, derivar_pedidos
+
+TAMANHO_LOTE = 50_000
+# Acima deste tamanho, uma exportação é ingerida em lotes (ver `particoes.ingerir_exportacao`)
+LIMITE_BYTES_LEITURA_DIRETA = 50 * 1024 ** 2
+
+# Planilha -> (renomeação, esquema, colunas derivadas linha a linha)
+PREPARO = {
+    'Pedidos': (MAPA_NOMES_PEDIDOS, ESQUEMA_PEDIDOS, derivar_pedidos),
+    'Itens': (MAPA_NOMES_ITENS, ESQUEMA_ITENS, derivar_itens),
+    'Supply': (MAPA_NOMES_SUPPLY, ESQUEMA_SUPPLY, None),
+}
+
+TIPOS_ARROW = {'inteiro': pa.int64(), 'decimal': pa.float64(), 'texto': pa.string(), 'booleano': pa.bool_(), 'data': pa.timestamp('ns')}
+
+# Tipo fixo das colunas derivadas: um lote sem datas nulas não pode mudar o tipo do arquivo
+TIPOS_DERIVADOS = {
+    'Pedidos': {'tempo_entrega_dias': pa.float64(), 'tempo_preparo': pa.float64(), 'tempo_transito': pa.float64(), 'ano_mes': pa.string()},
+    'Itens': {'quantidade': pa.int64()},
+    'Supply': {},
+}
+
+
+def _montar_lote(colunas, linhas):
+    # Mesmo conversor de valores do `pd.read_excel` (ex.: números gravados como texto viram números)
+    return TextParser([colunas] + linhas, header=0).read()
+
+
+def ler_em_lotes(caminho, aba, colunas_remover=(), tamanho_lote=TAMANHO_LOTE):
+    """Percorre uma aba do Excel em modo somente leitura, gerando DataFrames de até `tamanho_lote` linhas.
+
+    Apenas o lote atual fica em memória (o openpyxl em modo somente leitura
+    não monta o documento inteiro). As colunas de `colunas_remover` são
+    descartadas antes de cada lote virar DataFrame, e linhas totalmente
+    vazias são ignoradas, como no `pd.read_excel`.
+    """
+    livro = load_workbook(caminho, read_only=True, data_only=True)
+    try:
+        planilha = livro.worksheets[aba] if isinstance(aba, int) else livro[aba]
+        linhas = planilha.iter_rows(values_only=True)
+        cabecalho = next(linhas, None)
+        if cabecalho is None:
+            return
+        cabecalho = [nome if nome is not None else f'Unnamed: {i}' for i, nome in enumerate(cabecalho)]
+        manter = [i for i, nome in enumerate(cabecalho) if nome not in set(colunas_remover)]
+        colunas = [cabecalho[i] for i in manter]
+
+        lote = []
+        for linha in linhas:
+            valores = [linha[i] if i < len(linha) else None for i in manter]
+            if any(valor is not None for valor in valores):
+                lote.append(valores)
+            if len(lote) == tamanho_lote:
+                yield _montar_lote(colunas, lote)
+                lote = []
+        if lote:
+            yield _montar_lote(colunas, lote)
+    finally:
+        livro.close()
+
+
+def esquema_arrow(nome, primeiro_lote):
+    """Esquema Arrow fixo da planilha `nome` já preparada, a partir das regras do esquema.
+
+    Colunas fora do esquema (e que não são derivadas) usam o tipo inferido
+    no primeiro lote, ou texto se ele só tiver nulos. Os metadados do pandas
+    do primeiro lote preservam os tipos nullable (Int64, boolean) na releitura.
+    """
+    _, esquema, _ = PREPARO[nome]
+    tipos = {}
+    for coluna, regra in esquema.items():
+        tipos[coluna] = TIPOS_ARROW[regra.tipo]
+        if regra.coluna_dia:
+            tipos[regra.coluna_dia] = TIPOS_ARROW['data']
+    tipos.update(TIPOS_DERIVADOS[nome])
+    inferido = pa.Schema.from_pandas(primeiro_lote, preserve_index=False)
+    campos = []
+    for campo in inferido:
+        tipo = tipos.get(campo.name, campo.type)
+        campos.append((campo.name, pa.string() if pa.types.is_null(tipo) else tipo))
+    return pa.schema(campos, metadata=inferido.metadata)
+
+
+def _preparar_lote(nome, lote):
+    mapa, esquema, derivar = PREPARO[nome]
+    df, relatorio = normalizar(lote.rename(columns=mapa), esquema, nome)
+    if derivar is not None:
+        df = derivar(df)
+    return preparar_para_parquet(df), relatorio
+
+
+def converter_em_lotes(nome, pasta_dados, destino, tamanho_lote=TAMANHO_LOTE):
+    """Lê a planilha `nome` em lotes, prepara cada lote e grava o resultado como Parquet em `destino`.
+
+    Cada lote passa pelas mesmas etapas do pipeline em memória (remoção de
+    colunas, renomeação, `esquema.normalizar` e as colunas derivadas linha a
+    linha) e vira um `RecordBatch` do Arrow com o esquema fixo de
+    `esquema_arrow`, gravado como um grupo de linhas. O pico de memória
+    depende do tamanho do lote, não do arquivo. Retorna `(linhas, relatorio)`,
+    com o relatório de conversão de tipos somado sobre todos os lotes.
+    """
+    arquivo, aba = PLANILHAS[nome]
+    relatorios = []
+    linhas = 0
+
+    def escrever(temporario):
+        nonlocal linhas
+        gravador = None
+        try:
+            for lote in ler_em_lotes(os.path.join(pasta_dados, arquivo), aba, COLUNAS_REMOVER[nome], tamanho_lote):
+                df, relatorio = _preparar_lote(nome, lote)
+                relatorios.append(relatorio)
+                if gravador is None:
+                    esquema = esquema_arrow(nome, df)
+                    gravador = pq.ParquetWriter(temporario, esquema)
+                gravador.write_batch(pa.RecordBatch.from_pandas(df, schema=esquema, preserve_index=False))
+                linhas += len(df)
+        finally:
+            if gravador is not None:
+                gravador.close()
+        if gravador is None:
+            raise ValueError(f"A planilha '{nome}' de '{pasta_dados}' está vazia.")
+
+    escrever_atomico(destino, escrever)
+    relatorio = pd.concat(relatorios, ignore_index=True).groupby(['planilha', 'coluna', 'tipo'], sort=False, as_index=False).sum()
+    return linhas, relatorio
+
+
+def converter_exportacao(pasta, pasta_destino, tamanho_lote=TAMANHO_LOTE):
+    """Converte as três planilhas de uma exportação, em lotes, para `<pasta_destino>/<planilha>.parquet`.
+
+    Os arquivos ficam com pedidos e itens preparados e o supply normalizado
+    (ainda não consolidado); quem os usa também os percorre em lotes (ver
+    `particoes.ingerir_exportacao`). Retorna o relatório de conversão de tipos.
+    """
+    relatorios = []
+    for nome in ('Pedidos', 'Itens', 'Supply'):
+        _, relatorio = converter_em_lotes(nome, pasta, os.path.join(pasta_destino, f'{nome}.parquet'), tamanho_lote)
+        relatorios.append(relatorio)
+    return pd.concat(relatorios, ignore_index=True)
+
+
+def exportacao_grande(pasta, limite_bytes=LIMITE_BYTES_LEITURA_DIRETA):
+    """Indica se alguma planilha da exportação passa do limite para a leitura direta com `pd.read_excel`."""
+    return any(os.path.getsize(os.path.join(pasta, arquivo)) > limite_bytes for arquivo, _ in PLANILHAS.values())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Converte uma planilha grande para Parquet em lotes, com memória limitada.")
+    parser.add_argument('--planilha', choices=list(PLANILHAS), required=True)
+    parser.add_argument('--dados', default=PASTA_DADOS, help="Pasta com as planilhas (ex.: data/exportacoes/2025-03)")
+    parser.add_argument('--saida', required=True, help="Arquivo Parquet de destino")
+    parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help=f"Linhas por lote (padrão: {TAMANHO_LOTE:,})")
+    args = parser.parse_args(argv)
+
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    linhas, relatorio = converter_em_lotes(args.planilha, args.dados, args.saida, args.lote)
+    pico_mb = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+    tracemalloc.stop()
+    print(relatorio.to_string(index=False))
+    print(f"\n{linhas:,} linhas gravadas em '{args.saida}' em {time.perf_counter() - inicio:.1f}s (pico de memória: {pico_mb:,.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
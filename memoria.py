@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+
+# Colunas de texto com até esta fração de valores distintos viram categóricas
+LIMITE_CARDINALIDADE = 0.1
+
+_INTEIROS_NULAVEIS = [('Int8', np.int8), ('Int16', np.int16), ('Int32', np.int32)]
+
+
+def _menor_inteiro_nulavel(serie):
+    valores = serie.dropna()
+    if valores.empty:
+        return serie.astype('Int8')
+    minimo, maximo = valores.min(), valores.max()
+    for dtype, tipo_numpy in _INTEIROS_NULAVEIS:
+        info = np.iinfo(tipo_numpy)
+        if info.min <= minimo and maximo <= info.max:
+            return serie.astype(dtype)
+    return serie
+
+
+def _e_flag(serie):
+    """Coluna de texto/objeto que contém apenas True/False (e nulos)."""
+    valores = serie.dropna()
+    return not valores.empty and valores.map(type).eq(bool).all()
+
+
+def compactar(df, limite_cardinalidade=LIMITE_CARDINALIDADE):
+    """Retorna uma cópia do DataFrame com tipos compactos.
+
+    - textos de baixa cardinalidade viram `category`;
+    - inteiros (ids, contagens) são reduzidos ao menor tipo inteiro que os comporta;
+    - colunas com apenas True/False viram `bool` (ou `boolean`, se tiverem nulos).
+    """
+    compacto = {}
+    for coluna in df.columns:
+        serie = df[coluna]
+        if pd.api.types.is_bool_dtype(serie):
+            compacto[coluna] = serie
+        elif pd.api.types.is_integer_dtype(serie):
+            if isinstance(serie.dtype, pd.api.extensions.ExtensionDtype):
+                compacto[coluna] = _menor_inteiro_nulavel(serie)
+            else:
+                compacto[coluna] = pd.to_numeric(serie, downcast='integer')
+        elif serie.dtype == object:
+            if _e_flag(serie):
+                compacto[coluna] = serie.astype('bool' if serie.notna().all() else 'boolean')
+            elif len(serie) and serie.nunique(dropna=True) / len(serie) <= limite_cardinalidade:
+                compacto[coluna] = serie.astype('category')
+            else:
+                compacto[coluna] = serie
+        else:
+            compacto[coluna] = serie
+    return pd.DataFrame(compacto, index=df.index)
+
+
+def relatorio_memoria(antes, depois, tabela=''):
+    """Bytes por coluna antes e depois da compactação (inclui o conteúdo dos textos)."""
+    bytes_antes = antes.memory_usage(deep=True, index=False)
+    bytes_depois = depois.memory_usage(deep=True, index=False)
+    return pd.DataFrame({
+        'tabela': tabela,
+        'coluna': bytes_antes.index,
+        'dtype_antes': antes.dtypes.astype(str).values,
+        'dtype_depois': depois.dtypes.reindex(bytes_antes.index).astype(str).values,
+        'bytes_antes': bytes_antes.values,
+        'bytes_depois': bytes_depois.reindex(bytes_antes.index).values,
+    })
@@ -0,0 +1,63 @@
+import io
+import tempfile
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+TAMANHO_PAGINA = 50
+# Linhas gravadas por vez na exportação: o arquivo é montado em partes, sem uma cópia de texto da tabela inteira
+LINHAS_POR_BLOCO = 50_000
+# Formato -> (extensão, tipo MIME)
+FORMATOS_EXPORTACAO = {'CSV': ('csv', 'text/csv'), 'Parquet': ('parquet', 'application/vnd.apache.parquet')}
+
+
+def numero_paginas(n_linhas, tamanho=TAMANHO_PAGINA):
+    """Quantidade de páginas de `tamanho` linhas (pelo menos uma, mesmo com a tabela vazia)."""
+    return max(1, -(-n_linhas // tamanho))
+
+
+def ordem_linhas(df, coluna=None, crescente=True):
+    """Posições das linhas de `df` ordenadas por `coluna` (estável, nulos no fim); sem coluna, a ordem original."""
+    if coluna is None:
+        return np.arange(len(df))
+    valores = df[coluna].reset_index(drop=True)
+    return valores.sort_values(ascending=crescente, kind='stable', na_position='last').index.to_numpy()
+
+
+def pagina(df, coluna=None, crescente=True, numero=1, tamanho=TAMANHO_PAGINA):
+    """Linhas da página `numero` (a partir de 1) de `df` ordenado por `coluna`.
+
+    A ordenação é feita no servidor e só as linhas da página são copiadas,
+    de modo que o navegador recebe `tamanho` linhas, qualquer que seja o
+    tamanho da tabela.
+    """
+    inicio = (numero - 1) * tamanho
+    return df.take(ordem_linhas(df, coluna, crescente)[inicio:inicio + tamanho])
+
+
+def exportar(df, formato='CSV', linhas_por_bloco=LINHAS_POR_BLOCO):
+    """Conteúdo do arquivo `formato` ('CSV' ou 'Parquet') com a tabela inteira.
+
+    Os blocos de linhas são gravados num arquivo temporário em disco, lido
+    uma única vez no fim: a única cópia do arquivo em memória é o conteúdo
+    retornado (o `st.download_button` precisa dele inteiro).
+    """
+    with tempfile.TemporaryFile() as destino:
+        if formato == 'CSV':
+            # BOM do UTF-8 para o Excel reconhecer os acentos
+            texto = io.TextIOWrapper(destino, encoding='utf-8-sig', newline='')
+            for inicio in range(0, max(len(df), 1), linhas_por_bloco):
+                df.iloc[inicio:inicio + linhas_por_bloco].to_csv(texto, index=False, header=inicio == 0)
+            texto.flush()
+            texto.detach()  # sem fechar o arquivo junto
+        elif formato == 'Parquet':
+            esquema = pa.Schema.from_pandas(df, preserve_index=False)
+            with pq.ParquetWriter(destino, esquema) as gravador:
+                for inicio in range(0, len(df), linhas_por_bloco):
+                    bloco = df.iloc[inicio:inicio + linhas_por_bloco]
+                    gravador.write_table(pa.Table.from_pandas(bloco, schema=esquema, preserve_index=False))
+        else:
+            raise ValueError(f"Formato de exportação desconhecido: '{formato}'.")
+        destino.seek(0)
+        return destino.read()
@@ -0,0 +1,436 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from ingestao import PASTA_DADOS, PLANILHAS, escrever_atomico, ler_planilhas_excel, salvar_json, versao_dados
+from lotes import TAMANHO_LOTE, converter_exportacao, exportacao_grande
+from pipeline import agregar_supply, completar_bases, consolidar_supply, montar_base_pedidos, preparar_itens, preparar_pedidos, unir_bases
+from quantis import DIMENSOES_HISTOGRAMA, montar_histogramas
+
+# Cada exportação mensal fica em uma subpasta de `data/exportacoes` com as duas planilhas de sempre
+PASTA_EXPORTACOES = os.path.join(PASTA_DADOS, 'exportacoes')
+# Armazenamento particionado por mês (`<tabela>/ano_mes=AAAA-MM/dados.parquet`)
+PASTA_PARTICOES = os.path.join(PASTA_DADOS, 'particoes')
+
+# Sessões do Streamlit rodam em threads do mesmo processo: só uma ingere por vez
+_trava_ingestao = threading.Lock()
+
+# Agregados mergeáveis por mês: chaves do grão e medidas aditivas (somas e contagens, nunca médias)
+AGREGADOS = {
+    'pedidos_dia': ['data_pedido_norm'],
+    'sku': ['material_id', 'material_name', 'material_category'],
+    'transportadora': ['transportadora'],
+    'tempos': DIMENSOES_HISTOGRAMA,
+}
+
+
+def _caminho_particao(tabela, ano_mes, pasta_particoes=PASTA_PARTICOES):
+    return os.path.join(pasta_particoes, tabela, f'ano_mes={ano_mes}', 'dados.parquet')
+
+
+def _assinatura_exportacao(pasta):
+    """Assinatura da exportação a partir do nome, mtime e tamanho das planilhas."""
+    partes = []
+    for arquivo in sorted({arquivo for arquivo, _ in PLANILHAS.values()}):
+        info = os.stat(os.path.join(pasta, arquivo))
+        partes.append(f'{arquivo}:{info.st_mtime_ns}:{info.st_size}')
+    return hashlib.sha1('|'.join(partes).encode('utf-8')).hexdigest()[:12]
+
+
+def listar_exportacoes(pasta_exportacoes=PASTA_EXPORTACOES):
+    """Subpastas de exportação que contêm todas as planilhas esperadas, em ordem alfabética."""
+    if not os.path.isdir(pasta_exportacoes):
+        return []
+    arquivos = {arquivo for arquivo, _ in PLANILHAS.values()}
+    return [
+        os.path.join(pasta_exportacoes, nome) for nome in sorted(os.listdir(pasta_exportacoes))
+        if all(os.path.exists(os.path.join(pasta_exportacoes, nome, arquivo)) for arquivo in arquivos)
+    ]
+
+
+def _ler_manifesto(pasta_particoes):
+    try:
+        with open(os.path.join(pasta_particoes, 'manifesto.json'), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {'exportacoes': {}}
+
+
+def meses_armazenados(tabela='pedidos', pasta_particoes=PASTA_PARTICOES):
+    """Meses (`ano_mes`) presentes no armazenamento, em ordem cronológica."""
+    pasta = os.path.join(pasta_particoes, tabela)
+    if not os.path.isdir(pasta):
+        return []
+    return sorted(nome.split('=', 1)[1] for nome in os.listdir(pasta) if nome.startswith('ano_mes='))
+
+
+def ler_particao(tabela, ano_mes, pasta_particoes=PASTA_PARTICOES, filtros=None):
+    caminho = _caminho_particao(tabela, ano_mes, pasta_particoes)
+    if not os.path.exists(caminho):
+        return None
+    df = pd.read_parquet(caminho, filters=filtros)
+    df['ano_mes'] = ano_mes
+    return df
+
+
+def _escrever_particao(df, tabela, ano_mes, pasta_particoes):
+    caminho = _caminho_particao(tabela, ano_mes, pasta_particoes)
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    # A coluna de partição fica no nome da pasta (layout Hive), não dentro do arquivo
+    conteudo = df.drop(columns='ano_mes', errors='ignore')
+    escrever_atomico(caminho, lambda destino: conteudo.to_parquet(destino, index=False))
+
+
+def calcular_agregados(df_completo, df_pedidos):
+    """Agregados aditivos de um conjunto de pedidos: por dia, por SKU, por transportadora e os histogramas de tempos.
+
+    Todas as medidas são somas ou contagens, de modo que agregados de meses
+    diferentes podem ser combinados com uma simples soma; médias e taxas são
+    derivadas apenas na leitura (ver `combinar_agregados`).
+    """
+    pedidos = df_pedidos.assign(
+        valido_entrega=df_pedidos['tempo_entrega_dias'] >= 0,
+        valido_funil=(df_pedidos['tempo_preparo'] >= 0) & (df_pedidos['tempo_transito'] >= 0),
+        avaliado_sla=df_pedidos['data_entrega_norm'].notna() & df_pedidos['prazo_entrega_norm'].notna(),
+    )
+    pedidos['atrasado'] = pedidos['avaliado_sla'] & (pedidos['data_entrega_norm'] > pedidos['prazo_entrega_norm'])
+    pedidos['soma_tempo_entrega'] = pedidos['tempo_entrega_dias'].where(pedidos['valido_entrega'], 0)
+    pedidos['soma_tempo_preparo'] = pedidos['tempo_preparo'].where(pedidos['valido_funil'], 0)
+    pedidos['soma_tempo_transito'] = pedidos['tempo_transito'].where(pedidos['valido_funil'], 0)
+
+    pedidos_dia = pedidos.groupby('data_pedido_norm').agg(
+        pedidos=('id_pedido', 'count'),
+        cancelados=('foi_cancelado', 'sum'),
+        soma_valor_nf=('valor_nf', 'sum'),
+        soma_subtotal=('subtotal_calculado', 'sum'),
+        itens=('quantidade_itens', 'sum'),
+    ).reset_index()
+
+    itens = df_completo[df_completo['material_id'].notna()]
+    sku = itens.groupby(AGREGADOS['sku'], dropna=False).agg(
+        itens=('quantidade', 'sum'),
+        faturamento=('faturamento_item', 'sum'),
+        pedidos=('id_pedido', 'nunique'),  # cada pedido pertence a um único mês, então a soma entre meses é exata
+    ).reset_index()
+
+    transportadora = pedidos.groupby('transportadora').agg(
+        pedidos=('id_pedido', 'count'),
+        cancelados=('foi_cancelado', 'sum'),
+        soma_valor_nf=('valor_nf', 'sum'),
+        entregas_validas=('valido_entrega', 'sum'),
+        soma_tempo_entrega=('soma_tempo_entrega', 'sum'),
+        pedidos_funil=('valido_funil', 'sum'),
+        soma_tempo_preparo=('soma_tempo_preparo', 'sum'),
+        soma_tempo_transito=('soma_tempo_transito', 'sum'),
+        entregas_avaliadas=('avaliado_sla', 'sum'),
+        entregas_atrasadas=('atrasado', 'sum'),
+    ).reset_index()
+    tempos = montar_histogramas(df_pedidos)
+    return {'pedidos_dia': pedidos_dia, 'sku': sku, 'transportadora': transportadora, 'tempos': tempos}
+
+
+def _somar_agregados(partes):
+    """Soma os agregados de conjuntos de pedidos disjuntos (ex.: faixas de `id_pedido` de um mês)."""
+    if len(partes) == 1:
+        return partes[0]
+    return {
+        nome: pd.concat([parte[nome] for parte in partes], ignore_index=True).groupby(chaves, dropna=False).sum().reset_index()
+        for nome, chaves in AGREGADOS.items()
+    }
+
+
+def _recalcular_agregados_mes(ano_mes, pasta_particoes, pedidos_por_faixa=TAMANHO_LOTE):
+    """Recalcula os agregados de um único mês a partir das suas partições base.
+
+    Nenhum agregado usa colunas do estoque, então a junção com o Supply é
+    feita sem linhas: trocar a foto de estoque não muda os agregados dos meses.
+    O mês é lido em faixas de `id_pedido` com até `pedidos_por_faixa` pedidos
+    (com seus itens), e os agregados das faixas são somados: só os ids do mês
+    e uma faixa ficam em memória de cada vez.
+    """
+    ids = pq.read_table(_caminho_particao('pedidos', ano_mes, pasta_particoes), columns=['id_pedido'])['id_pedido']
+    ids = np.unique(ids.drop_null().to_numpy())
+    limites = ids[::pedidos_por_faixa]
+    partes = []
+    for numero, inicio in enumerate(limites):
+        filtros = [('id_pedido', '>=', inicio)]
+        if numero + 1 < len(limites):
+            filtros.append(('id_pedido', '<', limites[numero + 1]))
+        df_pedidos = ler_particao('pedidos', ano_mes, pasta_particoes, filtros if len(limites) > 1 else None)
+        df_itens = ler_particao('itens', ano_mes, pasta_particoes, filtros if len(limites) > 1 else None).drop(columns='ano_mes')
+        df_completo = unir_bases(df_pedidos, df_itens, df_itens[['material_id']].iloc[:0])
+        # O risco de supply depende do estoque e não entra nos agregados
+        df_completo['risco_num'] = 0
+        df_pedidos = montar_base_pedidos(df_pedidos, df_completo)
+        partes.append(calcular_agregados(df_completo, df_pedidos))
+    for nome, df in _somar_agregados(partes).items():
+        _escrever_particao(df, f'agregados/{nome}', ano_mes, pasta_particoes)
+
+
+def _caminho_estoque(pasta_particoes=PASTA_PARTICOES):
+    return os.path.join(pasta_particoes, 'supply.parquet')
+
+
+def _sem_coluna(esquema, coluna):
+    """Esquema Arrow sem `coluna`, inclusive nos metadados do pandas (que guardam os tipos nullable)."""
+    esquema = esquema.remove(esquema.get_field_index(coluna))
+    metadados = json.loads(esquema.metadata[b'pandas'])
+    metadados['columns'] = [c for c in metadados['columns'] if c['name'] != coluna]
+    return esquema.with_metadata({**esquema.metadata, b'pandas': json.dumps(metadados).encode('utf-8')})
+
+
+def _gravar_lotes(caminho, esquema, lotes):
+    """Grava os `RecordBatch` de `lotes` como um Parquet, de forma atômica, sem juntá-los em memória."""
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+
+    def escrever(destino):
+        with pq.ParquetWriter(destino, esquema) as gravador:
+            for lote in lotes:
+                gravador.write_batch(lote)
+
+    escrever_atomico(caminho, escrever)
+
+
+def _posicoes_por_chave(ids, chaves, repeticoes):
+    """Posições de `ids` presentes em `chaves` (ordenadas), cada uma repetida pelo número de linhas da chave.
+
+    Reproduz o `merge(how='inner')` dos itens com os pedidos: a ordem dos
+    itens é mantida e um pedido duplicado duplica os seus itens.
+    """
+    posicao = np.minimum(np.searchsorted(chaves, ids), len(chaves) - 1)
+    encontrados = np.flatnonzero(chaves[posicao] == ids)
+    return np.repeat(encontrados, repeticoes[posicao[encontrados]])
+
+
+def _separar_por_mes(caminho_pedidos, caminho_itens, pasta_temporaria, tamanho_lote):
+    """Separa pedidos e itens preparados (Parquet) em um arquivo por mês do pedido, lote a lote.
+
+    Cada item vai para o mês do seu pedido. Em memória ficam só o lote atual
+    e os `id_pedido` de cada mês. Retorna `{ano_mes: (ids, repeticoes)}`,
+    com os ids ordenados do mês e quantas linhas de pedido cada um tem.
+    """
+    arquivo = pq.ParquetFile(caminho_pedidos)
+    esquema = _sem_coluna(arquivo.schema_arrow, 'ano_mes')
+    gravadores, ids = {}, {}
+    try:
+        for lote in arquivo.iter_batches(batch_size=tamanho_lote):
+            meses = lote.column('ano_mes').to_numpy(zero_copy_only=False)
+            for ano_mes in pd.unique(meses):
+                if ano_mes is None or ano_mes == 'NaT':
+                    continue
+                if ano_mes not in gravadores:
+                    gravadores[ano_mes] = pq.ParquetWriter(os.path.join(pasta_temporaria, f'pedidos-{ano_mes}.parquet'), esquema)
+                    ids[ano_mes] = []
+                do_mes = lote.filter(pa.array(meses == ano_mes)).drop_columns('ano_mes')
+                gravadores[ano_mes].write_batch(do_mes)
+                ids[ano_mes].append(do_mes.column('id_pedido').to_numpy(zero_copy_only=False))
+    finally:
+        for gravador in gravadores.values():
+            gravador.close()
+    chaves = {ano_mes: np.unique(np.concatenate(partes), return_counts=True) for ano_mes, partes in ids.items()}
+
+    arquivo = pq.ParquetFile(caminho_itens)
+    gravadores = {ano_mes: pq.ParquetWriter(os.path.join(pasta_temporaria, f'itens-{ano_mes}.parquet'), arquivo.schema_arrow) for ano_mes in chaves}
+    try:
+        for lote in arquivo.iter_batches(batch_size=tamanho_lote):
+            ids_itens = lote.column('id_pedido').to_numpy(zero_copy_only=False)
+            for ano_mes, (ids_mes, repeticoes) in chaves.items():
+                posicoes = _posicoes_por_chave(ids_itens, ids_mes, repeticoes)
+                if len(posicoes):
+                    gravadores[ano_mes].write_batch(lote.take(posicoes))
+    finally:
+        for gravador in gravadores.values():
+            gravador.close()
+    return chaves
+
+
+def _mesclar_particao(tabela, ano_mes, caminho_novos, substituidos, pasta_particoes, tamanho_lote):
+    """Grava a partição do mês: as linhas já armazenadas cujo `id_pedido` não está em `substituidos`, seguidas das novas.
+
+    As duas partes são copiadas lote a lote, convertidas para o esquema das
+    linhas novas; a partição nunca é montada inteira em memória.
+    """
+    novos = pq.ParquetFile(caminho_novos)
+    esquema = novos.schema_arrow
+    caminho = _caminho_particao(tabela, ano_mes, pasta_particoes)
+    existentes = pq.ParquetFile(caminho) if os.path.exists(caminho) else None
+
+    def lotes():
+        if existentes is not None:
+            for lote in existentes.iter_batches(batch_size=tamanho_lote):
+                ids = lote.column('id_pedido').to_numpy(zero_copy_only=False)
+                lote = lote.filter(pa.array(~np.isin(ids, substituidos)))
+                yield pa.RecordBatch.from_arrays([lote.column(campo.name).cast(campo.type) for campo in esquema], schema=esquema)
+        yield from novos.iter_batches(batch_size=tamanho_lote)
+
+    try:
+        _gravar_lotes(caminho, esquema, lotes())
+    finally:
+        if existentes is not None:
+            existentes.close()
+        novos.close()
+
+
+def ingerir_exportacao(pasta, pasta_particoes=PASTA_PARTICOES, em_lotes=None, atualizar_estoque=True, tamanho_lote=TAMANHO_LOTE):
+    """Normaliza uma exportação e grava seus pedidos e itens nas partições mensais.
+
+    Pedidos de um mês já armazenado substituem as versões anteriores com o
+    mesmo `id_pedido`; os demais pedidos daquele mês são preservados. Só os
+    agregados dos meses tocados por esta exportação são recalculados.
+    Com `atualizar_estoque`, o estoque desta exportação passa a ser a foto
+    armazenada; sem ele (exportação mais antiga que a da foto), a foto não
+    muda.
+
+    Pedidos e itens preparados passam por arquivos Parquet temporários e daí
+    em diante são processados em lotes de `tamanho_lote` linhas: separação
+    por mês, substituição nas partições e agregados (por faixas de pedidos).
+    Exportações grandes (ou com `em_lotes=True`) também são lidas e
+    normalizadas em lotes (ver `lotes.py`); assim, a memória depende do lote
+    e dos `id_pedido` de cada mês, não do tamanho do arquivo. O supply,
+    consolidado por material, é a exceção: é lido inteiro. Retorna a lista
+    de meses atualizados.
+    """
+    if em_lotes is None:
+        em_lotes = exportacao_grande(pasta)
+    os.makedirs(pasta_particoes, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=pasta_particoes, prefix='.ingestao-') as pasta_temporaria:
+        caminho_pedidos = os.path.join(pasta_temporaria, 'Pedidos.parquet')
+        caminho_itens = os.path.join(pasta_temporaria, 'Itens.parquet')
+        if em_lotes:
+            converter_exportacao(pasta, pasta_temporaria, tamanho_lote)
+            df_supply_agg = consolidar_supply(pd.read_parquet(os.path.join(pasta_temporaria, 'Supply.parquet')))
+        else:
+            planilhas = ler_planilhas_excel(pasta_dados=pasta)
+            preparar_pedidos(planilhas.pop('Pedidos'))[0].to_parquet(caminho_pedidos, index=False)
+            preparar_itens(planilhas.pop('Itens'))[0].to_parquet(caminho_itens, index=False)
+            df_supply_agg, _ = agregar_supply(planilhas.pop('Supply'))
+
+        # O estoque é uma foto: só a exportação mais recente define o estado atual
+        if atualizar_estoque:
+            escrever_atomico(_caminho_estoque(pasta_particoes), lambda destino: df_supply_agg.to_parquet(destino, index=False))
+
+        chaves = _separar_por_mes(caminho_pedidos, caminho_itens, pasta_temporaria, tamanho_lote)
+        meses = sorted(chaves)
+        for ano_mes in meses:
+            substituidos = chaves[ano_mes][0]
+            for tabela in ('pedidos', 'itens'):
+                caminho_novos = os.path.join(pasta_temporaria, f'{tabela}-{ano_mes}.parquet')
+                _mesclar_particao(tabela, ano_mes, caminho_novos, substituidos, pasta_particoes, tamanho_lote)
+            _recalcular_agregados_mes(ano_mes, pasta_particoes, tamanho_lote)
+    return meses
+
+
+def _exportacao_do_estoque(manifesto, pasta_particoes=PASTA_PARTICOES):
+    """Nome da exportação que forneceu a foto de estoque armazenada ('' se não houver foto)."""
+    if not os.path.exists(_caminho_estoque(pasta_particoes)):
+        return ''
+    # Manifestos anteriores ao campo `estoque`: a foto veio da exportação mais recente já ingerida
+    return manifesto.get('estoque', max(manifesto['exportacoes'], default=''))
+
+
+def ingerir_novas_exportacoes(pasta_exportacoes=PASTA_EXPORTACOES, pasta_particoes=PASTA_PARTICOES):
+    """Processa apenas as exportações ainda não ingeridas (ou alteradas desde a última ingestão).
+
+    As exportações são nomeadas pelo mês (`AAAA-MM`), então a mais recente é
+    a de maior nome: reingerir uma exportação antiga não substitui a foto de
+    estoque de uma mais nova. Os meses já armazenados que a exportação não
+    traz não são relidos.
+    Retorna `{pasta: meses_atualizados}` das exportações processadas.
+    """
+    processadas = {}
+    with _trava_ingestao:
+        manifesto = _ler_manifesto(pasta_particoes)
+        estoque = _exportacao_do_estoque(manifesto, pasta_particoes)
+        for pasta in listar_exportacoes(pasta_exportacoes):
+            nome = os.path.basename(pasta)
+            assinatura = _assinatura_exportacao(pasta)
+            if manifesto['exportacoes'].get(nome, {}).get('assinatura') == assinatura:
+                continue
+            atualizar_estoque = nome >= estoque
+            meses = ingerir_exportacao(pasta, pasta_particoes, atualizar_estoque=atualizar_estoque)
+            if atualizar_estoque:
+                estoque = manifesto['estoque'] = nome
+            manifesto['exportacoes'][nome] = {'assinatura': assinatura, 'meses': meses}
+            escrever_atomico(os.path.join(pasta_particoes, 'manifesto.json'), lambda destino: salvar_json(manifesto, destino))
+            processadas[pasta] = meses
+    return processadas
+
+
+def versao_particoes(pasta_particoes=PASTA_PARTICOES):
+    """Identificador da versão do armazenamento (exportações ingeridas e suas assinaturas)."""
+    manifesto = _ler_manifesto(pasta_particoes)
+    conteudo = json.dumps(manifesto['exportacoes'], sort_keys=True)
+    return hashlib.sha1(conteudo.encode('utf-8')).hexdigest()[:12]
+
+
+def identificar_fonte():
+    """Define a origem dos dados: o armazenamento particionado por mês, se houver exportações em `data/exportacoes`, ou as duas planilhas de `data`.
+
+    Ingere as exportações novas antes de responder. Retorna `(tipo, versao)`,
+    usado como chave dos caches.
+    """
+    if listar_exportacoes():
+        ingerir_novas_exportacoes()
+        return 'particoes', versao_particoes()
+    return 'planilhas', versao_dados()
+
+
+def meses_para_leitura(meses=None, pasta_particoes=PASTA_PARTICOES):
+    """`meses` (ou todos os armazenados), com erro claro se algum deles, ou todos, ainda não foram ingeridos."""
+    armazenados = meses_armazenados(pasta_particoes=pasta_particoes)
+    if not armazenados:
+        raise FileNotFoundError(
+            f"Nenhuma partição ingerida em '{pasta_particoes}': coloque as exportações mensais em "
+            f"'{PASTA_EXPORTACOES}/AAAA-MM' (são ingeridas ao abrir o dashboard, o `kpis.py` ou o `consultas.py`)."
+        )
+    ausentes = sorted(set(meses or []) - set(armazenados))
+    if ausentes:
+        raise FileNotFoundError(f"Meses sem partição em '{pasta_particoes}': {', '.join(ausentes)}.")
+    return meses or armazenados
+
+
+def carregar_bases_particionadas(meses=None, pasta_particoes=PASTA_PARTICOES, compacto=False):
+    """Monta as bases do dashboard a partir das partições (todos os meses ou apenas `meses`).
+
+    As partições já estão normalizadas; só a junção com o estoque mais recente
+    e as etapas seguintes do pipeline são executadas. É o caminho de uma
+    versão nova: o dashboard, `kpis.carregar_bases` e `consultas.py` passam
+    por `compartilhado.obter_bases`, que publica o resultado uma vez por
+    versão e o reabre do disco nas cargas seguintes.
+    """
+    meses = meses_para_leitura(meses, pasta_particoes)
+    df_pedidos = pd.concat([ler_particao('pedidos', m, pasta_particoes) for m in meses], ignore_index=True)
+    df_itens = pd.concat([ler_particao('itens', m, pasta_particoes) for m in meses], ignore_index=True).drop(columns='ano_mes')
+    df_supply_agg = pd.read_parquet(_caminho_estoque(pasta_particoes))
+    df_completo = unir_bases(df_pedidos, df_itens, df_supply_agg)
+    relatorio_esquema = pd.DataFrame(columns=['planilha', 'coluna', 'tipo', 'linhas_coagidas', 'linhas_descartadas'])
+    return completar_bases(df_completo, df_pedidos, df_supply_agg, relatorio_esquema, compacto)
+
+
+def combinar_agregados(nome, meses=None, pasta_particoes=PASTA_PARTICOES):
+    """Soma os agregados mensais de `nome` ('pedidos_dia', 'sku', 'transportadora' ou 'tempos') e deriva médias e taxas."""
+    meses = meses or meses_armazenados(f'agregados/{nome}', pasta_particoes)
+    partes = [ler_particao(f'agregados/{nome}', m, pasta_particoes) for m in meses]
+    partes = [p for p in partes if p is not None]
+    if not partes:
+        return pd.DataFrame(columns=AGREGADOS[nome])
+    combinado = pd.concat(partes, ignore_index=True).drop(columns='ano_mes')
+    combinado = combinado.groupby(AGREGADOS[nome], dropna=False).sum().reset_index()
+
+    if nome == 'transportadora':
+        combinado['taxa_cancelamento'] = combinado['cancelados'] / combinado['pedidos'] * 100
+        combinado['tempo_medio_entrega'] = combinado['soma_tempo_entrega'] / combinado['entregas_validas']
+        combinado['tempo_medio_preparo'] = combinado['soma_tempo_preparo'] / combinado['pedidos_funil']
+        combinado['tempo_medio_transito'] = combinado['soma_tempo_transito'] / combinado['pedidos_funil']
+        combinado['taxa_atraso_%'] = combinado['entregas_atrasadas'] / combinado['entregas_avaliadas'] * 100
+    elif nome == 'pedidos_dia':
+        combinado['ticket_medio'] = combinado['soma_valor_nf'] / combinado['pedidos']
+    return combinado
+
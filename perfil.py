@@ -0,0 +1,179 @@
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+
+COLUNAS = ['ordem', 'secao', 'etapa', 'segundos', 'pico_mb', 'linhas_entrada', 'linhas_saida', 'cache']
+
+# Perfilador da execução em andamento em cada thread (cada sessão do Streamlit roda o script em uma thread)
+_local = threading.local()
+
+# O tracemalloc é global ao processo: fica ligado enquanto houver alguma execução medindo e é desligado pela
+# última, se foi o perfil que o ligou (contagem no módulo, não por perfilador: as sessões se sobrepõem)
+_trava_tracemalloc = threading.Lock()
+_medicoes_abertas = 0
+_ligado_pelo_perfil = False
+
+
+def _abrir_medicao():
+    global _medicoes_abertas, _ligado_pelo_perfil
+    with _trava_tracemalloc:
+        if _medicoes_abertas == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _ligado_pelo_perfil = True
+        _medicoes_abertas += 1
+
+
+def _fechar_medicao():
+    global _medicoes_abertas, _ligado_pelo_perfil
+    with _trava_tracemalloc:
+        _medicoes_abertas -= 1
+        if _medicoes_abertas == 0 and _ligado_pelo_perfil:
+            tracemalloc.stop()
+            _ligado_pelo_perfil = False
+
+
+def _pontos(trace):
+    for eixo in ('x', 'locations', 'values'):
+        valores = getattr(trace, eixo, None)
+        if valores is not None:
+            return len(valores)
+    return 0
+
+
+def _contar_linhas(objeto):
+    if isinstance(objeto, (pd.DataFrame, pd.Series)):
+        return len(objeto)
+    if isinstance(objeto, tuple) and objeto and isinstance(objeto[0], pd.DataFrame):
+        return len(objeto[0])
+    if isinstance(objeto, go.Figure):  # total de pontos da figura
+        return sum(_pontos(trace) for trace in objeto.data)
+    return None
+
+
+class Perfilador:
+    """Registra, para cada seção do dashboard, tempo, pico de memória, linhas de entrada/saída e uso de cache.
+
+    Inativo, apenas executa as funções. Ativo, mede o pico de memória com o
+    tracemalloc; como ele é global ao processo, sessões simultâneas somam suas
+    alocações.
+    """
+
+    def __init__(self, ativo=False):
+        self.ativo = ativo
+        self.registros = []
+        self._pilha = []
+        self._medindo = ativo
+        if ativo:
+            _abrir_medicao()
+        _local.perfilador = self
+
+    @contextmanager
+    def secao(self, nome, etapa='dados', linhas_entrada=None, cache=False):
+        """Mede o bloco; o dicionário retornado aceita `linhas_saida` (e `cache`, se a etapa usar cache)."""
+        registro = {'ordem': len(self.registros), 'secao': nome, 'etapa': etapa, 'linhas_entrada': linhas_entrada,
+                    'linhas_saida': None, 'cache': 'hit' if cache else None}
+        if not self.ativo:
+            yield registro
+            return
+        self.registros.append(registro)
+        # Guarda o pico das seções externas antes de zerá-lo para a seção interna
+        pico = tracemalloc.get_traced_memory()[1]
+        for externa in self._pilha:
+            externa['pico'] = max(externa['pico'], pico)
+        tracemalloc.reset_peak()
+        quadro = {'registro': registro, 'inicio_memoria': tracemalloc.get_traced_memory()[0], 'pico': 0}
+        self._pilha.append(quadro)
+        inicio = time.perf_counter()
+        try:
+            yield registro
+        finally:
+            registro['segundos'] = time.perf_counter() - inicio
+            pico = tracemalloc.get_traced_memory()[1]
+            for aberta in self._pilha:
+                aberta['pico'] = max(aberta['pico'], pico)
+            self._pilha.pop()
+            registro['pico_mb'] = (quadro['pico'] - quadro['inicio_memoria']) / 1024 ** 2
+
+    def marcar_miss(self):
+        """Chamado dentro de uma função cacheada: se o corpo executou, o cache não foi usado."""
+        for quadro in reversed(self._pilha):
+            if quadro['registro']['cache'] is not None:
+                quadro['registro']['cache'] = 'miss'
+                return
+
+    def _medir(self, nome, etapa, funcao, args, kwargs, cache=False):
+        if not self.ativo:
+            return funcao(*args, **kwargs)
+        with self.secao(nome, etapa, _contar_linhas(args[0]) if args else None, cache) as registro:
+            resultado = funcao(*args, **kwargs)
+            registro['linhas_saida'] = _contar_linhas(resultado)
+        return resultado
+
+    def dados(self, nome, funcao, *args, **kwargs):
+        """Executa um cálculo (ex.: uma função de `kpis`) e registra o seu custo."""
+        return self._medir(nome, 'dados', funcao, args, kwargs)
+
+    def cache(self, nome, funcao, *args, **kwargs):
+        """Executa uma função `st.cache_data` e registra se o resultado veio do cache."""
+        return self._medir(nome, 'cache', funcao, args, kwargs, cache=True)
+
+    def figura(self, nome, funcao, *args, **kwargs):
+        """Monta uma figura (ex.: `px.bar`) e registra o custo e o número de pontos."""
+        return self._medir(nome, 'figura', funcao, args, kwargs)
+
+    def grafico_cacheado(self, nome, figuras, chave, montar, enviar):
+        """Envia a figura de `chave` do cache de figuras (`figuras.CacheFiguras`), montando-a só na falta, e registra acerto/falta."""
+        with self.secao(nome, 'grafico', cache=True) as registro:
+            spec, acerto = figuras.obter(chave, montar)
+            if not acerto:
+                registro['cache'] = 'miss'
+            enviar(spec)
+
+    def tabela(self):
+        """Registros da execução atual, na ordem em que as seções começaram."""
+        return pd.DataFrame(self.registros, columns=COLUNAS)
+
+    def encerrar(self):
+        """Encerra a medição desta execução; a última a encerrar desliga o tracemalloc (ele deixa as alocações mais lentas).
+
+        Pode ser chamado mais de uma vez: o app o chama num `finally`, para
+        que uma execução interrompida não deixe o tracemalloc ligado.
+        """
+        if self._medindo:
+            self._medindo = False
+            _fechar_medicao()
+
+    def exibir_painel(self):
+        """Painel na barra lateral com os registros desta execução e a exportação em JSON/CSV."""
+        if not self.ativo:
+            return
+        self.encerrar()
+        tabela = self.tabela()
+        carimbo = time.strftime('%Y%m%d-%H%M%S')
+        with st.sidebar.expander("⏱️ Perfil desta execução", expanded=True):
+            por_etapa = tabela.groupby('etapa')['segundos'].sum()
+            st.caption(" · ".join(f"{etapa}: {segundos:.2f}s" for etapa, segundos in por_etapa.items()))
+            st.dataframe(
+                tabela.sort_values('segundos', ascending=False), hide_index=True,
+                column_config={'segundos': st.column_config.NumberColumn(format='%.3f'),
+                               'pico_mb': st.column_config.NumberColumn(format='%.1f')}
+            )
+            st.download_button("Exportar CSV", tabela.to_csv(index=False), f"perfil_{carimbo}.csv", 'text/csv')
+            st.download_button(
+                "Exportar JSON", tabela.to_json(orient='records', force_ascii=False, indent=2),
+                f"perfil_{carimbo}.json", 'application/json'
+            )
+
+
+def atual():
+    """Perfilador da execução em andamento nesta thread (um inativo, se nenhum foi criado)."""
+    return getattr(_local, 'perfilador', None) or Perfilador()
+
+
+def marcar_miss():
+    atual().marcar_miss()
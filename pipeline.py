@@ -0,0 +1,218 @@
+from typing import NamedTuple
+
+import pandas as pd
+
+from esquema import ESQUEMA_ITENS, ESQUEMA_PEDIDOS, ESQUEMA_SUPPLY, normalizar
+from memoria import compactar, relatorio_memoria
+from segmentos import distribuir, indexar, localizar, maximo, primeiras_linhas, somar
+from vetorizado import classificar_niveis, rotular_niveis
+
+# Renomeação de colunas para facilitar a análise
+MAPA_NOMES_PEDIDOS = {
+    'id': 'id_pedido', 'reference': 'numero_referencia', 'created_at': 'data_pedido',
+    'Valor de NF (R$)': 'valor_nf', 'order_state': 'estado_pedido_interno', 'Cidade': 'cidade',
+    'Estado': 'estado', 'Frete Cobrado do Cliente (R$)': 'frete_cliente',
+    'Frete cobrado pela transportadora (R$)': 'frete_transportadora',
+    'Transportadora': 'transportadora', 'Número da NF': 'numero_nf',
+    'Status do Pedido': 'status_pedido', 'Prazo para Sair do CD': 'prazo_saida_cd',
+    'Enviado em:': 'data_envio', 'Entregue para o cliente em:': 'data_entrega',
+    'Prazo a transportadora entregar no cliente': 'prazo_entrega_transportadora',
+    'Número de Itens no Pedido': 'numero_itens'
+}
+MAPA_NOMES_ITENS = {'order_id': 'id_pedido'}
+MAPA_NOMES_SUPPLY = {'quantity': 'estoque_disponivel'}
+
+COLUNAS_COBERTURA = ['material_id', 'vendas_totais', 'media_vendas_diaria', 'material_name', 'estoque_disponivel', 'dias_cobertura']
+
+# Versão do que o pipeline calcula: incremente ao mudar colunas, tipos ou regras das bases processadas, para
+# que as bases já publicadas em disco (`compartilhado.py`) sejam recalculadas em vez de servidas após o deploy
+VERSAO_PIPELINE = 1
+
+
+def preparar_pedidos(df_pedidos_raw):
+    """Renomeia e normaliza a base de pedidos, derivando os tempos de cada etapa em dias."""
+    df_pedidos, relatorio = normalizar(df_pedidos_raw.rename(columns=MAPA_NOMES_PEDIDOS), ESQUEMA_PEDIDOS, 'Pedidos')
+    return derivar_pedidos(df_pedidos), relatorio
+
+
+def derivar_pedidos(df_pedidos):
+    """Colunas derivadas de cada pedido já normalizado (linha a linha, podendo ser aplicada em lotes)."""
+    # Criação de novas colunas a partir das datas já normalizadas para o dia
+    df_pedidos['tempo_entrega_dias'] = (df_pedidos['data_entrega_norm'] - df_pedidos['data_pedido_norm']).dt.days
+    df_pedidos['tempo_preparo'] = (df_pedidos['data_envio_norm'] - df_pedidos['data_pedido_norm']).dt.days
+    df_pedidos['tempo_transito'] = (df_pedidos['data_entrega_norm'] - df_pedidos['data_envio_norm']).dt.days
+    df_pedidos['ano_mes'] = df_pedidos['data_pedido'].dt.to_period('M').astype(str)
+    return df_pedidos
+
+
+def preparar_itens(df_itens_raw):
+    """Renomeia e normaliza a base de itens."""
+    df_itens, relatorio = normalizar(df_itens_raw.rename(columns=MAPA_NOMES_ITENS), ESQUEMA_ITENS, 'Itens')
+    return derivar_itens(df_itens), relatorio
+
+
+def derivar_itens(df_itens):
+    """Preço sem nulos e quantidade de cada item já normalizado (linha a linha, podendo ser aplicada em lotes)."""
+    df_itens['price'] = df_itens['price'].fillna(0)
+    df_itens['quantidade'] = 1
+    return df_itens
+
+
+def agregar_supply(df_supply_raw):
+    """Consolida o estoque por material (soma do estoque, primeiro status de descontinuação e leadtime médio)."""
+    df_supply, relatorio = normalizar(df_supply_raw.rename(columns=MAPA_NOMES_SUPPLY), ESQUEMA_SUPPLY, 'Supply')
+    return consolidar_supply(df_supply), relatorio
+
+
+def consolidar_supply(df_supply):
+    """Agrupa o estoque já normalizado por material."""
+    return df_supply.groupby('material_id').agg({
+        'estoque_disponivel': 'sum', 'discontinued': 'first', 'leadtime': 'mean'
+    }).reset_index()
+
+
+def montar_base_completa(df_pedidos_raw, df_itens_raw, df_supply_raw):
+    """Executa todo o pré-processamento e a junção Pedidos -> Itens -> Supply.
+
+    A função é determinística e não altera os DataFrames de entrada, de modo que
+    o resultado pode ser cacheado pela versão dos dados de origem.
+    Retorna `(df_completo, df_pedidos, df_supply_agg, relatorio_esquema)`, com
+    `df_completo` no grão de item, `df_pedidos` com os atributos de cada pedido
+    já normalizados e o relatório de conversão de tipos das três planilhas.
+    """
+    df_pedidos, relatorio_pedidos = preparar_pedidos(df_pedidos_raw)
+    df_itens, relatorio_itens = preparar_itens(df_itens_raw)
+    df_supply_agg, relatorio_supply = agregar_supply(df_supply_raw)
+    relatorio_esquema = pd.concat([relatorio_pedidos, relatorio_itens, relatorio_supply], ignore_index=True)
+    return unir_bases(df_pedidos, df_itens, df_supply_agg), df_pedidos, df_supply_agg, relatorio_esquema
+
+
+def unir_bases(df_pedidos, df_itens, df_supply_agg):
+    """Junta as bases já normalizadas (Pedidos -> Itens -> Supply) no grão de item."""
+    # Junção (Merge) das Bases
+    df_itens_supply = pd.merge(
+        left=df_itens, right=df_supply_agg, on='material_id', how='left'
+    )
+    df_completo = pd.merge(
+        left=df_pedidos, right=df_itens_supply, on='id_pedido', how='left'
+    )
+    df_completo['material_name'] = df_completo['material_name'].fillna('Não informado')
+    df_completo['faturamento_item'] = df_completo['quantidade'] * df_completo['price']
+    return df_completo
+
+
+def calcular_cobertura_estoque(df_completo):
+    """Calcula os dias de cobertura de estoque dos produtos ativos com vendas no período.
+
+    Retorna os produtos ordenados do mais crítico (menor cobertura) para o menos
+    crítico e, em caso de empate, pelo maior impacto (maior média de vendas).
+    """
+    df_ativo = df_completo[df_completo['discontinued'].fillna(False) == False]
+    if df_ativo.empty:
+        return pd.DataFrame(columns=COLUNAS_COBERTURA)
+
+    dias_analise = (df_ativo['data_pedido'].max() - df_ativo['data_pedido'].min()).days
+    vendas_por_id = df_ativo.groupby('material_id')['quantidade'].sum().reset_index()
+    vendas_por_id.rename(columns={'quantidade': 'vendas_totais'}, inplace=True)
+    estoque_por_id = df_ativo[['material_id', 'material_name', 'estoque_disponivel']].drop_duplicates(subset='material_id')
+    return finalizar_cobertura(vendas_por_id, estoque_por_id, dias_analise)
+
+
+def finalizar_cobertura(vendas_por_id, estoque_por_id, dias_analise):
+    """Dias de cobertura a partir das vendas e do estoque por material, já agregados.
+
+    Separada de `calcular_cobertura_estoque` para que outros motores de
+    consulta (ver `consultas.py`) façam só as agregações e compartilhem as
+    regras de arredondamento, filtro e ordenação.
+    """
+    if dias_analise == 0: dias_analise = 1
+    vendas_por_id = vendas_por_id.assign(media_vendas_diaria=vendas_por_id['vendas_totais'] / dias_analise)
+    analise_cobertura = pd.merge(vendas_por_id, estoque_por_id, on='material_id')
+
+    analise_cobertura['estoque_disponivel'] = analise_cobertura['estoque_disponivel'].fillna(0)
+    analise_cobertura['dias_cobertura'] = (
+        analise_cobertura['estoque_disponivel'] / (analise_cobertura['media_vendas_diaria'] + 0.0001)
+    ).round(0).astype(int)
+
+    return analise_cobertura[analise_cobertura['media_vendas_diaria'] > 0].sort_values(
+        by=['dias_cobertura', 'media_vendas_diaria'], ascending=[True, False]
+    )
+
+
+# Níveis de risco de supply de um item/pedido
+RISCO_MAP = {'Baixo': 0, 'Médio (Alerta)': 1, 'Alto (Ruptura)': 2}
+
+
+def classificar_risco_itens(df_completo, produtos_criticos):
+    """Marca cada item com seu nível de risco de supply (`risco_item`) e o código numérico (`risco_num`)."""
+    # Separa IDs de produtos em 'Ruptura' (estoque=0) e 'Alerta' (estoque baixo)
+    ids_ruptura = produtos_criticos[produtos_criticos['dias_cobertura'] == 0]['material_id'].unique()
+    ids_alerta = produtos_criticos[(produtos_criticos['dias_cobertura'] > 0) & (produtos_criticos['dias_cobertura'] < 7)]['material_id'].unique()
+
+    # Código numérico calculado de uma vez; o rótulo é uma categoria sobre o mesmo código
+    df_completo['risco_num'] = classificar_niveis(df_completo['material_id'], [ids_alerta, ids_ruptura])
+    df_completo['risco_item'] = rotular_niveis(df_completo['risco_num'], list(RISCO_MAP))
+    return df_completo
+
+
+def montar_base_pedidos(df_pedidos, df_completo):
+    """Monta a tabela no grão de pedido: atributos do pedido mais os agregados dos seus itens.
+
+    Substitui os vários `drop_duplicates(subset='id_pedido')` sobre a base
+    unificada: cada pedido aparece uma única vez, com `subtotal_calculado`,
+    `quantidade_itens`, o maior risco de supply entre os itens e a flag de
+    cancelamento. Os itens são indexados por pedido uma única vez (layout
+    CSR, ver `segmentos.py`) e os agregados são reduções por segmento, sem
+    `groupby`.
+    """
+    itens_por_pedido = indexar(df_completo['id_pedido'])
+    pedidos = indexar(df_pedidos['id_pedido'])
+    if len(pedidos.chaves) < len(df_pedidos):
+        df_pedidos = df_pedidos.take(primeiras_linhas(pedidos))
+    segmento = localizar(itens_por_pedido, df_pedidos['id_pedido'])
+    agregados_itens = pd.DataFrame({
+        'subtotal_calculado': distribuir(somar(itens_por_pedido, df_completo['faturamento_item']), segmento),
+        'quantidade_itens': distribuir(somar(itens_por_pedido, df_completo['quantidade']), segmento),
+        'risco_num': distribuir(maximo(itens_por_pedido, df_completo['risco_num']), segmento),
+    })
+    df_base_pedidos = pd.concat([df_pedidos.reset_index(drop=True), agregados_itens], axis=1)
+    df_base_pedidos['nivel_risco_pedido'] = rotular_niveis(df_base_pedidos['risco_num'], list(RISCO_MAP))
+    df_base_pedidos['foi_cancelado'] = df_base_pedidos['status_pedido'] == 'canceled'
+    return df_base_pedidos
+
+
+class BasesProcessadas(NamedTuple):
+    """Resultado do pipeline para uma versão dos dados."""
+    df_completo: pd.DataFrame          # base unificada no grão de item, com o risco de supply de cada item
+    df_pedidos: pd.DataFrame           # base no grão de pedido
+    df_supply_agg: pd.DataFrame        # estoque consolidado por material
+    produtos_criticos: pd.DataFrame    # cobertura de estoque dos produtos ativos
+    relatorio_esquema: pd.DataFrame    # linhas coagidas/descartadas por regra do esquema
+    relatorio_memoria: pd.DataFrame = None  # bytes por coluna antes/depois, apenas no modo compacto
+
+
+def montar_bases(df_pedidos_raw, df_itens_raw, df_supply_raw, compacto=False):
+    """Pipeline completo por versão dos dados.
+
+    Com `compacto=True`, as bases no grão de item e de pedido são convertidas
+    para tipos compactos (categorias, inteiros reduzidos e booleanos) e o
+    resultado traz o relatório de memória por coluna.
+    """
+    df_completo, df_pedidos, df_supply_agg, relatorio_esquema = montar_base_completa(df_pedidos_raw, df_itens_raw, df_supply_raw)
+    return completar_bases(df_completo, df_pedidos, df_supply_agg, relatorio_esquema, compacto)
+
+
+def completar_bases(df_completo, df_pedidos, df_supply_agg, relatorio_esquema, compacto=False):
+    """Etapas do pipeline posteriores à junção: cobertura, risco, grão de pedido e compactação."""
+    produtos_criticos = calcular_cobertura_estoque(df_completo)
+    df_completo = classificar_risco_itens(df_completo, produtos_criticos)
+    df_pedidos = montar_base_pedidos(df_pedidos, df_completo)
+    if not compacto:
+        return BasesProcessadas(df_completo, df_pedidos, df_supply_agg, produtos_criticos, relatorio_esquema)
+
+    df_completo_compacto, df_pedidos_compacto = compactar(df_completo), compactar(df_pedidos)
+    relatorio = pd.concat([
+        relatorio_memoria(df_completo, df_completo_compacto, 'df_completo'),
+        relatorio_memoria(df_pedidos, df_pedidos_compacto, 'df_pedidos'),
+    ], ignore_index=True)
+    return BasesProcessadas(df_completo_compacto, df_pedidos_compacto, df_supply_agg, produtos_criticos, relatorio_esquema, relatorio)
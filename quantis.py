@@ -0,0 +1,150 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+# Tempos (em dias inteiros) resumidos pelos histogramas, com o rótulo usado nos gráficos
+MEDIDAS_TEMPO = {'tempo_preparo': 'Preparo', 'tempo_transito': 'Trânsito', 'tempo_entrega_dias': 'Entrega total'}
+DIMENSOES_HISTOGRAMA = ['dia', 'estado', 'transportadora', 'medida', 'dias']
+PERCENTIS = (0.5, 0.9, 0.99)
+# Agrupamentos dos percentis (colunas do histograma) -> coluna equivalente nos pedidos
+AGRUPAMENTOS = {'transportadora': 'transportadora', 'estado': 'estado', 'dia': 'data_pedido_norm'}
+
+
+def _tempos_validos(df_pedidos):
+    """Máscara de validade de cada tempo, com os mesmos filtros das médias (ver `kpis.funil_por_transportadora`)."""
+    funil = (df_pedidos['tempo_preparo'] >= 0) & (df_pedidos['tempo_transito'] >= 0)
+    return {'tempo_preparo': funil, 'tempo_transito': funil, 'tempo_entrega_dias': df_pedidos['tempo_entrega_dias'] >= 0}
+
+
+def montar_histogramas(df_pedidos):
+    """Histograma exato dos tempos de preparo, trânsito e entrega por dia do pedido, estado e transportadora.
+
+    Os tempos são dias inteiros, então o "sketch" de cada célula é a contagem
+    de pedidos por valor, sem aproximação: histogramas de meses diferentes se
+    combinam somando as contagens (`combinar_histogramas`), e qualquer
+    percentil sai deles sem reler os pedidos (`percentis`). Monta tudo em uma
+    única passada (um agrupamento) sobre os pedidos.
+    """
+    partes = []
+    for medida, valido in _tempos_validos(df_pedidos).items():
+        pedidos = df_pedidos[valido]
+        partes.append(pd.DataFrame({
+            'dia': pedidos['data_pedido_norm'],
+            'estado': pedidos['estado'].astype(object),
+            'transportadora': pedidos['transportadora'].astype(object),
+            'medida': medida,
+            'dias': pedidos[medida].astype(np.int64),
+        }))
+    valores = pd.concat(partes, ignore_index=True)
+    return valores.groupby(DIMENSOES_HISTOGRAMA, dropna=False).size().reset_index(name='pedidos')
+
+
+def combinar_histogramas(histogramas):
+    """Soma histogramas de conjuntos de pedidos disjuntos (ex.: as partições mensais) em um só."""
+    combinado = pd.concat(histogramas, ignore_index=True)
+    return combinado.groupby(DIMENSOES_HISTOGRAMA, dropna=False, observed=True)['pedidos'].sum().reset_index()
+
+
+def percentis(histograma, por='transportadora', percentis=PERCENTIS):
+    """Percentis de cada tempo por `por` ('transportadora', 'estado' ou 'dia'), a partir do histograma.
+
+    Usa a interpolação linear do `quantile` do pandas: o percentil q de n
+    pedidos fica na posição (n - 1) * q da lista ordenada, localizada pelas
+    contagens acumuladas. Células com `por` nulo são ignoradas, como no
+    `groupby`. Retorna `por`, `medida`, `pedidos` e uma coluna `p50`, `p90`...
+    por percentil.
+    """
+    colunas_percentis = [f'p{q * 100:g}' for q in percentis]
+    contagens = histograma.groupby([por, 'medida', 'dias'], observed=True)['pedidos'].sum()
+    contagens = contagens[contagens > 0].reset_index()
+    if contagens.empty:
+        return pd.DataFrame(columns=[por, 'medida', 'pedidos', *colunas_percentis])
+
+    # Linhas ordenadas por (grupo, dias): cada grupo é um trecho contíguo
+    grupo = contagens.groupby([por, 'medida'], observed=True, sort=False).ngroup().to_numpy()
+    inicio_grupo = np.flatnonzero(np.r_[True, grupo[1:] != grupo[:-1]])
+    n = np.add.reduceat(contagens['pedidos'].to_numpy(), inicio_grupo)
+    acumulado = contagens['pedidos'].to_numpy().cumsum()
+    antes = acumulado[inicio_grupo] - contagens['pedidos'].to_numpy()[inicio_grupo]
+    dias = contagens['dias'].to_numpy(dtype=float)
+
+    resultado = contagens.iloc[inicio_grupo][[por, 'medida']].reset_index(drop=True)
+    resultado['pedidos'] = n
+    for coluna, q in zip(colunas_percentis, percentis):
+        posicao = (n - 1) * q
+        anterior = np.floor(posicao)
+        fracao = posicao - anterior
+        # Valor na posição k (0 = o menor) do grupo: a primeira linha com acumulado > k
+        baixo = dias[np.searchsorted(acumulado, antes + anterior, side='right')]
+        alto = dias[np.searchsorted(acumulado, antes + np.minimum(anterior + 1, n - 1), side='right')]
+        resultado[coluna] = baixo + fracao * (alto - baixo)
+    if isinstance(resultado[por].dtype, pd.CategoricalDtype):
+        resultado[por] = resultado[por].astype(object)
+    return resultado
+
+
+def percentis_exatos(df_pedidos, por='transportadora', percentis=PERCENTIS):
+    """Os mesmos percentis calculados direto dos pedidos (referência de `verificar_percentis`)."""
+    coluna = AGRUPAMENTOS[por]
+    validos = _tempos_validos(df_pedidos)
+    partes = [
+        pd.DataFrame({por: df_pedidos.loc[valido, coluna], 'medida': medida, 'dias': df_pedidos.loc[valido, medida].astype(float)})
+        for medida, valido in validos.items()
+    ]
+    grupos = pd.concat(partes, ignore_index=True).groupby([por, 'medida'], observed=True)['dias']
+    resultado = grupos.size().rename('pedidos').to_frame()
+    for q in percentis:
+        resultado[f'p{q * 100:g}'] = grupos.quantile(q)
+    resultado = resultado.reset_index()
+    if isinstance(resultado[por].dtype, pd.CategoricalDtype):
+        resultado[por] = resultado[por].astype(object)
+    return resultado
+
+
+def verificar_percentis(df_pedidos, histograma=None, tolerancia=1e-9):
+    """Compara os percentis do histograma com os calculados nos pedidos, para cada agrupamento; retorna um relatório."""
+    # Importado aqui: `particoes` usa este módulo ao gravar os agregados mensais, e `consultas` importa `particoes`
+    from consultas import comparar_tabelas
+
+    inicio = time.perf_counter()
+    histograma = montar_histogramas(df_pedidos) if histograma is None else histograma
+    segundos_montagem = time.perf_counter() - inicio
+    linhas = []
+    for por in AGRUPAMENTOS:
+        inicio = time.perf_counter()
+        referencia = percentis_exatos(df_pedidos, por)
+        segundos_pedidos = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        candidata = percentis(histograma, por)
+        segundos_histograma = time.perf_counter() - inicio
+        diferenca = comparar_tabelas(referencia, candidata, tolerancia)
+        linhas.append({
+            'por': por, 'linhas': len(referencia), 'segundos_pedidos': segundos_pedidos,
+            'segundos_histograma': segundos_histograma, 'iguais': diferenca is None, 'diferenca': diferenca or '',
+        })
+    relatorio = pd.DataFrame(linhas)
+    relatorio.attrs['segundos_montagem'] = segundos_montagem
+    relatorio.attrs['linhas'] = {'df_pedidos': len(df_pedidos), 'histograma': len(histograma)}
+    return relatorio
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monta os histogramas de tempos de entrega e confere os percentis com o cálculo nos pedidos.")
+    parser.add_argument('--compacto', action='store_true', help="Usa tipos compactos nas bases")
+    args = parser.parse_args(argv)
+
+    import kpis
+    df_pedidos = kpis.carregar_bases(compacto=args.compacto).df_pedidos
+    relatorio = verificar_percentis(df_pedidos)
+    with pd.option_context('display.max_colwidth', 120, 'display.width', 200):
+        print(percentis(montar_histogramas(df_pedidos)).round(1).to_string(index=False))
+        print()
+        print(relatorio.round(4).to_string(index=False))
+    print(f"Montagem dos histogramas: {relatorio.attrs['segundos_montagem']:.2f}s · " + ', '.join(f"{nome} {n:,} linhas" for nome, n in relatorio.attrs['linhas'].items()))
+    raise SystemExit(0 if relatorio['iguais'].all() else 1)
+
+
+if __name__ == '__main__':
+    main()
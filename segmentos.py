@@ -0,0 +1,150 @@
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+# Amplitude máxima das chaves, em múltiplos do número de chaves distintas, para usar endereçamento direto
+LIMITE_DENSIDADE = 8
+
+
+class IndiceSegmentos(NamedTuple):
+    """Linhas de uma tabela agrupadas por uma chave inteira, no layout CSR.
+
+    `ordem` lista as posições das linhas ordenadas pela chave (ordenação
+    estável, de modo que as linhas de uma mesma chave mantêm a ordem
+    original); as linhas da chave `chaves[k]` são
+    `ordem[inicio[k]:inicio[k + 1]]`. Linhas com chave nula ficam de fora.
+    """
+    chaves: np.ndarray   # chaves distintas, em ordem crescente
+    inicio: np.ndarray   # deslocamento de cada segmento em `ordem` (len(chaves) + 1 posições)
+    ordem: np.ndarray    # posições das linhas, ordenadas pela chave
+
+
+def _inteiros(chaves):
+    """`(valores, validos)` de uma coluna de chaves inteiras (nulas marcadas como inválidas), ou `None` se a coluna não for inteira."""
+    chaves = pd.Series(chaves)
+    if not pd.api.types.is_integer_dtype(chaves):
+        return None
+    validos = chaves.notna().to_numpy()
+    return chaves.to_numpy(dtype=np.int64, na_value=0), validos
+
+
+def indexar(chaves):
+    """Monta o índice CSR de uma coluna de chaves inteiras com uma única ordenação (sem tabela hash)."""
+    inteiros = _inteiros(chaves)
+    if inteiros is None:
+        raise TypeError(f"A chave '{getattr(chaves, 'name', None)}' não é inteira.")
+    valores, validos = inteiros
+    posicoes = np.flatnonzero(validos)
+    chaves_validas = valores[posicoes]
+    menor = int(chaves_validas.min()) if len(posicoes) else 0
+    amplitude = int(chaves_validas.max()) - menor + 1 if len(posicoes) else 0
+    if amplitude * len(posicoes) < np.iinfo(np.int64).max:
+        # Chave composta (chave, posição) é única: a ordenação não estável dá o mesmo resultado, bem mais rápido
+        ordem = posicoes[np.argsort((chaves_validas - menor) * len(posicoes) + np.arange(len(posicoes)))]
+    else:
+        ordem = posicoes[np.argsort(chaves_validas, kind='stable')]
+    ordenadas = valores[ordem]
+    quebras = np.flatnonzero(ordenadas[1:] != ordenadas[:-1]) + 1
+    inicio = np.concatenate([[0], quebras, [len(ordem)]] if len(ordem) else [[0]]).astype(np.int64)
+    return IndiceSegmentos(ordenadas[inicio[:-1]], inicio, ordem)
+
+
+def localizar(indice, chaves):
+    """Número do segmento de cada chave em `indice`, ou -1 se ela for nula ou não estiver no índice.
+
+    Com chaves densas (ids sequenciais, o caso comum), a posição vem de uma
+    tabela de endereçamento direto; senão, de uma busca binária.
+    """
+    valores, validos = _inteiros(chaves)
+    if len(indice.chaves) and indice.chaves[-1] - indice.chaves[0] < max(LIMITE_DENSIDADE * len(indice.chaves), len(valores)):
+        menor = indice.chaves[0]
+        tabela = np.full(indice.chaves[-1] - menor + 1, -1, dtype=np.int64)
+        tabela[indice.chaves - menor] = np.arange(len(indice.chaves))
+        deslocado = valores - menor
+        dentro = validos & (deslocado >= 0) & (deslocado < len(tabela))
+        return np.where(dentro, tabela[np.where(dentro, deslocado, 0)], -1)
+    segmento = np.searchsorted(indice.chaves, valores)
+    segmento_valido = np.minimum(segmento, max(len(indice.chaves) - 1, 0))
+    encontrado = validos & (segmento < len(indice.chaves))
+    encontrado[encontrado] = indice.chaves[segmento_valido[encontrado]] == valores[encontrado]
+    return np.where(encontrado, segmento, -1)
+
+
+def tamanhos(indice):
+    """Número de linhas de cada segmento."""
+    return np.diff(indice.inicio)
+
+
+def _reduzir(indice, ufunc, valores):
+    if len(indice.chaves) == 0:
+        return valores[:0]
+    return ufunc.reduceat(valores[indice.ordem], indice.inicio[:-1])
+
+
+def _soma_compensada(indice, valores):
+    """Soma de Kahan em cada segmento, na ordem das linhas, como o `groupby().sum()` do pandas.
+
+    Percorre a k-ésima linha de todos os segmentos de uma vez: cada passo
+    só toca os segmentos com mais de k linhas, de modo que o total de
+    operações é proporcional ao número de linhas.
+    """
+    valores = valores[indice.ordem]
+    linhas = tamanhos(indice)
+    soma, compensacao = np.zeros(len(linhas)), np.zeros(len(linhas))
+    maiores_primeiro = np.argsort(-linhas, kind='stable')
+    linhas_ordenadas = linhas[maiores_primeiro]
+    for k in range(int(linhas_ordenadas[0]) if len(linhas) else 0):
+        ativos = maiores_primeiro[:np.searchsorted(-linhas_ordenadas, -k, side='left')]
+        valor = valores[indice.inicio[ativos] + k]
+        validos = ~np.isnan(valor)
+        ativos, valor = ativos[validos], valor[validos]
+        y = valor - compensacao[ativos]
+        t = soma[ativos] + y
+        # Com valores infinitos a compensação vira NaN; o pandas a zera para manter o total infinito
+        erro = t - soma[ativos] - y
+        compensacao[ativos] = np.where(np.isnan(erro), 0.0, erro)
+        soma[ativos] = t
+    return soma
+
+
+def somar(indice, valores):
+    """Soma de `valores` em cada segmento, ignorando nulos, com o mesmo resultado do `groupby().sum()`.
+
+    Inteiros sem nulos continuam inteiros; números reais usam a mesma soma
+    compensada do pandas, de modo que os totais são idênticos bit a bit.
+    """
+    valores = pd.Series(valores)
+    if pd.api.types.is_integer_dtype(valores) and not valores.hasnans:
+        return _reduzir(indice, np.add, valores.to_numpy(dtype=np.int64))
+    return _soma_compensada(indice, valores.to_numpy(dtype=float, na_value=np.nan))
+
+
+def maximo(indice, valores):
+    """Maior valor de cada segmento, ignorando nulos (como o `groupby().max()`), no tipo original se não houver nulos."""
+    valores = pd.Series(valores)
+    if pd.api.types.is_numeric_dtype(valores) and not valores.hasnans:
+        return _reduzir(indice, np.maximum, valores.to_numpy())
+    return _reduzir(indice, np.fmax, valores.to_numpy(dtype=float, na_value=np.nan))
+
+
+def algum(indice, condicao):
+    """Se alguma linha de cada segmento satisfaz `condicao` (ex.: "o pedido contém o material X")."""
+    return _reduzir(indice, np.logical_or, np.asarray(condicao, dtype=bool))
+
+
+def primeiras_linhas(indice):
+    """Posição da primeira linha de cada chave, na ordem original (equivale a `drop_duplicates(subset=chave)`)."""
+    return np.sort(indice.ordem[indice.inicio[:-1]])
+
+
+def distribuir(por_segmento, segmento):
+    """Valor de cada segmento levado às linhas que apontam para ele (ver `localizar`); segmento -1 recebe nulo."""
+    encontrado = segmento >= 0
+    por_segmento = np.asarray(por_segmento)
+    if encontrado.all():
+        return por_segmento[segmento]
+    resultado = np.full(len(segmento), np.nan)
+    resultado[encontrado] = por_segmento[segmento[encontrado]]
+    return resultado
+
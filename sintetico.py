@@ -0,0 +1,176 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from ingestao import ARQUIVO_ITENS_SUPPLY, ARQUIVO_PEDIDOS
+
+# Limite de linhas de uma aba do Excel (sem o cabeçalho)
+LIMITE_LINHAS_EXCEL = 1_048_575
+
+ITENS_POR_PEDIDO = 1.6
+
+# População aproximada (milhões) de cada UF: define o peso dos estados nos pedidos
+POPULACAO_ESTADOS = {
+    'São Paulo': 46.0, 'Minas Gerais': 20.5, 'Rio de Janeiro': 16.1, 'Bahia': 14.1, 'Paraná': 11.4,
+    'Rio Grande do Sul': 10.9, 'Pernambuco': 9.1, 'Ceará': 8.8, 'Pará': 8.1, 'Santa Catarina': 7.6,
+    'Goiás': 7.1, 'Maranhão': 6.8, 'Amazonas': 3.9, 'Espírito Santo': 3.8, 'Paraíba': 4.0,
+    'Mato Grosso': 3.7, 'Rio Grande do Norte': 3.3, 'Piauí': 3.3, 'Alagoas': 3.1, 'Distrito Federal': 2.8,
+    'Mato Grosso do Sul': 2.8, 'Sergipe': 2.2, 'Rondônia': 1.6, 'Tocantins': 1.5, 'Acre': 0.8,
+    'Amapá': 0.7, 'Roraima': 0.6,
+}
+
+# Transportadora: (participação nos pedidos, trânsito médio em dias, prazo prometido em dias)
+TRANSPORTADORAS = {
+    'Correios': (0.38, 6.0, 8),
+    'Jadlog': (0.20, 5.0, 6),
+    'Loggi': (0.15, 3.0, 4),
+    'Total Express': (0.11, 5.5, 7),
+    'Azul Cargo': (0.07, 2.5, 3),
+    'J&T Express': (0.05, 7.0, 7),
+    'Sequoia': (0.03, 6.5, 8),
+    'Mandaê': (0.01, 8.0, 9),
+}
+
+STATUS_PEDIDO = {'delivered': 0.84, 'shipped': 0.07, 'canceled': 0.05, 'processing': 0.04}
+
+CATEGORIAS = ['Capinha', 'Garrafa Térmica', 'Case AirPods', 'Necessaire', 'Mochila', 'Carteira',
+              'Película', 'Copo', 'Agenda', 'Squeeze', 'Bolsa', 'Kit Presente']
+
+
+def _pesos_zipf(n, expoente):
+    """Probabilidades ∝ 1/k^expoente: poucos itens concentram a maior parte das ocorrências."""
+    pesos = 1.0 / np.arange(1, n + 1) ** expoente
+    return pesos / pesos.sum()
+
+
+def _escolher(rng, opcoes, pesos, n):
+    pesos = np.asarray(pesos, dtype=float)
+    return np.asarray(opcoes, dtype=object)[rng.choice(len(opcoes), size=n, p=pesos / pesos.sum())]
+
+
+def gerar_dados(n_itens, n_materiais=None, mes='2025-02', id_inicial=1, semente=0):
+    """Gera as bases brutas (Pedidos, Itens e Supply) com os mesmos nomes de colunas das planilhas.
+
+    As tabelas equivalem ao retorno de `ingestao.carregar_planilhas` (sem as
+    colunas de `COLUNAS_REMOVER`). A venda dos materiais segue uma distribuição
+    de Zipf, e estados e transportadoras têm participações desiguais, como nos
+    dados reais; os pedidos ficam no mês `mes` (AAAA-MM) e os ids começam em
+    `id_inicial`, para que vários meses possam ser combinados.
+    Retorna `(df_pedidos_raw, df_itens_raw, df_supply_raw)`.
+    """
+    rng = np.random.default_rng(semente)
+    n_materiais = n_materiais or int(np.clip(n_itens // 200, 100, 20_000))
+    n_pedidos = max(1, int(round(n_itens / ITENS_POR_PEDIDO)))
+
+    # Catálogo: categoria e nome de cada material (nomes com tamanhos variados)
+    categoria_material = _escolher(rng, CATEGORIAS, _pesos_zipf(len(CATEGORIAS), 0.8), n_materiais)
+    estampas = rng.integers(1, 10_000, n_materiais)
+    nome_material = np.array([
+        f'{categoria} Estampa {estampa}' + (' Edição Especial Coleção Verão' if estampa % 3 == 0 else '')
+        for categoria, estampa in zip(categoria_material, estampas)
+    ], dtype=object)
+    popularidade = rng.permutation(n_materiais)  # o material mais vendido não é sempre o de menor id
+
+    # Itens: todo pedido tem ao menos 1 item; materiais com venda concentrada (Zipf)
+    posicao_pedido = np.sort(np.concatenate([np.arange(n_pedidos), rng.integers(0, n_pedidos, n_itens - n_pedidos)]))
+    material = popularidade[rng.choice(n_materiais, size=n_itens, p=_pesos_zipf(n_materiais, 1.1))]
+    preco = np.round(rng.lognormal(np.log(70), 0.45, n_itens), 2)
+    df_itens_raw = pd.DataFrame({
+        'id': np.arange(1, n_itens + 1),
+        'order_id': posicao_pedido + id_inicial,
+        'material_id': material + 1,
+        'material_name': nome_material[material],
+        'material_category': categoria_material[material],
+        'price': preco,
+    })
+
+    # Pedidos: estado, transportadora e tempos de cada etapa
+    inicio_mes = pd.Timestamp(f'{mes}-01')
+    dias_mes = inicio_mes.days_in_month
+    data_pedido = inicio_mes + pd.to_timedelta(rng.integers(0, dias_mes * 24 * 3600, n_pedidos), unit='s')
+    nomes_transportadoras = list(TRANSPORTADORAS)
+    indice_transportadora = rng.choice(len(nomes_transportadoras), size=n_pedidos,
+                                       p=[participacao for participacao, _, _ in TRANSPORTADORAS.values()])
+    transito_medio = np.array([transito for _, transito, _ in TRANSPORTADORAS.values()])[indice_transportadora]
+    prazo_prometido = np.array([prazo for _, _, prazo in TRANSPORTADORAS.values()])[indice_transportadora]
+    status = _escolher(rng, list(STATUS_PEDIDO), list(STATUS_PEDIDO.values()), n_pedidos)
+
+    preparo = rng.poisson(1.5, n_pedidos)
+    transito = rng.poisson(transito_medio)
+    data_envio = data_pedido + pd.to_timedelta(preparo, unit='D') + pd.to_timedelta(rng.integers(0, 8 * 3600, n_pedidos), unit='s')
+    data_entrega = data_envio + pd.to_timedelta(transito, unit='D')
+    enviado = np.isin(status, ['delivered', 'shipped'])
+
+    subtotal = np.bincount(posicao_pedido, weights=preco, minlength=n_pedidos)
+    desconto = np.where(rng.random(n_pedidos) < 0.3, rng.uniform(0, 0.4, n_pedidos), 0)
+    frete_cliente = np.round(rng.choice([0, 9.9, 14.9, 19.9], size=n_pedidos, p=[0.4, 0.3, 0.2, 0.1]), 2)
+    numero_itens = np.bincount(posicao_pedido, minlength=n_pedidos)
+
+    id_pedido = np.arange(n_pedidos) + id_inicial
+    df_pedidos_raw = pd.DataFrame({
+        'id': id_pedido,
+        'reference': pd.Series(id_pedido).map('R{:09d}'.format),
+        'created_at': data_pedido,
+        'Valor de NF (R$)': np.round(subtotal * (1 - desconto) + frete_cliente, 2),
+        'order_state': np.where(status == 'canceled', 'canceled', 'complete'),
+        'Cidade': 'Não informado',
+        'Estado': _escolher(rng, list(POPULACAO_ESTADOS), list(POPULACAO_ESTADOS.values()), n_pedidos),
+        'Frete Cobrado do Cliente (R$)': frete_cliente,
+        'Frete cobrado pela transportadora (R$)': np.round(rng.uniform(7, 25, n_pedidos), 2),
+        'Transportadora': np.asarray(nomes_transportadoras, dtype=object)[indice_transportadora],
+        'Número da NF': np.where(status == 'canceled', None, id_pedido.astype(str)),
+        'Status do Pedido': status,
+        'Prazo para Sair do CD': (data_pedido + pd.Timedelta(days=2)).normalize(),
+        'Enviado em:': pd.Series(data_envio).where(enviado),
+        'Entregue para o cliente em:': pd.Series(data_entrega).where(status == 'delivered'),
+        'Prazo a transportadora entregar no cliente': pd.Series(
+            data_envio.normalize() + pd.to_timedelta(prazo_prometido, unit='D')
+        ).where(enviado),
+        'Número de Itens no Pedido': numero_itens,
+    })
+
+    # Supply: 1 a 3 centros de estoque por material, com parte dos materiais zerados ou descontinuados
+    centros = rng.integers(1, 4, n_materiais)
+    material_supply = np.repeat(np.arange(n_materiais), centros)
+    n_supply = len(material_supply)
+    descontinuado = rng.random(n_materiais) < 0.08
+    df_supply_raw = pd.DataFrame({
+        'material_id': material_supply + 1,
+        'quantity': np.where(rng.random(n_supply) < 0.15, 0, rng.integers(0, 400, n_supply)),
+        'discontinued': descontinuado[material_supply],
+        'leadtime': np.where(rng.random(n_supply) < 0.2, 0, rng.integers(3, 60, n_supply)),
+    })
+    return df_pedidos_raw, df_itens_raw, df_supply_raw
+
+
+def salvar_planilhas(df_pedidos_raw, df_itens_raw, df_supply_raw, pasta):
+    """Grava as bases nas duas planilhas esperadas pelo dashboard (pasta `data` ou uma exportação mensal)."""
+    maior = max(len(df_pedidos_raw), len(df_itens_raw), len(df_supply_raw))
+    if maior > LIMITE_LINHAS_EXCEL:
+        raise ValueError(f"{maior:,} linhas não cabem em uma aba do Excel (limite de {LIMITE_LINHAS_EXCEL:,}).")
+    os.makedirs(pasta, exist_ok=True)
+    df_pedidos_raw.to_excel(os.path.join(pasta, ARQUIVO_PEDIDOS), index=False)
+    with pd.ExcelWriter(os.path.join(pasta, ARQUIVO_ITENS_SUPPLY)) as arquivo:
+        df_itens_raw.to_excel(arquivo, sheet_name='Itens', index=False)
+        df_supply_raw.to_excel(arquivo, sheet_name='Supply', index=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera planilhas sintéticas de Pedidos, Itens e Supply.")
+    parser.add_argument('--itens', type=int, default=10_000, help="Número de linhas de itens")
+    parser.add_argument('--materiais', type=int, default=None, help="Número de materiais (padrão: proporcional aos itens)")
+    parser.add_argument('--mes', default='2025-02', help="Mês dos pedidos (AAAA-MM)")
+    parser.add_argument('--id-inicial', type=int, default=1, help="Primeiro id de pedido (para combinar vários meses)")
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--saida', required=True, help="Pasta de destino, ex.: data/exportacoes/2025-03")
+    args = parser.parse_args(argv)
+
+    bases = gerar_dados(args.itens, args.materiais, args.mes, args.id_inicial, args.semente)
+    salvar_planilhas(*bases, args.saida)
+    print(f"{len(bases[0]):,} pedidos, {len(bases[1]):,} itens e {len(bases[2]):,} linhas de supply gravados em '{args.saida}'")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+
+
+def taxa_por_grupo(grupos, condicao):
+    """Total de linhas e percentual em que `condicao` é verdadeira, por grupo, sem callback por grupo.
+
+    Equivale a `groupby(grupos).apply(lambda x: condicao.sum() / len(x) * 100)`,
+    com uma única passada de `np.bincount`. Grupos nulos são ignorados, como no
+    `groupby`. Retorna um DataFrame indexado pelos grupos (ordenados), com as
+    colunas `total`, `ocorrencias` e `taxa`.
+    """
+    codigos, rotulos = pd.factorize(grupos, sort=True)
+    validos = codigos >= 0
+    codigos = codigos[validos]
+    total = np.bincount(codigos, minlength=len(rotulos))
+    ocorrencias = np.bincount(codigos, weights=np.asarray(condicao, dtype=bool)[validos], minlength=len(rotulos))
+    return pd.DataFrame({
+        'total': total,
+        'ocorrencias': ocorrencias.astype(np.int64),
+        'taxa': ocorrencias / np.maximum(total, 1) * 100,
+    }, index=pd.Index(rotulos, name=getattr(grupos, 'name', None)))
+
+
+def truncar_texto(serie, limite, sufixo='...'):
+    """Corta os textos acima de `limite` caracteres e acrescenta `sufixo`.
+
+    O corte é feito uma vez por valor distinto (nomes de produto se repetem
+    muito), e o resultado é redistribuído pelos códigos do `factorize`.
+    """
+    codigos, valores = pd.factorize(serie)
+    valores = pd.Series(valores, dtype=object)
+    cortados = valores.where(valores.str.len() <= limite, valores.str.slice(0, limite) + sufixo)
+    # Código -1 (valor nulo) aponta para o None acrescentado ao final
+    cortados = np.append(cortados.to_numpy(dtype=object), None)
+    return pd.Series(cortados[codigos], index=serie.index, name=serie.name)
+
+
+def classificar_niveis(chaves, grupos_por_nivel):
+    """Código do nível de cada linha: 0 por padrão, ou o índice (1, 2, ...) do último grupo que contém a chave.
+
+    `grupos_por_nivel` é uma lista de coleções de chaves, do nível 1 em
+    diante; níveis posteriores têm precedência, como uma sequência de
+    atribuições com `.loc`.
+    """
+    niveis = np.zeros(len(chaves), dtype=np.int8)
+    chaves = pd.Series(chaves)
+    for nivel, grupo in enumerate(grupos_por_nivel, start=1):
+        niveis[chaves.isin(grupo).to_numpy()] = nivel
+    return niveis
+
+
+def rotular_niveis(codigos, rotulos):
+    """Converte códigos de nível (inteiros, com nulos) em uma coluna categórica ordenada com `rotulos`."""
+    codigos = pd.Series(codigos)
+    inteiros = codigos.fillna(-1).to_numpy().astype(np.int8)
+    return pd.Categorical.from_codes(inteiros, categories=rotulos, ordered=True)
+
+
+def estilo_linhas(df, mascara, estilo):
+    """Matriz de estilos para `Styler.apply(..., axis=None)`: `estilo` nas linhas em que `mascara` é verdadeira.
+
+    Substitui o `Styler.apply(lambda linha: [...], axis=1)`, que chama Python
+    uma vez por linha.
+    """
+    mascara = np.asarray(mascara, dtype=bool)
+    estilos = np.where(mascara[:, None], estilo, '')
+    return pd.DataFrame(np.broadcast_to(estilos, df.shape), index=df.index, columns=df.columns)